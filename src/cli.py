@@ -0,0 +1,178 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import click
+from src.services.contact_backfill import ensure_contact_columns, backfill_contacts
+from src.services.schema import ensure_indexes
+from src.services.guest_import import GuestImporter, iter_rows, DEFAULT_CHUNK_SIZE
+from src.services import guest_dedupe
+from src.services.report_jobs import expire_jobs, fail_stale_jobs
+from src.services.counters import reconcile
+from src.services import sqlite_profile
+from src.services import write_coordinator
+from src.services.migrations import migrate, pending_migrations, init_database
+from src.services.query_plans import check_query_plans
+
+
+def register_commands(app):
+    """Attach the maintenance commands to ``flask --app src.main``"""
+
+    @app.cli.command('backfill-contacts')
+    @click.option('--chunk-size', default=1000, show_default=True, help='Rows updated per commit')
+    def backfill_contacts_command(chunk_size):
+        """Fill normalized phone/email columns for existing guests and interactions"""
+        ensure_contact_columns()
+        ensure_indexes()
+        for column, count in backfill_contacts(chunk_size).items():
+            click.echo(f'{column}: {count} rows updated')
+
+    @app.cli.command('import-guests')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension')
+    @click.option('--mode', type=click.Choice(['upsert', 'insert']), default='upsert', show_default=True)
+    @click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True, help='Rows written per transaction')
+    def import_guests_command(path, file_format, mode, chunk_size):
+        """Bulk import guests from a CSV or NDJSON file; row errors go to stderr as NDJSON"""
+        if not file_format:
+            file_format = 'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+        importer = GuestImporter(chunk_size=chunk_size, mode=mode)
+        with open(path, 'rb') as stream:
+            for error in importer.run(iter_rows(stream, file_format)):
+                click.echo(json.dumps(error), err=True)
+        click.echo(json.dumps(importer.summary))
+
+    @app.cli.command('dedupe-guests')
+    @click.option('--full', is_flag=True, help='Rescan every guest instead of only new ones')
+    @click.option('--threshold', default=guest_dedupe.DEFAULT_NAME_THRESHOLD, show_default=True,
+                  help='Minimum name similarity for phone and birthday matches')
+    def dedupe_guests_command(full, threshold):
+        """Record likely duplicate guests created since the last run"""
+        click.echo(json.dumps(guest_dedupe.run_incremental(name_threshold=threshold, full=full)))
+
+    @app.cli.command('expire-report-jobs')
+    def expire_report_jobs_command():
+        """Fail stale background report jobs, then delete expired jobs and their result files"""
+        click.echo(f'{fail_stale_jobs()} stale report jobs failed')
+        click.echo(f'{expire_jobs()} report jobs removed')
+
+    @app.cli.command('reconcile-counters')
+    def reconcile_counters_command():
+        """Recount the summary report counters from their tables"""
+        click.echo(json.dumps(reconcile(), sort_keys=True))
+
+    @app.cli.command('sqlite-maintenance')
+    def sqlite_maintenance_command():
+        """Run PRAGMA optimize and a full WAL checkpoint"""
+        click.echo(json.dumps(sqlite_profile.run_maintenance(checkpoint='TRUNCATE')))
+
+    @app.cli.command('bench-sqlite')
+    @click.option('--readers', default=4, show_default=True)
+    @click.option('--writers', default=4, show_default=True)
+    @click.option('--seconds', default=5.0, show_default=True)
+    def bench_sqlite_command(readers, writers, seconds):
+        """Compare concurrent read/write throughput with SQLite defaults and the tuned profile"""
+        for profile in ('default', 'tuned'):
+            click.echo(json.dumps(sqlite_profile.benchmark(profile, readers, writers, seconds)))
+
+    @app.cli.command('bench-writes')
+    @click.option('--threads', default=16, show_default=True)
+    @click.option('--seconds', default=5.0, show_default=True)
+    @click.option('--synchronous', type=click.Choice(['NORMAL', 'FULL']), default='NORMAL', show_default=True)
+    def bench_writes_command(threads, seconds, synchronous):
+        """Compare committed writes per second with per-request commits and the write coordinator"""
+        for coordinated in (False, True):
+            click.echo(json.dumps(write_coordinator.benchmark(coordinated, threads, seconds, synchronous)))
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create tables, apply migrations, build the guest search index and seed default users"""
+        applied, created = init_database()
+        click.echo(f"Applied migrations: {', '.join(map(str, applied)) or 'none'}")
+        if created:
+            click.echo(f"Created default users: {', '.join(created)}")
+
+    @app.cli.command('migrate')
+    @click.option('--dry-run', is_flag=True, help='List pending steps without applying them')
+    def migrate_command(dry_run):
+        """Apply pending schema migration steps"""
+        pending = pending_migrations()
+        for version, description, step in pending:
+            click.echo(f'{version}: {description}')
+        if not pending:
+            click.echo('Schema is up to date')
+        elif not dry_run:
+            migrate()
+            click.echo(f'Applied {len(pending)} step(s)')
+
+    @app.cli.command('check-query-plans')
+    @click.option('--verbose', is_flag=True, help='Print every plan, not only failures')
+    def check_query_plans_command(verbose):
+        """Fail if any hot endpoint query plans a full table scan"""
+        failed = False
+        for name, result in check_query_plans().items():
+            if result['full_scans']:
+                failed = True
+                click.echo(f"FULL SCAN  {name}: {'; '.join(result['full_scans'])}")
+            elif verbose:
+                click.echo(f"ok         {name}: {'; '.join(result['plan'])}")
+        if failed:
+            raise SystemExit(1)
+        click.echo('No full table scans in hot queries')
+
+    @app.cli.command('bench-startup')
+    @click.option('--runs', default=5, show_default=True, help='Fresh interpreter processes measured')
+    @click.option('--preload', is_flag=True, help='Build the app with PRELOAD as a pre-forking master would')
+    def bench_startup_command(runs, preload):
+        """Median time to import src.main, build the app and serve the first requests, in fresh processes"""
+        directory = tempfile.mkdtemp(prefix='startup-bench-')
+        config = {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(directory, 'bench.db')}",
+                  'SQLITE_MAINTENANCE_SECONDS': 0, 'PRELOAD': preload}
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        subprocess.run([sys.executable, '-c', STARTUP_INIT, json.dumps(config)], cwd=root, check=True, capture_output=True)
+        samples = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, '-c', STARTUP_PROBE, json.dumps(config)],
+                                    cwd=root, check=True, capture_output=True, text=True).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+        click.echo(json.dumps({
+            key: sorted(sample[key] for sample in samples)[len(samples) // 2] for key in samples[0]
+        }))
+
+
+# Run in fresh interpreters by bench-startup; argv[1] is the JSON app config
+STARTUP_INIT = """
+import json, sys
+from src.main import create_app
+from src.services.migrations import init_database
+app = create_app(dict(json.loads(sys.argv[1]), PRELOAD=False))
+with app.app_context():
+    init_database()
+"""
+
+STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import src.main
+imported = time.perf_counter()
+app = src.main.create_app(json.loads(sys.argv[1]))
+created = time.perf_counter()
+client = app.test_client()
+client.post('/api/auth/login', json={'username': 'agent1', 'password': 'agent123'})
+login = time.perf_counter()
+client.get('/api/interactions/queue')
+first = time.perf_counter()
+client.get('/api/interactions/queue')
+second = time.perf_counter()
+print(json.dumps({
+    'import_ms': round((imported - start) * 1000, 1),
+    'create_app_ms': round((created - imported) * 1000, 1),
+    'login_ms': round((login - created) * 1000, 1),
+    'first_request_ms': round((first - login) * 1000, 1),
+    'second_request_ms': round((second - first) * 1000, 1),
+}))
+"""
@@ -3,94 +3,185 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+import importlib
+from flask import Flask, current_app, send_from_directory
 from flask_login import LoginManager
 from flask_cors import CORS
 from src.models.user import db, User
 from src.models.guest import Guest, GuestPreference
 from src.models.reservation import Reservation
 from src.models.interaction import Interaction
+from src.models.message import Message
 from src.models.conversation import Conversation, ConversationParticipant, ConversationMessage, MessageReaction
-from src.routes.user import user_bp
-from src.routes.auth import auth_bp
-from src.routes.guest import guest_bp
-from src.routes.interaction import interaction_bp
-from src.routes.messaging import messaging_bp
-from src.routes.reports import reports_bp
+from src.models.guest_duplicate import GuestDuplicate
+from src.models.job_state import JobState
+from src.models.report_job import ReportJob
+from src.models.system_counter import SystemCounter
+from src.models.schema_version import SchemaVersion
+from src.models.change_event import ChangeEvent
+from src.services import counters, sqlite_profile
+from src.services.write_coordinator import write_coordinator
+from src.services.sql_profiler import sql_profiler
+from src.services.change_feed import change_feed
+from src.cli import register_commands
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-
-# Enable CORS for all routes
-CORS(app, supports_credentials=True)
+# Blueprints mounted under /api, as module:attribute; imported only when an app is built
+BLUEPRINTS = (
+    'src.routes.user:user_bp',
+    'src.routes.auth:auth_bp',
+    'src.routes.guest:guest_bp',
+    'src.routes.interaction:interaction_bp',
+    'src.routes.messaging:messaging_bp',
+    'src.routes.reports:reports_bp',
+    'src.routes.occupancy:occupancy_bp',
+)
 
 # Initialize Flask-Login
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
 
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
-# Register blueprints
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(auth_bp, url_prefix='/api')
-app.register_blueprint(guest_bp, url_prefix='/api')
-app.register_blueprint(interaction_bp, url_prefix='/api')
-app.register_blueprint(messaging_bp, url_prefix='/api')
-app.register_blueprint(reports_bp, url_prefix='/api')
-
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-with app.app_context():
-    db.create_all()
-    
-    # Create default admin user if none exists
-    if User.query.count() == 0:
-        admin = User(
-            username='admin',
-            email='admin@frontdesk.com',
-            first_name='System',
-            last_name='Administrator',
-            role='manager'
-        )
-        admin.set_password('admin123')
-        
-        agent = User(
-            username='agent1',
-            email='agent1@frontdesk.com',
-            first_name='Front Desk',
-            last_name='Agent',
-            role='agent'
-        )
-        agent.set_password('agent123')
-        
-        db.session.add(admin)
-        db.session.add(agent)
-        db.session.commit()
-        print("Default users created:")
-        print("Manager - Username: admin, Password: admin123")
-        print("Agent - Username: agent1, Password: agent123")
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+def create_app(config=None):
+    """Build the app; ``config`` overrides the environment-derived settings.
+
+    Nothing here touches the database: tables, migrations and default users are
+    created by ``flask --app src.main init-db``. With PRELOAD set, in-memory indexes
+    are loaded up front so a pre-forking server (``gunicorn --preload``) shares them.
+    """
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+
+    # Database configuration
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # SQLite engine profile: 'tuned' applies WAL, busy timeout and the other settings in
+    # src/services/sqlite_profile.py on every connection; 'default' leaves SQLite's defaults
+    app.config['SQLITE_PROFILE'] = os.environ.get('SQLITE_PROFILE', 'tuned')
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    app.config['SQLITE_POOL_SIZE'] = int(os.environ.get('SQLITE_POOL_SIZE', 10))
+
+    # Write coordinator: run write endpoints on one writer thread and group-commit them,
+    # waiting up to WRITE_BATCH_WINDOW_MS for more writes to join a batch (off by default)
+    app.config['WRITE_COORDINATOR'] = os.environ.get('WRITE_COORDINATOR', '').lower() in ('1', 'true', 'yes')
+    app.config['WRITE_BATCH_WINDOW_MS'] = float(os.environ.get('WRITE_BATCH_WINDOW_MS', 5))
+    app.config['WRITE_BATCH_MAX'] = int(os.environ.get('WRITE_BATCH_MAX', 200))
+
+    # Near-duplicate interaction detection
+    app.config['DUPLICATE_WINDOW_HOURS'] = int(os.environ.get('DUPLICATE_WINDOW_HOURS', 24))
+    app.config['DUPLICATE_SIMILARITY_THRESHOLD'] = float(os.environ.get('DUPLICATE_SIMILARITY_THRESHOLD', 0.5))
+
+    # Rows per transaction for bulk guest imports
+    app.config['GUEST_IMPORT_CHUNK_SIZE'] = int(os.environ.get('GUEST_IMPORT_CHUNK_SIZE', 1000))
+
+    # Minutes east of UTC of the hotel's local day, used by time-series reports
+    app.config['HOTEL_UTC_OFFSET_MINUTES'] = int(os.environ.get('HOTEL_UTC_OFFSET_MINUTES', 0))
+
+    # Background report jobs: worker threads per process, queued job limit, result files and their lifetime,
+    # and the minutes after which a queued or running job is presumed dead and failed
+    app.config['REPORT_JOB_WORKERS'] = int(os.environ.get('REPORT_JOB_WORKERS', 2))
+    app.config['REPORT_JOB_MAX_PENDING'] = int(os.environ.get('REPORT_JOB_MAX_PENDING', 20))
+    app.config['REPORT_JOB_DIR'] = os.environ.get('REPORT_JOB_DIR', os.path.join(os.path.dirname(__file__), 'database', 'reports'))
+    app.config['REPORT_JOB_TTL_HOURS'] = int(os.environ.get('REPORT_JOB_TTL_HOURS', 24))
+    app.config['REPORT_JOB_STALE_MINUTES'] = int(os.environ.get('REPORT_JOB_STALE_MINUTES', 60))
+
+    # Interaction volume forecast: weeks of history fitted and the smoothing factor (1.0 = same hour last week)
+    app.config['FORECAST_HISTORY_WEEKS'] = int(os.environ.get('FORECAST_HISTORY_WEEKS', 8))
+    app.config['FORECAST_SMOOTHING'] = float(os.environ.get('FORECAST_SMOOTHING', 0.3))
+
+    # Seconds between full recounts of the summary counters by a background thread, which
+    # also recounts within a minute of a write it could not count exactly; 0 disables it
+    app.config['COUNTER_RECONCILE_SECONDS'] = int(os.environ.get('COUNTER_RECONCILE_SECONDS', 3600))
+
+    # Report/stats response cache; the sqlite backend shares entries between worker processes
+    app.config['RESPONSE_CACHE_BACKEND'] = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+    app.config['RESPONSE_CACHE_PATH'] = os.environ.get('RESPONSE_CACHE_PATH', os.path.join(os.path.dirname(__file__), 'database', 'response_cache.db'))
+    app.config['RESPONSE_CACHE_TTL'] = int(os.environ.get('RESPONSE_CACHE_TTL', 60))
+    app.config['RESPONSE_CACHE_MAX_BYTES'] = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+    # Per-request SQL profiling: Server-Timing headers, slow query log, N+1 warnings
+    # and the last SQL_DEBUG_REQUESTS requests at /api/_debug/requests
+    app.config['SQL_PROFILING'] = os.environ.get('SQL_PROFILING', '1').lower() in ('1', 'true', 'yes')
+    app.config['SQL_SLOW_QUERY_MS'] = float(os.environ.get('SQL_SLOW_QUERY_MS', 200))
+    app.config['SQL_N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 10))
+    app.config['SQL_DEBUG_REQUESTS'] = int(os.environ.get('SQL_DEBUG_REQUESTS', 200))
+
+    # Change feed: share change events through the database so every process's in-memory
+    # indexes see the other workers' and CLI commands' writes; turn off only when a
+    # single process serves and writes the database
+    app.config['CHANGE_FEED'] = os.environ.get('CHANGE_FEED', '1').lower() in ('1', 'true', 'yes')
+    app.config['CHANGE_FEED_RETENTION_MINUTES'] = int(os.environ.get('CHANGE_FEED_RETENTION_MINUTES', 60))
+
+    # Warm in-memory indexes at startup (for pre-forking servers) and the blueprints to mount
+    app.config['PRELOAD'] = os.environ.get('PRELOAD', '').lower() in ('1', 'true', 'yes')
+    app.config['BLUEPRINTS'] = BLUEPRINTS
+
+    app.config.update(config or {})
+
+    # Enable CORS for all routes
+    CORS(app, supports_credentials=True)
+    login_manager.init_app(app)
+
+    # Register blueprints
+    for path in app.config['BLUEPRINTS']:
+        module, name = path.split(':')
+        app.register_blueprint(getattr(importlib.import_module(module), name), url_prefix='/api')
+
+    sqlite_profile.configure(app)
+    db.init_app(app)
+    sqlite_profile.install(app)
+    write_coordinator.init_app(app)
+    sql_profiler.init_app(app)
+    change_feed.init_app(app)
+    counters.start_reconciler(app)
+    register_commands(app)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        static_folder_path = current_app.static_folder
+        if static_folder_path is None:
+                return "Static folder not configured", 404
+
+        if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
+            return send_from_directory(static_folder_path, path)
         else:
-            return "index.html not found", 404
+            index_path = os.path.join(static_folder_path, 'index.html')
+            if os.path.exists(index_path):
+                return send_from_directory(static_folder_path, 'index.html')
+            else:
+                return "index.html not found", 404
+
+    if app.config['PRELOAD']:
+        from src.services.preload import preload
+        preload(app)
+    return app
+
+
+_app = None
+
+
+def __getattr__(name):
+    # ``src.main.app`` (flask --app src.main, WSGI servers) is built on first access, not on import
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 if __name__ == '__main__':
+    from src.services.migrations import init_database
+    app = create_app()
+    with app.app_context():
+        applied, created = init_database()
+    if created:
+        print("Default users created:")
+        print("Manager - Username: admin, Password: admin123")
+        print("Agent - Username: agent1, Password: agent123")
     app.run(host='0.0.0.0', port=5001, debug=True)
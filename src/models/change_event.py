@@ -0,0 +1,18 @@
+from src.models.user import db
+from datetime import datetime
+
+class ChangeEvent(db.Model):
+    """A committed row change, replayed by the other processes' in-memory indexes"""
+    __tablename__ = 'change_event'
+    # Ids are never reused, so a process can resume after the last id it applied
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    model = db.Column(db.String(100), nullable=False)  # table name
+    op = db.Column(db.String(10), nullable=False)  # insert, update, delete
+    row = db.Column(db.Text, nullable=False)  # JSON of the change event's row
+    origin = db.Column(db.String(32), nullable=False)  # process that made the change
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<ChangeEvent {self.id} {self.op} {self.model}>'
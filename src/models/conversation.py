@@ -116,6 +116,12 @@ class ConversationParticipant(db.Model):
     # Relationships
     user = db.relationship('User', backref='conversation_participations')
     
+    # A user's conversations, and a conversation's participants (membership checks, counts)
+    __table_args__ = (
+        db.Index('ix_conversation_participant_user_conversation', 'user_id', 'conversation_id'),
+        db.Index('ix_conversation_participant_conversation_user', 'conversation_id', 'user_id'),
+    )
+    
     def __repr__(self):
         return f'<ConversationParticipant {self.user_id} in {self.conversation_id}>'
     
@@ -165,6 +171,12 @@ class ConversationMessage(db.Model):
     reply_to = db.relationship('ConversationMessage', remote_side=[id], backref='replies')
     reactions = db.relationship('MessageReaction', backref='message', lazy=True, cascade='all, delete-orphan')
     
+    # Message history pages (newest first) and per-sender stats
+    __table_args__ = (
+        db.Index('ix_conversation_message_conversation_created', 'conversation_id', 'created_at'),
+        db.Index('ix_conversation_message_sender_created', 'sender_id', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<ConversationMessage {self.id} from {self.sender_id}>'
     
@@ -1,4 +1,7 @@
 from src.models.user import db
+from src.models.reservation import Reservation
+from src.services.contact import normalize_phone, normalize_email
+from sqlalchemy.orm import validates
 from datetime import datetime
 
 class Guest(db.Model):
@@ -13,6 +16,10 @@ class Guest(db.Model):
     phone = db.Column(db.String(20), nullable=True)
     address = db.Column(db.Text, nullable=True)
     
+    # Normalized contact details for indexed lookups (kept in sync by the validators below)
+    phone_e164 = db.Column(db.String(20), nullable=True, index=True)
+    email_lower = db.Column(db.String(255), nullable=True, index=True)
+    
     # Additional Details
     date_of_birth = db.Column(db.Date, nullable=True)
     nationality = db.Column(db.String(100), nullable=True)
@@ -51,13 +58,31 @@ class Guest(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     
     # Relationships
-    reservations = db.relationship('Reservation', foreign_keys='Reservation.guest_id', backref='guest_profile', lazy=True, cascade='all, delete-orphan')
+    reservations = db.relationship('Reservation', foreign_keys='Reservation.guest_id', backref='guest_profile', lazy=True, cascade='all, delete-orphan', order_by='Reservation.id')
     preferences = db.relationship('GuestPreference', backref='guest_profile', lazy=True, cascade='all, delete-orphan')
     interactions = db.relationship('Interaction', backref='guest', lazy=True, cascade='all, delete-orphan')
     
+    # Blocking key for duplicate detection (last name + date of birth), and the
+    # recently-updated / recently-created guest lists
+    __table_args__ = (
+        db.Index('ix_guest_dob_last_name', 'date_of_birth', 'last_name'),
+        db.Index('ix_guest_updated_at', 'updated_at'),
+        db.Index('ix_guest_created_at', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<Guest {self.first_name} {self.last_name}>'
     
+    @validates('phone')
+    def _set_phone_e164(self, key, value):
+        self.phone_e164 = normalize_phone(value)
+        return value
+    
+    @validates('email')
+    def _set_email_lower(self, key, value):
+        self.email_lower = normalize_email(value)
+        return value
+    
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
@@ -68,14 +93,55 @@ class Guest(db.Model):
         today = datetime.utcnow().date()
         return next((r for r in self.reservations 
                     if r.check_in_date <= today <= r.check_out_date 
-                    and r.status in ['confirmed', 'checked_in']), None)
+                    and r.status in Reservation.ACTIVE_STATUSES), None)
     
     @property
     def total_stays(self):
         """Get the total number of completed stays"""
         return len([r for r in self.reservations if r.status == 'checked_out'])
     
-    def to_dict(self):
+    @staticmethod
+    def load_reservation_summaries(guest_ids):
+        """Get ``(total_stays, current_reservation)`` for many guests with two grouped queries"""
+        summaries = {guest_id: [0, None] for guest_id in guest_ids}
+        if not summaries:
+            return {}
+        
+        stays = db.session.query(
+            Reservation.guest_id,
+            db.func.count(Reservation.id)
+        ).filter(
+            Reservation.guest_id.in_(summaries.keys()),
+            Reservation.status == 'checked_out'
+        ).group_by(Reservation.guest_id)
+        for guest_id, count in stays:
+            summaries[guest_id][0] = count
+        
+        # Lowest id wins, matching the ordering of the reservations relationship
+        today = datetime.utcnow().date()
+        current = Reservation.query.filter(
+            Reservation.guest_id.in_(summaries.keys()),
+            Reservation.status.in_(Reservation.ACTIVE_STATUSES),
+            Reservation.check_in_date <= today,
+            Reservation.check_out_date >= today
+        ).order_by(Reservation.guest_id, Reservation.id)
+        for reservation in current:
+            if summaries[reservation.guest_id][1] is None:
+                summaries[reservation.guest_id][1] = reservation
+        
+        return {guest_id: tuple(summary) for guest_id, summary in summaries.items()}
+    
+    @classmethod
+    def to_dict_batch(cls, guests):
+        """Serialize a list of guests without loading each guest's reservations"""
+        summaries = cls.load_reservation_summaries([guest.id for guest in guests])
+        return [guest.to_dict(reservation_summary=summaries[guest.id]) for guest in guests]
+    
+    def to_dict(self, reservation_summary=None):
+        # reservation_summary comes from load_reservation_summaries when serializing in bulk
+        if reservation_summary is None:
+            reservation_summary = (self.total_stays, self.current_reservation)
+        total_stays, current_reservation = reservation_summary
         return {
             'id': self.id,
             'first_name': self.first_name,
@@ -100,8 +166,8 @@ class Guest(db.Model):
             'corporate_account': self.corporate_account,
             'preferred_communication': self.preferred_communication,
             'marketing_consent': self.marketing_consent,
-            'total_stays': self.total_stays,
-            'current_reservation': self.current_reservation.to_dict() if self.current_reservation else None,
+            'total_stays': total_stays,
+            'current_reservation': current_reservation.to_dict() if current_reservation else None,
             # Legacy fields
             'room_number': self.room_number,
             'check_in_date': self.check_in_date.isoformat() if self.check_in_date else None,
@@ -115,7 +181,7 @@ class GuestPreference(db.Model):
     __tablename__ = 'guest_preference'
     
     id = db.Column(db.Integer, primary_key=True)
-    guest_id = db.Column(db.Integer, db.ForeignKey('guest.id'), nullable=False)
+    guest_id = db.Column(db.Integer, db.ForeignKey('guest.id'), nullable=False, index=True)
     
     # Preference Details
     preference_category = db.Column(db.String(50), nullable=False)  # room, service, dietary, communication
@@ -0,0 +1,39 @@
+from src.models.user import db
+from datetime import datetime
+
+class GuestDuplicate(db.Model):
+    """A pair of guest profiles that probably describe the same person"""
+    __tablename__ = 'guest_duplicate'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    
+    # Guest ids are stored without foreign keys so merged pairs keep their history
+    guest_id = db.Column(db.Integer, nullable=False, index=True)  # lower id of the pair
+    duplicate_guest_id = db.Column(db.Integer, nullable=False, index=True)  # higher id of the pair
+    
+    score = db.Column(db.Float, nullable=False)
+    match_keys = db.Column(db.String(100), nullable=True)  # Comma-separated blocking keys: phone, email, name_dob
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, merged, dismissed
+    
+    # System Fields
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    resolved_at = db.Column(db.DateTime, nullable=True)
+    resolved_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    
+    __table_args__ = (db.UniqueConstraint('guest_id', 'duplicate_guest_id'),)
+    
+    def __repr__(self):
+        return f'<GuestDuplicate {self.guest_id} ~ {self.duplicate_guest_id}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'guest_id': self.guest_id,
+            'duplicate_guest_id': self.duplicate_guest_id,
+            'score': self.score,
+            'match_keys': self.match_keys.split(',') if self.match_keys else [],
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
+            'resolved_by': self.resolved_by
+        }
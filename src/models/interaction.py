@@ -1,4 +1,6 @@
 from src.models.user import db
+from src.services.contact import normalize_phone, normalize_email
+from sqlalchemy.orm import validates
 from datetime import datetime
 
 class Interaction(db.Model):
@@ -21,6 +23,10 @@ class Interaction(db.Model):
     guest_email = db.Column(db.String(100), nullable=True)
     reservation_number = db.Column(db.String(50), nullable=True)
     
+    # Normalized guest_phone / guest_email for caller lookup
+    phone_e164 = db.Column(db.String(20), nullable=True, index=True)
+    email_lower = db.Column(db.String(100), nullable=True, index=True)
+    
     # Follow-up information
     follow_up_required = db.Column(db.Boolean, default=False)
     follow_up_date = db.Column(db.DateTime, nullable=True)
@@ -42,11 +48,33 @@ class Interaction(db.Model):
     assigned_user = db.relationship('User', foreign_keys=[assigned_to], lazy=True)
     comments = db.relationship('InteractionComment', backref='interaction', lazy=True, cascade='all, delete-orphan')
     attachments = db.relationship('InteractionAttachment', backref='interaction', lazy=True, cascade='all, delete-orphan')
+    
+    # Serve the open-work queue rebuild (status filter, priority/age ordering), date-range reports,
+    # the analytics cube's updated_at watermark refresh and the newest-first lists per agent,
+    # assignee and guest
+    __table_args__ = (
+        db.Index('ix_interaction_status_priority_created', 'status', 'priority_level', 'created_at'),
+        db.Index('ix_interaction_created_at', 'created_at'),
+        db.Index('ix_interaction_updated_at', 'updated_at'),
+        db.Index('ix_interaction_agent_created', 'agent_id', 'created_at'),
+        db.Index('ix_interaction_assigned_created', 'assigned_to', 'created_at'),
+        db.Index('ix_interaction_guest_created', 'guest_id', 'created_at'),
+    )
 
     def __repr__(self):
         return f'<Interaction {self.subject}>'
+    
+    @validates('guest_phone')
+    def _set_phone_e164(self, key, value):
+        self.phone_e164 = normalize_phone(value)
+        return value
+    
+    @validates('guest_email')
+    def _set_email_lower(self, key, value):
+        self.email_lower = normalize_email(value)
+        return value
 
-    def to_dict(self, include_comments=False, include_attachments=False):
+    def to_dict(self, include_comments=False, include_attachments=False, include_guest=True):
         result = {
             'id': self.id,
             'guest_id': self.guest_id,
@@ -71,7 +99,7 @@ class Interaction(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
-            'guest': self.guest_info.to_dict() if self.guest_info else None,
+            'guest': self.guest_info.to_dict() if include_guest and self.guest_info else None,
             'agent': {
                 'id': self.agent.id,
                 'first_name': self.agent.first_name,
@@ -110,11 +138,15 @@ class Interaction(db.Model):
     @staticmethod
     def get_status_options():
         return ['open', 'in_progress', 'resolved', 'escalated', 'closed']
+    
+    @staticmethod
+    def get_open_statuses():
+        return ['open', 'in_progress', 'escalated']
 
 
 class InteractionComment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    interaction_id = db.Column(db.Integer, db.ForeignKey('interaction.id'), nullable=False)
+    interaction_id = db.Column(db.Integer, db.ForeignKey('interaction.id'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     comment = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
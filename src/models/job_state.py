@@ -0,0 +1,22 @@
+from src.models.user import db
+from datetime import datetime
+
+class JobState(db.Model):
+    """Progress marker for incremental background jobs"""
+    __tablename__ = 'job_state'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    watermark = db.Column(db.Integer, nullable=False, default=0)  # last processed row id
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<JobState {self.name}: {self.watermark}>'
+    
+    @classmethod
+    def get(cls, name):
+        """Get the state row for a job, creating it on first use"""
+        state = db.session.get(cls, name)
+        if state is None:
+            state = cls(name=name, watermark=0)
+            db.session.add(state)
+        return state
@@ -13,6 +13,13 @@ class Message(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Inbox, sent box and announcements, newest first; the inbox ORs recipient and announcement
+    __table_args__ = (
+        db.Index('ix_legacy_message_recipient_created', 'recipient_id', 'created_at'),
+        db.Index('ix_legacy_message_sender_created', 'sender_id', 'created_at'),
+        db.Index('ix_legacy_message_announcement_created', 'is_announcement', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<Message {self.subject}>'
 
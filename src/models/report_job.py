@@ -0,0 +1,54 @@
+from src.models.user import db
+from datetime import datetime
+import json
+
+class ReportJob(db.Model):
+    """A report built in the background, with its result stored on disk"""
+    __tablename__ = 'report_job'
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    report_type = db.Column(db.String(50), nullable=False)  # interactions
+    params = db.Column(db.Text, nullable=False, default='{}')  # JSON of the normalized report filters
+    dedupe_key = db.Column(db.String(40), nullable=False, index=True)  # sha1 of report_type + params
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+
+    # Progress
+    rows_written = db.Column(db.Integer, nullable=False, default=0)
+    rows_total = db.Column(db.Integer, nullable=True)
+
+    # Result
+    result_path = db.Column(db.String(500), nullable=True)  # gzipped NDJSON
+    result_size = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    # System Fields
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    def __repr__(self):
+        return f'<ReportJob {self.id} {self.report_type} {self.status}>'
+
+    @property
+    def finished(self):
+        return self.status in ('completed', 'failed')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'report_type': self.report_type,
+            'params': json.loads(self.params) if self.params else {},
+            'status': self.status,
+            'rows_written': self.rows_written,
+            'rows_total': self.rows_total,
+            'progress': round(self.rows_written / self.rows_total, 4) if self.rows_total else (1.0 if self.status == 'completed' else 0.0),
+            'result_size': self.result_size,
+            'error': self.error,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
@@ -4,6 +4,9 @@ from datetime import datetime
 class Reservation(db.Model):
     __tablename__ = 'reservation'
     
+    # Reservations that occupy (or will occupy) a room
+    ACTIVE_STATUSES = ('confirmed', 'checked_in')
+    
     id = db.Column(db.Integer, primary_key=True)
     
     # Guest Information
@@ -58,6 +61,12 @@ class Reservation(db.Model):
     guest = db.relationship('Guest', foreign_keys=[guest_id], backref='guest_reservations')
     group_leader = db.relationship('Guest', foreign_keys=[group_leader_id])
     
+    # Per-guest stay counts and current-reservation lookups; date-range occupancy scans
+    __table_args__ = (
+        db.Index('ix_reservation_guest_status_check_in', 'guest_id', 'status', 'check_in_date'),
+        db.Index('ix_reservation_status_dates', 'status', 'check_in_date', 'check_out_date'),
+    )
+    
     def __repr__(self):
         return f'<Reservation {self.reservation_number}>'
     
@@ -73,7 +82,7 @@ class Reservation(db.Model):
         """Check if this is a current reservation"""
         today = datetime.utcnow().date()
         return (self.check_in_date <= today <= self.check_out_date and 
-                self.status in ['confirmed', 'checked_in'])
+                self.status in self.ACTIVE_STATUSES)
     
     @property
     def is_past(self):
@@ -0,0 +1,13 @@
+from src.models.user import db
+from datetime import datetime
+
+class SchemaVersion(db.Model):
+    """One row per applied schema migration step"""
+    __tablename__ = 'schema_version'
+
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SchemaVersion {self.version}>'
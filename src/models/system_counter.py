@@ -0,0 +1,14 @@
+from src.models.user import db
+from datetime import datetime
+
+class SystemCounter(db.Model):
+    """A running total, e.g. ``interaction:total`` or ``interaction:status:open``"""
+    __tablename__ = 'system_counters'
+
+    name = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    reconciled_at = db.Column(db.DateTime, nullable=True)  # last recount from the source table
+
+    def __repr__(self):
+        return f'<SystemCounter {self.name}: {self.value}>'
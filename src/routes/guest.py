@@ -1,14 +1,87 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_login import login_required, current_user
 from src.models.user import db
 from src.models.guest import Guest, GuestPreference
 from src.models.reservation import Reservation
 from src.models.interaction import Interaction
+from src.services import guest_search
+from src.services.contact import normalize_phone, normalize_email
+from src.models.guest_duplicate import GuestDuplicate
+from src.services import guest_dedupe
+from src.services.guest_profile import profile_cache
+from src.services.guest_segments import segment_index
+from src.services.exporter import export_response, EXPORT_FORMATS
+from src.services.guest_import import GuestImporter, parse_guest_data, iter_rows, DEFAULT_CHUNK_SIZE
 from datetime import datetime, date
 from sqlalchemy import or_, and_
+import json
+import shutil
+import tempfile
 
 guest_bp = Blueprint('guest', __name__)
 
+# Ids per IN (...) list, below SQLite's bound parameter limit
+ID_BATCH_SIZE = 900
+
+def guest_search_filter(search):
+    """Substring match on name, email and phone, used when the search index is unavailable"""
+    return or_(
+        Guest.first_name.ilike(f'%{search}%'),
+        Guest.last_name.ilike(f'%{search}%'),
+        Guest.email.ilike(f'%{search}%'),
+        Guest.phone.ilike(f'%{search}%')
+    )
+
+def apply_guest_filters(query, args):
+    """Apply the guest_type, vip_status and loyalty_level list filters in ``args``"""
+    guest_type = args.get('guest_type', '')
+    vip_status = args.get('vip_status', '')
+    loyalty_level = args.get('loyalty_level', '')
+    
+    if guest_type:
+        query = query.filter(Guest.guest_type == guest_type)
+    
+    if vip_status:
+        query = query.filter(Guest.vip_status == (vip_status.lower() == 'true'))
+    
+    if loyalty_level:
+        query = query.filter(Guest.loyalty_level == loyalty_level)
+    
+    return query
+
+def guest_filter_segment(args):
+    """The list filters in ``args`` as a segment expression for the segment index"""
+    expression = {}
+    if args.get('guest_type', ''):
+        expression['guest_type'] = args['guest_type']
+    if args.get('vip_status', ''):
+        expression['vip_status'] = args['vip_status'].lower() == 'true'
+    if args.get('loyalty_level', ''):
+        expression['loyalty_level'] = args['loyalty_level']
+    return expression
+
+def search_guests_ranked(search, query):
+    """Run a guest search through the search index, keeping only rows that match ``query``.
+
+    Returns the matching guest ids ordered by relevance.
+    """
+    ranked_ids = guest_search.ranked_ids(search)
+    if not ranked_ids:
+        return []
+    matching = set()
+    for start in range(0, len(ranked_ids), ID_BATCH_SIZE):
+        batch = ranked_ids[start:start + ID_BATCH_SIZE]
+        matching.update(guest_id for (guest_id,) in query.filter(Guest.id.in_(batch)).with_entities(Guest.id))
+    return [guest_id for guest_id in ranked_ids if guest_id in matching]
+
+def load_guests_in_order(guest_ids):
+    """Load guests by id, preserving the order of ``guest_ids``"""
+    guests_by_id = {}
+    for start in range(0, len(guest_ids), ID_BATCH_SIZE):
+        batch = guest_ids[start:start + ID_BATCH_SIZE]
+        guests_by_id.update((guest.id, guest) for guest in Guest.query.filter(Guest.id.in_(batch)))
+    return [guests_by_id[guest_id] for guest_id in guest_ids if guest_id in guests_by_id]
+
 @guest_bp.route('/api/guests', methods=['GET'])
 @login_required
 def get_guests():
@@ -19,32 +92,38 @@ def get_guests():
         
         # Search parameters
         search = request.args.get('search', '').strip()
-        guest_type = request.args.get('guest_type', '')
-        vip_status = request.args.get('vip_status', '')
-        loyalty_level = request.args.get('loyalty_level', '')
         
         # Build query
         query = Guest.query
         
-        # Apply search filter
-        if search:
-            search_filter = or_(
-                Guest.first_name.ilike(f'%{search}%'),
-                Guest.last_name.ilike(f'%{search}%'),
-                Guest.email.ilike(f'%{search}%'),
-                Guest.phone.ilike(f'%{search}%')
-            )
-            query = query.filter(search_filter)
+        # Apply search filter (the search index handles it below when available)
+        use_index = bool(search) and guest_search.is_enabled()
+        if search and not use_index:
+            query = query.filter(guest_search_filter(search))
         
         # Apply filters
-        if guest_type:
-            query = query.filter(Guest.guest_type == guest_type)
+        query = apply_guest_filters(query, request.args)
         
-        if vip_status:
-            query = query.filter(Guest.vip_status == (vip_status.lower() == 'true'))
+        # Filter counts come from the segment bitmaps instead of a COUNT over the table
+        segment = None if search and not use_index else segment_index.evaluate(guest_filter_segment(request.args))
         
-        if loyalty_level:
-            query = query.filter(Guest.loyalty_level == loyalty_level)
+        # Indexed searches are ordered by relevance rather than last update
+        if use_index:
+            # Every match, not just the scored candidates, so the total and page count are exact
+            ranked_ids = segment_index.filter_ids(segment, guest_search.ranked_ids(search))
+            total = len(ranked_ids)
+            pages = (total + per_page - 1) // per_page
+            page_ids = ranked_ids[(page - 1) * per_page:page * per_page]
+            
+            return jsonify({
+                'guests': Guest.to_dict_batch(load_guests_in_order(page_ids)),
+                'total': total,
+                'pages': pages,
+                'current_page': page,
+                'per_page': per_page,
+                'has_next': page < pages,
+                'has_prev': page > 1
+            })
         
         # Order by last updated
         query = query.order_by(Guest.updated_at.desc())
@@ -53,11 +132,14 @@ def get_guests():
         guests = query.paginate(
             page=page, 
             per_page=per_page, 
-            error_out=False
+            error_out=False,
+            count=segment is None
         )
+        if segment is not None:
+            guests.total = segment.bit_count()
         
         return jsonify({
-            'guests': [guest.to_dict() for guest in guests.items],
+            'guests': Guest.to_dict_batch(guests.items),
             'total': guests.total,
             'pages': guests.pages,
             'current_page': page,
@@ -76,9 +158,11 @@ def create_guest():
     try:
         data = request.get_json()
         
-        # Validate required fields
-        if not data.get('first_name') or not data.get('last_name'):
-            return jsonify({'error': 'First name and last name are required'}), 400
+        # Validate required fields and formats
+        try:
+            fields = parse_guest_data(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Check for duplicate email
         if data.get('email'):
@@ -87,35 +171,7 @@ def create_guest():
                 return jsonify({'error': 'A guest with this email already exists'}), 400
         
         # Create new guest
-        guest = Guest(
-            first_name=data['first_name'],
-            last_name=data['last_name'],
-            email=data.get('email'),
-            phone=data.get('phone'),
-            address=data.get('address'),
-            date_of_birth=datetime.strptime(data['date_of_birth'], '%Y-%m-%d').date() if data.get('date_of_birth') else None,
-            nationality=data.get('nationality'),
-            id_document_type=data.get('id_document_type'),
-            id_document_number=data.get('id_document_number'),
-            emergency_contact_name=data.get('emergency_contact_name'),
-            emergency_contact_phone=data.get('emergency_contact_phone'),
-            emergency_contact_relationship=data.get('emergency_contact_relationship'),
-            special_needs=data.get('special_needs'),
-            dietary_restrictions=data.get('dietary_restrictions'),
-            accessibility_requirements=data.get('accessibility_requirements'),
-            vip_status=data.get('vip_status', False),
-            loyalty_level=data.get('loyalty_level'),
-            guest_type=data.get('guest_type', 'individual'),
-            corporate_account=data.get('corporate_account'),
-            preferred_communication=data.get('preferred_communication', 'email'),
-            marketing_consent=data.get('marketing_consent', False),
-            # Legacy fields for backward compatibility
-            room_number=data.get('room_number'),
-            check_in_date=datetime.strptime(data['check_in_date'], '%Y-%m-%d').date() if data.get('check_in_date') else None,
-            check_out_date=datetime.strptime(data['check_out_date'], '%Y-%m-%d').date() if data.get('check_out_date') else None,
-            notes=data.get('notes'),
-            created_by=current_user.id
-        )
+        guest = Guest(created_by=current_user.id, **fields)
         
         db.session.add(guest)
         db.session.commit()
@@ -156,6 +212,231 @@ def get_guest(guest_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@guest_bp.route('/guests/<int:guest_id>/profile', methods=['GET'])
+@login_required
+def get_guest_profile(guest_id):
+    """Get a guest with preferences, reservations, recent interactions, open conversations and contact stats"""
+    profile = profile_cache.get(guest_id)
+    if profile is None:
+        return jsonify({'error': 'Guest not found'}), 404
+    return jsonify(profile)
+
+@guest_bp.route('/guests/segments', methods=['GET'])
+@login_required
+def get_guest_segments():
+    """Get guest counts for every value of the segment attributes"""
+    return jsonify(segment_index.facets())
+
+@guest_bp.route('/guests/segments/query', methods=['POST'])
+@login_required
+def query_guest_segment():
+    """Count the guests matching a segment expression and return a page of their ids"""
+    data = request.json or {}
+    page = max(int(data.get('page', 1)), 1)
+    per_page = min(int(data.get('per_page', 100)), 1000)
+    
+    try:
+        segment = segment_index.evaluate(data.get('segment', {}))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    total = segment.bit_count()
+    guest_ids = segment_index.page(segment, page, per_page)
+    result = {
+        'total': total,
+        'pages': (total + per_page - 1) // per_page,
+        'current_page': page,
+        'per_page': per_page,
+        'guest_ids': guest_ids
+    }
+    if data.get('include_guests'):
+        result['guests'] = Guest.to_dict_batch(load_guests_in_order(guest_ids))
+    
+    return jsonify(result)
+
+@guest_bp.route('/guests/export', methods=['GET'])
+@login_required
+def export_guests():
+    """Stream guests matching the list filters as CSV or NDJSON"""
+    file_format = request.args.get('format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'format must be one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    
+    query = apply_guest_filters(Guest.query, request.args)
+    
+    room_number = request.args.get('room_number', '')
+    if room_number:
+        query = query.filter(Guest.room_number == room_number)
+    
+    search = request.args.get('search', '').strip()
+    if search and guest_search.is_enabled():
+        query = query.filter(guest_search.match_filter(search))
+    elif search:
+        query = query.filter(guest_search_filter(search))
+    
+    columns = Guest.__table__.columns
+    query = query.with_entities(*columns).order_by(Guest.id)
+    compress = request.args.get('gzip', '').lower() in ('1', 'true')
+    
+    return export_response(query, [column.name for column in columns], 'guests', file_format, compress)
+
+@guest_bp.route('/guests/import', methods=['POST'])
+@login_required
+def import_guests():
+    """Bulk import guests from a CSV or NDJSON upload, streaming back per-row errors"""
+    upload = request.files.get('file')
+    if upload:
+        stream = upload.stream
+        filename = upload.filename or ''
+    else:
+        # Raw request body; spool it so it can be read after the response has started
+        stream = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        shutil.copyfileobj(request.stream, stream)
+        stream.seek(0)
+        filename = ''
+    
+    file_format = request.args.get('format')
+    if not file_format:
+        is_ndjson = filename.endswith(('.ndjson', '.jsonl')) or request.mimetype in ('application/x-ndjson', 'application/jsonl')
+        file_format = 'ndjson' if is_ndjson else 'csv'
+    if file_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    
+    mode = request.args.get('mode', 'upsert')
+    if mode not in ('upsert', 'insert'):
+        return jsonify({'error': 'mode must be upsert or insert'}), 400
+    
+    chunk_size = request.args.get('chunk_size', current_app.config.get('GUEST_IMPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE), type=int)
+    importer = GuestImporter(chunk_size=chunk_size, mode=mode, created_by=current_user.id)
+    
+    def generate():
+        for error in importer.run(iter_rows(stream, file_format)):
+            yield json.dumps(error) + '\n'
+        yield json.dumps({'summary': importer.summary}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@guest_bp.route('/guests/lookup', methods=['GET'])
+@login_required
+def lookup_guest():
+    """Find callers by phone or email and return them with their open interactions"""
+    phone = request.args.get('phone', '').strip()
+    email = request.args.get('email', '').strip()
+    
+    if phone:
+        phone_e164 = normalize_phone(phone)
+        if not phone_e164:
+            return jsonify({'error': 'Invalid phone number'}), 400
+        guests = Guest.query.filter(Guest.phone_e164 == phone_e164).all()
+        contact_filter = Interaction.phone_e164 == phone_e164
+    elif email:
+        email_lower = normalize_email(email)
+        guests = Guest.query.filter(Guest.email_lower == email_lower).all()
+        contact_filter = Interaction.email_lower == email_lower
+    else:
+        return jsonify({'error': 'phone or email is required'}), 400
+    
+    # Open interactions linked to the guest record or logged against the same contact details
+    guest_ids = [guest.id for guest in guests]
+    if guest_ids:
+        contact_filter = or_(contact_filter, Interaction.guest_id.in_(guest_ids))
+    interactions = Interaction.query.filter(
+        contact_filter,
+        Interaction.status.in_(Interaction.get_open_statuses())
+    ).order_by(Interaction.created_at.desc()).all()
+    
+    return jsonify({
+        'phone': normalize_phone(phone) if phone else None,
+        'email': normalize_email(email) if email and not phone else None,
+        'guests': Guest.to_dict_batch(guests),
+        'open_interactions': [interaction.to_dict() for interaction in interactions]
+    })
+
+@guest_bp.route('/guests/duplicates', methods=['GET'])
+@login_required
+def get_guest_duplicates():
+    """List duplicate guest candidates found by the dedupe job"""
+    if current_user.role != 'manager':
+        return jsonify({'error': 'Only managers can review duplicate guests'}), 403
+    
+    status = request.args.get('status', 'pending')
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    candidates = GuestDuplicate.query.filter_by(status=status).order_by(
+        GuestDuplicate.score.desc(), GuestDuplicate.id
+    ).limit(limit).all()
+    
+    guest_ids = {c.guest_id for c in candidates} | {c.duplicate_guest_id for c in candidates}
+    guests = {guest.id: guest for guest in Guest.query.filter(Guest.id.in_(guest_ids))}
+    
+    result = []
+    for candidate in candidates:
+        data = candidate.to_dict()
+        for key, guest_id in (('guest', candidate.guest_id), ('duplicate_guest', candidate.duplicate_guest_id)):
+            guest = guests.get(guest_id)
+            data[key] = {
+                'id': guest.id,
+                'full_name': guest.full_name,
+                'email': guest.email,
+                'phone': guest.phone,
+                'date_of_birth': guest.date_of_birth.isoformat() if guest.date_of_birth else None,
+                'created_at': guest.created_at.isoformat() if guest.created_at else None
+            } if guest else None
+        result.append(data)
+    
+    return jsonify(result)
+
+@guest_bp.route('/guests/duplicates/scan', methods=['POST'])
+@login_required
+def scan_guest_duplicates():
+    """Run the incremental duplicate scan over guests added since the last run"""
+    if current_user.role != 'manager':
+        return jsonify({'error': 'Only managers can run the duplicate scan'}), 403
+    
+    data = request.json or {}
+    result = guest_dedupe.run_incremental(
+        name_threshold=current_app.config.get('DEDUPE_NAME_THRESHOLD', guest_dedupe.DEFAULT_NAME_THRESHOLD),
+        full=bool(data.get('full'))
+    )
+    return jsonify(result)
+
+@guest_bp.route('/guests/duplicates/<int:candidate_id>/dismiss', methods=['POST'])
+@login_required
+def dismiss_guest_duplicate(candidate_id):
+    """Mark a duplicate candidate as two different people"""
+    if current_user.role != 'manager':
+        return jsonify({'error': 'Only managers can review duplicate guests'}), 403
+    
+    candidate = GuestDuplicate.query.get_or_404(candidate_id)
+    candidate.status = 'dismissed'
+    candidate.resolved_at = datetime.utcnow()
+    candidate.resolved_by = current_user.id
+    db.session.commit()
+    
+    return jsonify(candidate.to_dict())
+
+@guest_bp.route('/guests/merge', methods=['POST'])
+@login_required
+def merge_guests():
+    """Merge a duplicate guest into the surviving profile"""
+    if current_user.role != 'manager':
+        return jsonify({'error': 'Only managers can merge guests'}), 403
+    
+    data = request.json or {}
+    if not data.get('survivor_id') or not data.get('duplicate_id'):
+        return jsonify({'error': 'survivor_id and duplicate_id are required'}), 400
+    if data['survivor_id'] == data['duplicate_id']:
+        return jsonify({'error': 'A guest cannot be merged into itself'}), 400
+    
+    survivor = Guest.query.get_or_404(data['survivor_id'])
+    duplicate = Guest.query.get_or_404(data['duplicate_id'])
+    
+    try:
+        survivor = guest_dedupe.merge_guests(survivor, duplicate, user_id=current_user.id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify(survivor.to_dict())
+
 # Legacy routes for backward compatibility
 @guest_bp.route('/guests', methods=['GET'])
 @login_required
@@ -167,6 +448,13 @@ def get_guests_legacy():
     
     query = Guest.query
     
+    if room_number:
+        query = query.filter(Guest.room_number == room_number)
+    
+    if search and guest_search.is_enabled():
+        guests = load_guests_in_order(search_guests_ranked(search, query))
+        return jsonify(Guest.to_dict_batch(guests))
+    
     if search:
         query = query.filter(
             (Guest.first_name.contains(search)) |
@@ -175,11 +463,8 @@ def get_guests_legacy():
             (Guest.phone.contains(search))
         )
     
-    if room_number:
-        query = query.filter(Guest.room_number == room_number)
-    
     guests = query.order_by(Guest.created_at.desc()).all()
-    return jsonify([guest.to_dict() for guest in guests])
+    return jsonify(Guest.to_dict_batch(guests))
 
 @guest_bp.route('/guests', methods=['POST'])
 @login_required
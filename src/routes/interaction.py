@@ -4,6 +4,13 @@ from werkzeug.utils import secure_filename
 from src.models.user import db, User
 from src.models.interaction import Interaction, InteractionComment, InteractionAttachment
 from src.models.guest import Guest
+from src.services import counters, events
+from src.services.interaction_queue import interaction_queue, QUEUE_STATUSES
+from src.services.exporter import export_response, EXPORT_FORMATS
+from src.services.duplicates import duplicate_index, DEFAULT_WINDOW_HOURS, DEFAULT_SIMILARITY_THRESHOLD
+from src.services.room_directory import room_directory
+from src.services.response_cache import response_cache
+from src.services.write_coordinator import write_coordinator
 from datetime import datetime
 import os
 import uuid
@@ -17,22 +24,19 @@ MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-@interaction_bp.route('/interactions', methods=['GET'])
-@login_required
-def get_interactions():
-    # Get query parameters for filtering and pagination
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    interaction_type = request.args.get('type')
-    status = request.args.get('status')
-    priority_level = request.args.get('priority')
-    agent_id = request.args.get('agent_id')
-    guest_id = request.args.get('guest_id')
-    search = request.args.get('search')
-    date_from = request.args.get('date_from')
-    date_to = request.args.get('date_to')
-    
-    query = Interaction.query
+def apply_interaction_filters(query, args):
+    """Apply the interaction list filters in ``args`` to ``query``.
+    
+    Raises ValueError for malformed dates.
+    """
+    interaction_type = args.get('type')
+    status = args.get('status')
+    priority_level = args.get('priority')
+    agent_id = args.get('agent_id')
+    guest_id = args.get('guest_id')
+    search = args.get('search')
+    date_from = args.get('date_from')
+    date_to = args.get('date_to')
     
     # Apply filters
     if interaction_type:
@@ -65,19 +69,33 @@ def get_interactions():
             date_from_obj = datetime.fromisoformat(date_from.replace('Z', '+00:00'))
             query = query.filter(Interaction.created_at >= date_from_obj)
         except ValueError:
-            return jsonify({'error': 'Invalid date_from format'}), 400
+            raise ValueError('Invalid date_from format')
     
     if date_to:
         try:
             date_to_obj = datetime.fromisoformat(date_to.replace('Z', '+00:00'))
             query = query.filter(Interaction.created_at <= date_to_obj)
         except ValueError:
-            return jsonify({'error': 'Invalid date_to format'}), 400
+            raise ValueError('Invalid date_to format')
     
     # If user is an agent, only show their interactions unless they're a manager
     if current_user.role == 'agent':
         query = query.filter(Interaction.agent_id == current_user.id)
     
+    return query
+
+@interaction_bp.route('/interactions', methods=['GET'])
+@login_required
+def get_interactions():
+    # Get query parameters for filtering and pagination
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    
+    try:
+        query = apply_interaction_filters(Interaction.query, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     # Pagination
     interactions = query.order_by(Interaction.created_at.desc()).paginate(
         page=page, per_page=per_page, error_out=False
@@ -91,6 +109,25 @@ def get_interactions():
         'per_page': per_page
     })
 
+@interaction_bp.route('/interactions/export', methods=['GET'])
+@login_required
+def export_interactions():
+    """Stream interactions matching the list filters as CSV or NDJSON"""
+    file_format = request.args.get('format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'format must be one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    
+    try:
+        query = apply_interaction_filters(Interaction.query, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    columns = Interaction.__table__.columns
+    query = query.with_entities(*columns).order_by(Interaction.created_at.desc())
+    compress = request.args.get('gzip', '').lower() in ('1', 'true')
+    
+    return export_response(query, [column.name for column in columns], 'interactions', file_format, compress)
+
 @interaction_bp.route('/interactions', methods=['POST'])
 @login_required
 def create_interaction():
@@ -117,11 +154,17 @@ def create_interaction():
         return jsonify({'error': f'status must be one of: {", ".join(Interaction.get_status_options())}'}), 400
     
     # Check if guest exists (if guest_id provided)
-    guest = None
-    if data.get('guest_id'):
-        guest = Guest.query.get(data['guest_id'])
+    guest_id = data.get('guest_id')
+    if guest_id:
+        guest = Guest.query.get(guest_id)
         if not guest:
             return jsonify({'error': 'Guest not found'}), 404
+    elif data.get('room_number'):
+        # Link the interaction to whoever is staying in the room
+        guest_id = room_directory.current_guest_id(data['room_number'])
+        if guest_id and not Guest.query.get(guest_id):
+            # The directory can lag a guest delete or merge; never store a dangling id
+            guest_id = None
     
     # Validate assigned_to user (if provided)
     assigned_user = None
@@ -143,32 +186,50 @@ def create_interaction():
     if data.get('tags') and isinstance(data['tags'], list):
         tags = ','.join([tag.strip() for tag in data['tags'] if tag.strip()])
     
-    interaction = Interaction(
-        guest_id=data.get('guest_id'),
-        agent_id=current_user.id,
-        interaction_type=data['interaction_type'],
-        priority_level=priority_level,
-        status=status,
-        subject=data['subject'],
-        description=data['description'],
-        location=data.get('location'),
-        guest_name=data.get('guest_name'),
-        room_number=data.get('room_number'),
-        guest_phone=data.get('guest_phone'),
-        guest_email=data.get('guest_email'),
-        reservation_number=data.get('reservation_number'),
-        follow_up_required=data.get('follow_up_required', False),
-        follow_up_date=follow_up_date,
-        assigned_to=data.get('assigned_to'),
-        manager_notification=data.get('manager_notification', False),
-        resolution_notes=data.get('resolution_notes'),
-        tags=tags
-    )
+    # Optionally look for open interactions that report the same issue
+    possible_duplicates = None
+    if data.get('check_duplicates') or request.args.get('check_duplicates', '').lower() == 'true':
+        possible_duplicates = duplicate_index.find(
+            data['subject'],
+            room_number=data.get('room_number'),
+            guest_id=guest_id,
+            window_hours=current_app.config.get('DUPLICATE_WINDOW_HOURS', DEFAULT_WINDOW_HOURS),
+            threshold=current_app.config.get('DUPLICATE_SIMILARITY_THRESHOLD', DEFAULT_SIMILARITY_THRESHOLD)
+        )
     
-    db.session.add(interaction)
-    db.session.commit()
+    agent_id = current_user.id
+    
+    def work():
+        interaction = Interaction(
+            guest_id=guest_id,
+            agent_id=agent_id,
+            interaction_type=data['interaction_type'],
+            priority_level=priority_level,
+            status=status,
+            subject=data['subject'],
+            description=data['description'],
+            location=data.get('location'),
+            guest_name=data.get('guest_name'),
+            room_number=data.get('room_number'),
+            guest_phone=data.get('guest_phone'),
+            guest_email=data.get('guest_email'),
+            reservation_number=data.get('reservation_number'),
+            follow_up_required=data.get('follow_up_required', False),
+            follow_up_date=follow_up_date,
+            assigned_to=data.get('assigned_to'),
+            manager_notification=data.get('manager_notification', False),
+            resolution_notes=data.get('resolution_notes'),
+            tags=tags
+        )
+        db.session.add(interaction)
+        db.session.flush()
+        return interaction.to_dict()
+    
+    result = write_coordinator.run(work)
+    if possible_duplicates is not None:
+        result['possible_duplicates'] = possible_duplicates
     
-    return jsonify(interaction.to_dict()), 201
+    return jsonify(result), 201
 
 @interaction_bp.route('/interactions/<int:interaction_id>', methods=['GET'])
 @login_required
@@ -192,36 +253,33 @@ def update_interaction(interaction_id):
     
     data = request.json
     
-    # Update fields with validation
+    # Validate everything first; the changes are applied in one unit of work below
+    changes = {}
     if 'interaction_type' in data:
         if data['interaction_type'] not in Interaction.get_interaction_types():
             return jsonify({'error': f'interaction_type must be one of: {", ".join(Interaction.get_interaction_types())}'}), 400
-        interaction.interaction_type = data['interaction_type']
+        changes['interaction_type'] = data['interaction_type']
     
     if 'priority_level' in data:
         if data['priority_level'] not in Interaction.get_priority_levels():
             return jsonify({'error': f'priority_level must be one of: {", ".join(Interaction.get_priority_levels())}'}), 400
-        interaction.priority_level = data['priority_level']
+        changes['priority_level'] = data['priority_level']
     
     if 'status' in data:
         if data['status'] not in Interaction.get_status_options():
             return jsonify({'error': f'status must be one of: {", ".join(Interaction.get_status_options())}'}), 400
-        interaction.status = data['status']
-        
-        # Set resolved_at timestamp when status changes to resolved or closed
-        if data['status'] in ['resolved', 'closed'] and not interaction.resolved_at:
-            interaction.resolved_at = datetime.utcnow()
+        changes['status'] = data['status']
     
     # Update other fields
     for field in ['subject', 'description', 'location', 'guest_name', 'room_number', 
                   'guest_phone', 'guest_email', 'reservation_number', 'resolution_notes']:
         if field in data:
-            setattr(interaction, field, data[field])
+            changes[field] = data[field]
     
     # Update boolean fields
     for field in ['follow_up_required', 'manager_notification']:
         if field in data:
-            setattr(interaction, field, bool(data[field]))
+            changes[field] = bool(data[field])
     
     # Update assigned_to
     if 'assigned_to' in data:
@@ -229,28 +287,38 @@ def update_interaction(interaction_id):
             assigned_user = User.query.get(data['assigned_to'])
             if not assigned_user:
                 return jsonify({'error': 'Assigned user not found'}), 404
-        interaction.assigned_to = data['assigned_to']
+        changes['assigned_to'] = data['assigned_to']
     
     # Update follow_up_date
     if 'follow_up_date' in data:
         if data['follow_up_date']:
             try:
-                interaction.follow_up_date = datetime.fromisoformat(data['follow_up_date'].replace('Z', '+00:00'))
+                changes['follow_up_date'] = datetime.fromisoformat(data['follow_up_date'].replace('Z', '+00:00'))
             except ValueError:
                 return jsonify({'error': 'Invalid follow_up_date format'}), 400
         else:
-            interaction.follow_up_date = None
+            changes['follow_up_date'] = None
     
     # Update tags
     if 'tags' in data:
         if isinstance(data['tags'], list):
-            interaction.tags = ','.join([tag.strip() for tag in data['tags'] if tag.strip()])
+            changes['tags'] = ','.join([tag.strip() for tag in data['tags'] if tag.strip()])
         else:
-            interaction.tags = data['tags']
+            changes['tags'] = data['tags']
     
-    db.session.commit()
+    def work():
+        interaction = db.session.get(Interaction, interaction_id)
+        for field, value in changes.items():
+            setattr(interaction, field, value)
+        
+        # Set resolved_at timestamp when status changes to resolved or closed
+        if changes.get('status') in ['resolved', 'closed'] and not interaction.resolved_at:
+            interaction.resolved_at = datetime.utcnow()
+        
+        db.session.flush()
+        return interaction.to_dict()
     
-    return jsonify(interaction.to_dict())
+    return jsonify(write_coordinator.run(work))
 
 @interaction_bp.route('/interactions/<int:interaction_id>', methods=['DELETE'])
 @login_required
@@ -259,9 +327,13 @@ def delete_interaction(interaction_id):
     if current_user.role != 'manager':
         return jsonify({'error': 'Only managers can delete interactions'}), 403
     
-    interaction = Interaction.query.get_or_404(interaction_id)
-    db.session.delete(interaction)
-    db.session.commit()
+    Interaction.query.get_or_404(interaction_id)
+    
+    def work():
+        db.session.delete(db.session.get(Interaction, interaction_id))
+        db.session.flush()
+    
+    write_coordinator.run(work)
     
     return '', 204
 
@@ -291,16 +363,19 @@ def add_interaction_comment(interaction_id):
     if not data.get('comment'):
         return jsonify({'error': 'Comment is required'}), 400
     
-    comment = InteractionComment(
-        interaction_id=interaction_id,
-        user_id=current_user.id,
-        comment=data['comment']
-    )
+    user_id = current_user.id
     
-    db.session.add(comment)
-    db.session.commit()
+    def work():
+        comment = InteractionComment(
+            interaction_id=interaction_id,
+            user_id=user_id,
+            comment=data['comment']
+        )
+        db.session.add(comment)
+        db.session.flush()
+        return comment.to_dict()
     
-    return jsonify(comment.to_dict()), 201
+    return jsonify(write_coordinator.run(work)), 201
 
 # Quick actions
 @interaction_bp.route('/interactions/<int:interaction_id>/resolve', methods=['POST'])
@@ -314,15 +389,18 @@ def resolve_interaction(interaction_id):
     
     data = request.json or {}
     
-    interaction.status = 'resolved'
-    interaction.resolved_at = datetime.utcnow()
-    
-    if data.get('resolution_notes'):
-        interaction.resolution_notes = data['resolution_notes']
-    
-    db.session.commit()
+    def work():
+        interaction = db.session.get(Interaction, interaction_id)
+        interaction.status = 'resolved'
+        interaction.resolved_at = datetime.utcnow()
+        
+        if data.get('resolution_notes'):
+            interaction.resolution_notes = data['resolution_notes']
+        
+        db.session.flush()
+        return interaction.to_dict()
     
-    return jsonify(interaction.to_dict())
+    return jsonify(write_coordinator.run(work))
 
 @interaction_bp.route('/interactions/<int:interaction_id>/escalate', methods=['POST'])
 @login_required
@@ -335,26 +413,35 @@ def escalate_interaction(interaction_id):
     
     data = request.json or {}
     
-    interaction.status = 'escalated'
-    interaction.manager_notification = True
-    
+    manager_id = None
     if data.get('assigned_to'):
         assigned_user = User.query.get(data['assigned_to'])
         if assigned_user and assigned_user.role == 'manager':
-            interaction.assigned_to = data['assigned_to']
+            manager_id = assigned_user.id
     
-    # Add escalation comment
-    if data.get('escalation_reason'):
-        comment = InteractionComment(
-            interaction_id=interaction_id,
-            user_id=current_user.id,
-            comment=f"Escalated to management. Reason: {data['escalation_reason']}"
-        )
-        db.session.add(comment)
+    user_id = current_user.id
     
-    db.session.commit()
+    def work():
+        interaction = db.session.get(Interaction, interaction_id)
+        interaction.status = 'escalated'
+        interaction.manager_notification = True
+        
+        if manager_id:
+            interaction.assigned_to = manager_id
+        
+        # Add escalation comment
+        if data.get('escalation_reason'):
+            comment = InteractionComment(
+                interaction_id=interaction_id,
+                user_id=user_id,
+                comment=f"Escalated to management. Reason: {data['escalation_reason']}"
+            )
+            db.session.add(comment)
+        
+        db.session.flush()
+        return interaction.to_dict()
     
-    return jsonify(interaction.to_dict())
+    return jsonify(write_coordinator.run(work))
 
 @interaction_bp.route('/interactions/<int:interaction_id>/assign', methods=['POST'])
 @login_required
@@ -363,7 +450,7 @@ def assign_interaction(interaction_id):
     if current_user.role != 'manager':
         return jsonify({'error': 'Only managers can assign interactions'}), 403
     
-    interaction = Interaction.query.get_or_404(interaction_id)
+    Interaction.query.get_or_404(interaction_id)
     data = request.json
     
     if not data.get('assigned_to'):
@@ -373,24 +460,82 @@ def assign_interaction(interaction_id):
     if not assigned_user:
         return jsonify({'error': 'Assigned user not found'}), 404
     
-    interaction.assigned_to = data['assigned_to']
-    interaction.status = 'in_progress'
+    assigned_to = assigned_user.id
+    comment_text = f"Assigned to {assigned_user.first_name} {assigned_user.last_name}"
+    user_id = current_user.id
     
-    # Add assignment comment
-    comment = InteractionComment(
-        interaction_id=interaction_id,
-        user_id=current_user.id,
-        comment=f"Assigned to {assigned_user.first_name} {assigned_user.last_name}"
-    )
-    db.session.add(comment)
+    def work():
+        interaction = db.session.get(Interaction, interaction_id)
+        interaction.assigned_to = assigned_to
+        interaction.status = 'in_progress'
+        
+        # Add assignment comment
+        comment = InteractionComment(
+            interaction_id=interaction_id,
+            user_id=user_id,
+            comment=comment_text
+        )
+        db.session.add(comment)
+        
+        db.session.flush()
+        return interaction.to_dict()
+    
+    return jsonify(write_coordinator.run(work))
+
+# Work queue
+@interaction_bp.route('/interactions/queue', methods=['GET'])
+@login_required
+def get_interaction_queue():
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    
+    # Managers may look at the whole queue; everyone else sees unassigned work plus their own
+    if current_user.role == 'manager' and request.args.get('scope') == 'all':
+        items, total = interaction_queue.next_for(None, limit)
+    else:
+        items, total = interaction_queue.next_for(current_user.id, limit)
+    
+    return jsonify({
+        'queue': items,
+        'total_open': total
+    })
+
+@interaction_bp.route('/interactions/<int:interaction_id>/claim', methods=['POST'])
+@login_required
+def claim_interaction(interaction_id):
+    user_id = current_user.id
+    
+    def work():
+        # Compare-and-set on the row so two agents can never claim the same interaction;
+        # the status read first is part of the condition so the counters move by the right amount
+        previous_status = db.session.query(Interaction.status).filter(Interaction.id == interaction_id).scalar()
+        claimed = Interaction.query.filter(
+            Interaction.id == interaction_id,
+            Interaction.status.in_(QUEUE_STATUSES),
+            Interaction.status == previous_status,
+            db.or_(Interaction.assigned_to.is_(None), Interaction.assigned_to == user_id)
+        ).update({
+            'assigned_to': user_id,
+            'status': 'in_progress',
+            'updated_at': datetime.utcnow()
+        }, synchronize_session=False)
+        if claimed:
+            counters.count_bulk_change(db.session, Interaction, 'status', previous_status, 'in_progress')
+        return claimed
+    
+    claimed = write_coordinator.run(work)
+    
+    interaction = Interaction.query.get_or_404(interaction_id)
+    if not claimed:
+        return jsonify({'error': 'Interaction has already been claimed or is no longer open'}), 409
     
-    db.session.commit()
+    # Bulk updates skip the ORM flush, so tell the in-memory indexes ourselves
+    events.publish(Interaction, 'update', events.snapshot(interaction))
     
     return jsonify(interaction.to_dict())
 
-# Analytics and reporting
 @interaction_bp.route('/interactions/stats', methods=['GET'])
 @login_required
+@response_cache.cached(('interactions',))
 def get_interaction_stats():
     # Base query
     query = Interaction.query
@@ -3,6 +3,8 @@ from flask_login import login_required, current_user
 from src.models.user import db, User
 from src.models.conversation import Conversation, ConversationParticipant, ConversationMessage, MessageReaction
 from src.models.guest import Guest
+from src.services.response_cache import response_cache
+from src.services.write_coordinator import write_coordinator
 from datetime import datetime
 from sqlalchemy import or_, and_
 
@@ -72,30 +74,34 @@ def create_conversation():
                 if set(conv_participants) == set(participant_ids):
                     return jsonify(conv.to_dict(current_user.id))
         
-        # Create new conversation
-        conversation = Conversation(
-            title=data.get('title'),
-            description=data.get('description'),
-            conversation_type=conversation_type,
-            guest_id=data.get('guest_id'),
-            created_by=current_user.id
-        )
-        
-        db.session.add(conversation)
-        db.session.flush()  # Get the conversation ID
+        creator_id = current_user.id
         
-        # Add participants
-        for user_id in participant_ids:
-            participant = ConversationParticipant(
-                conversation_id=conversation.id,
-                user_id=user_id,
-                role='admin' if user_id == current_user.id else 'member'
+        def work():
+            # Create new conversation
+            conversation = Conversation(
+                title=data.get('title'),
+                description=data.get('description'),
+                conversation_type=conversation_type,
+                guest_id=data.get('guest_id'),
+                created_by=creator_id
             )
-            db.session.add(participant)
-        
-        db.session.commit()
+            
+            db.session.add(conversation)
+            db.session.flush()  # Get the conversation ID
+            
+            # Add participants
+            for user_id in participant_ids:
+                participant = ConversationParticipant(
+                    conversation_id=conversation.id,
+                    user_id=user_id,
+                    role='admin' if user_id == creator_id else 'member'
+                )
+                db.session.add(participant)
+            
+            db.session.flush()
+            return conversation.to_dict(creator_id)
         
-        return jsonify(conversation.to_dict(current_user.id)), 201
+        return jsonify(write_coordinator.run(work)), 201
         
     except Exception as e:
         db.session.rollback()
@@ -147,8 +153,12 @@ def get_messages(conversation_id):
         ).first()
         
         if participant:
-            participant.last_read_at = datetime.utcnow()
-            db.session.commit()
+            participant_id = participant.id
+            
+            def work():
+                db.session.get(ConversationParticipant, participant_id).last_read_at = datetime.utcnow()
+            
+            write_coordinator.run(work)
         
         return jsonify({
             'messages': [msg.to_dict() for msg in reversed(messages.items)],
@@ -165,10 +175,9 @@ def get_messages(conversation_id):
 
 @messaging_bp.route('/api/conversations/<int:conversation_id>/messages', methods=['POST'])
 @login_required
-def send_message():
+def send_message(conversation_id):
     """Send a message to a conversation"""
     try:
-        conversation_id = request.view_args['conversation_id']
         conversation = Conversation.query.get_or_404(conversation_id)
         
         # Check if user is a participant
@@ -185,27 +194,30 @@ def send_message():
         if not data.get('content') and not data.get('file_url'):
             return jsonify({'error': 'Message content or file is required'}), 400
         
-        # Create message
-        message = ConversationMessage(
-            conversation_id=conversation_id,
-            sender_id=current_user.id,
-            message_type=data.get('message_type', 'text'),
-            content=data.get('content'),
-            file_url=data.get('file_url'),
-            file_name=data.get('file_name'),
-            file_size=data.get('file_size'),
-            is_priority=data.get('is_priority', False),
-            reply_to_message_id=data.get('reply_to_message_id')
-        )
-        
-        db.session.add(message)
-        
-        # Update conversation timestamp
-        conversation.updated_at = datetime.utcnow()
-        
-        db.session.commit()
+        sender_id = current_user.id
+        
+        def work():
+            # Create message
+            message = ConversationMessage(
+                conversation_id=conversation_id,
+                sender_id=sender_id,
+                message_type=data.get('message_type', 'text'),
+                content=data.get('content'),
+                file_url=data.get('file_url'),
+                file_name=data.get('file_name'),
+                file_size=data.get('file_size'),
+                is_priority=data.get('is_priority', False),
+                reply_to_message_id=data.get('reply_to_message_id')
+            )
+            db.session.add(message)
+            
+            # Update conversation timestamp
+            db.session.get(Conversation, conversation_id).updated_at = datetime.utcnow()
+            
+            db.session.flush()
+            return message.to_dict()
         
-        return jsonify(message.to_dict()), 201
+        return jsonify(write_coordinator.run(work)), 201
         
     except Exception as e:
         db.session.rollback()
@@ -224,14 +236,17 @@ def edit_message(message_id):
         
         data = request.get_json()
         
-        # Update message content
-        message.content = data.get('content', message.content)
-        message.is_edited = True
-        message.updated_at = datetime.utcnow()
-        
-        db.session.commit()
+        def work():
+            # Update message content
+            message = db.session.get(ConversationMessage, message_id)
+            message.content = data.get('content', message.content)
+            message.is_edited = True
+            message.updated_at = datetime.utcnow()
+            
+            db.session.flush()
+            return message.to_dict()
         
-        return jsonify(message.to_dict())
+        return jsonify(write_coordinator.run(work))
         
     except Exception as e:
         db.session.rollback()
@@ -253,11 +268,13 @@ def delete_message(message_id):
         if message.sender_id != current_user.id and (not participant or participant.role != 'admin'):
             return jsonify({'error': 'Insufficient permissions'}), 403
         
-        # Soft delete
-        message.is_deleted = True
-        message.updated_at = datetime.utcnow()
+        def work():
+            # Soft delete
+            message = db.session.get(ConversationMessage, message_id)
+            message.is_deleted = True
+            message.updated_at = datetime.utcnow()
         
-        db.session.commit()
+        write_coordinator.run(work)
         
         return jsonify({'message': 'Message deleted successfully'})
         
@@ -282,30 +299,36 @@ def add_reaction(message_id):
         if not reaction_type:
             return jsonify({'error': 'Reaction type is required'}), 400
         
-        # Check if reaction already exists
-        existing_reaction = MessageReaction.query.filter_by(
-            message_id=message_id,
-            user_id=current_user.id,
-            reaction_type=reaction_type
-        ).first()
-        
-        if existing_reaction:
-            # Remove existing reaction (toggle)
-            db.session.delete(existing_reaction)
-            db.session.commit()
-            return jsonify({'message': 'Reaction removed'})
+        user_id = current_user.id
         
-        # Add new reaction
-        reaction = MessageReaction(
-            message_id=message_id,
-            user_id=current_user.id,
-            reaction_type=reaction_type
-        )
+        def work():
+            # Check if reaction already exists
+            existing_reaction = MessageReaction.query.filter_by(
+                message_id=message_id,
+                user_id=user_id,
+                reaction_type=reaction_type
+            ).first()
+            
+            if existing_reaction:
+                # Remove existing reaction (toggle)
+                db.session.delete(existing_reaction)
+                return None
+            
+            # Add new reaction
+            reaction = MessageReaction(
+                message_id=message_id,
+                user_id=user_id,
+                reaction_type=reaction_type
+            )
+            db.session.add(reaction)
+            db.session.flush()
+            return reaction.to_dict()
         
-        db.session.add(reaction)
-        db.session.commit()
+        reaction = write_coordinator.run(work)
+        if reaction is None:
+            return jsonify({'message': 'Reaction removed'})
         
-        return jsonify(reaction.to_dict()), 201
+        return jsonify(reaction), 201
         
     except Exception as e:
         db.session.rollback()
@@ -345,17 +368,19 @@ def add_participant(conversation_id):
         if existing_participant:
             return jsonify({'error': 'User is already a participant'}), 400
         
-        # Add participant
-        new_participant = ConversationParticipant(
-            conversation_id=conversation_id,
-            user_id=user_id,
-            role=data.get('role', 'member')
-        )
-        
-        db.session.add(new_participant)
-        db.session.commit()
+        def work():
+            # Add participant
+            new_participant = ConversationParticipant(
+                conversation_id=conversation_id,
+                user_id=user_id,
+                role=data.get('role', 'member')
+            )
+            
+            db.session.add(new_participant)
+            db.session.flush()
+            return new_participant.to_dict()
         
-        return jsonify(new_participant.to_dict()), 201
+        return jsonify(write_coordinator.run(work)), 201
         
     except Exception as e:
         db.session.rollback()
@@ -386,8 +411,12 @@ def remove_participant(conversation_id, user_id):
         if not target_participant:
             return jsonify({'error': 'Participant not found'}), 404
         
-        db.session.delete(target_participant)
-        db.session.commit()
+        target_id = target_participant.id
+        
+        def work():
+            db.session.delete(db.session.get(ConversationParticipant, target_id))
+        
+        write_coordinator.run(work)
         
         return jsonify({'message': 'Participant removed successfully'})
         
@@ -430,14 +459,18 @@ def mark_conversation_read(conversation_id):
         if not conversation.has_participant(current_user.id):
             return jsonify({'error': 'Access denied'}), 403
         
-        participant = ConversationParticipant.query.filter_by(
-            conversation_id=conversation_id,
-            user_id=current_user.id
-        ).first()
+        user_id = current_user.id
         
-        if participant:
-            participant.last_read_at = datetime.utcnow()
-            db.session.commit()
+        def work():
+            participant = ConversationParticipant.query.filter_by(
+                conversation_id=conversation_id,
+                user_id=user_id
+            ).first()
+            
+            if participant:
+                participant.last_read_at = datetime.utcnow()
+        
+        write_coordinator.run(work)
         
         return jsonify({'message': 'Conversation marked as read'})
         
@@ -447,6 +480,7 @@ def mark_conversation_read(conversation_id):
 
 @messaging_bp.route('/api/messaging/stats', methods=['GET'])
 @login_required
+@response_cache.cached(('conversations',))
 def get_messaging_stats():
     """Get messaging statistics for the current user"""
     try:
@@ -0,0 +1,66 @@
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from src.models.guest import Guest
+from src.models.reservation import Reservation
+from src.services.occupancy import occupancy_index, load_listing
+from src.services.room_directory import room_directory
+from datetime import datetime
+
+occupancy_bp = Blueprint('occupancy', __name__)
+
+def parse_day(value):
+    """Parse a YYYY-MM-DD query parameter, defaulting to today"""
+    if not value:
+        return datetime.utcnow().date()
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def occupancy_listing(lookup):
+    try:
+        day = parse_day(request.args.get('date'))
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    reservations = load_listing(lookup(day))
+    return jsonify({
+        'date': day.isoformat(),
+        'count': len(reservations),
+        'reservations': reservations
+    })
+
+@occupancy_bp.route('/occupancy/in-house', methods=['GET'])
+@login_required
+def get_in_house():
+    """Get reservations in house on a date (default today)"""
+    return occupancy_listing(occupancy_index.in_house)
+
+@occupancy_bp.route('/occupancy/arrivals', methods=['GET'])
+@login_required
+def get_arrivals():
+    """Get reservations arriving on a date (default today)"""
+    return occupancy_listing(occupancy_index.arrivals)
+
+@occupancy_bp.route('/occupancy/departures', methods=['GET'])
+@login_required
+def get_departures():
+    """Get reservations departing on a date (default today)"""
+    return occupancy_listing(occupancy_index.departures)
+
+@occupancy_bp.route('/rooms/<room_number>/occupant', methods=['GET'])
+@login_required
+def get_room_occupant(room_number):
+    """Get the current reservation and guest for a room"""
+    occupants = room_directory.lookup(room_number)
+    if not occupants:
+        return jsonify({'error': 'Room is not occupied'}), 404
+    
+    reservation_id, guest_id = occupants[0]
+    reservation = Reservation.query.get(reservation_id)
+    guest = Guest.query.get(guest_id)
+    
+    return jsonify({
+        'room_number': room_number,
+        'reservation': reservation.to_dict() if reservation else None,
+        'guest': guest.to_dict() if guest else None,
+        # Shared rooms and same-day turnovers can have more than one current reservation
+        'other_reservation_ids': [other_id for other_id, _ in occupants[1:]]
+    })
@@ -1,16 +1,42 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, current_app, send_file, stream_with_context
 from flask_login import login_required, current_user
 from src.models.user import db, User
 from src.models.interaction import Interaction
 from src.models.guest import Guest
 from src.models.message import Message
+from src.services.occupancy_report import nightly_occupancy
+from src.services.resolution_times import resolution_times
+from src.services.interaction_timeseries import GRANULARITIES, DIMENSIONS, interaction_timeseries, interaction_rollup
+from src.services.counters import read_counters
+from src.services.forecast import volume_forecaster
+from src.services.analytics_cube import analytics_cube, REFERENCES, DIMENSIONS as CUBE_DIMENSIONS
+from src.services.response_cache import response_cache
+from src.services.sql_profiler import sql_profiler
+from src.services.report_jobs import report_jobs, interaction_report_query, ReportQueueFull
+from src.models.report_job import ReportJob
 from sqlalchemy import func, and_
 from datetime import datetime, timedelta
+import json
+import os
+import time
 
 reports_bp = Blueprint('reports', __name__)
 
+# Longest date range the nightly occupancy report covers in one request
+MAX_OCCUPANCY_REPORT_DAYS = 5 * 366
+
+# Most buckets one interaction time series returns (about three months of hours)
+MAX_TIMESERIES_BUCKETS = 2200
+
+# Longest interaction volume forecast horizon
+MAX_FORECAST_DAYS = 28
+
+# Seconds between report job status checks on the progress stream
+REPORT_JOB_POLL_SECONDS = 1
+
 @reports_bp.route('/reports/dashboard', methods=['GET'])
 @login_required
+@response_cache.cached(('interactions', 'messages', 'guests'))
 def get_dashboard_stats():
     # Get date range from query params (default to last 30 days)
     days = int(request.args.get('days', 30))
@@ -19,75 +45,39 @@ def get_dashboard_stats():
     stats = {}
     
     if current_user.role == 'manager':
-        # Manager dashboard - all data
-        stats['total_interactions'] = Interaction.query.filter(
-            Interaction.created_at >= start_date
-        ).count()
-        
-        stats['interactions_by_type'] = db.session.query(
-            Interaction.interaction_type,
-            func.count(Interaction.id).label('count')
-        ).filter(
-            Interaction.created_at >= start_date
-        ).group_by(Interaction.interaction_type).all()
+        # Manager dashboard - all data, sliced from the analytics cube
+        for key, dimension in (('interactions_by_type', 'interaction_type'),
+                               ('interactions_by_status', 'status'),
+                               ('interactions_by_priority', 'priority_level')):
+            stats[key] = [(row[dimension], row['count']) for row in analytics_cube.query((dimension,), start=start_date)]
+        stats['total_interactions'] = sum(count for _, count in stats['interactions_by_type'])
         
-        stats['interactions_by_status'] = db.session.query(
-            Interaction.status,
-            func.count(Interaction.id).label('count')
-        ).filter(
-            Interaction.created_at >= start_date
-        ).group_by(Interaction.status).all()
+        busiest = sorted(analytics_cube.query(('agent_id',), start=start_date), key=lambda row: -row['count'])[:5]
+        agents = {user.id: user for user in User.query.filter(User.id.in_([row['agent_id'] for row in busiest]))}
+        stats['top_agents'] = [
+            {'first_name': agents[row['agent_id']].first_name,
+             'last_name': agents[row['agent_id']].last_name,
+             'interaction_count': row['count']}
+            for row in busiest if row['agent_id'] in agents
+        ]
         
-        stats['interactions_by_priority'] = db.session.query(
-            Interaction.priority,
-            func.count(Interaction.id).label('count')
-        ).filter(
-            Interaction.created_at >= start_date
-        ).group_by(Interaction.priority).all()
-        
-        stats['top_agents'] = db.session.query(
-            User.first_name,
-            User.last_name,
-            func.count(Interaction.id).label('interaction_count')
-        ).join(Interaction).filter(
-            Interaction.created_at >= start_date
-        ).group_by(User.id).order_by(
-            func.count(Interaction.id).desc()
-        ).limit(5).all()
-        
-        stats['total_guests'] = Guest.query.count()
+        stats['total_guests'] = read_counters().get('guest:total', 0)
         stats['total_messages'] = Message.query.filter(
             Message.created_at >= start_date
         ).count()
         
     else:
         # Agent dashboard - only their data
-        stats['my_interactions'] = Interaction.query.filter(
-            and_(
-                Interaction.agent_id == current_user.id,
-                Interaction.created_at >= start_date
-            )
-        ).count()
-        
-        stats['my_interactions_by_type'] = db.session.query(
-            Interaction.interaction_type,
-            func.count(Interaction.id).label('count')
-        ).filter(
-            and_(
-                Interaction.agent_id == current_user.id,
-                Interaction.created_at >= start_date
-            )
-        ).group_by(Interaction.interaction_type).all()
-        
-        stats['my_interactions_by_status'] = db.session.query(
-            Interaction.status,
-            func.count(Interaction.id).label('count')
-        ).filter(
-            and_(
-                Interaction.agent_id == current_user.id,
-                Interaction.created_at >= start_date
-            )
-        ).group_by(Interaction.status).all()
+        mine = {'agent_id': [current_user.id]}
+        stats['my_interactions_by_type'] = [
+            (row['interaction_type'], row['count'])
+            for row in analytics_cube.query(('interaction_type',), filters=mine, start=start_date)
+        ]
+        stats['my_interactions_by_status'] = [
+            (row['status'], row['count'])
+            for row in analytics_cube.query(('status',), filters=mine, start=start_date)
+        ]
+        stats['my_interactions'] = sum(count for _, count in stats['my_interactions_by_type'])
     
     # Unread messages count for both roles
     stats['unread_messages'] = Message.query.filter(
@@ -102,49 +92,23 @@ def get_dashboard_stats():
         if hasattr(value, '__iter__') and not isinstance(value, (str, dict)):
             try:
                 stats[key] = [{'type': item[0], 'count': item[1]} for item in value]
-            except (IndexError, TypeError):
+            except (IndexError, KeyError, TypeError):
                 pass
     
     return jsonify(stats)
 
 @reports_bp.route('/reports/interactions', methods=['GET'])
 @login_required
+@response_cache.cached(('interactions', 'guests'), per_user=False)
 def get_interaction_report():
     # Only managers can access detailed reports
     if current_user.role != 'manager':
         return jsonify({'error': 'Access denied'}), 403
     
-    # Get query parameters
-    start_date_str = request.args.get('start_date')
-    end_date_str = request.args.get('end_date')
-    interaction_type = request.args.get('type')
-    agent_id = request.args.get('agent_id')
-    
-    query = Interaction.query
-    
-    # Apply date filters
-    if start_date_str:
-        try:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-            query = query.filter(Interaction.created_at >= start_date)
-        except ValueError:
-            return jsonify({'error': 'Invalid start_date format. Use YYYY-MM-DD'}), 400
-    
-    if end_date_str:
-        try:
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-            # Add one day to include the entire end date
-            end_date = end_date + timedelta(days=1)
-            query = query.filter(Interaction.created_at < end_date)
-        except ValueError:
-            return jsonify({'error': 'Invalid end_date format. Use YYYY-MM-DD'}), 400
-    
-    # Apply other filters
-    if interaction_type:
-        query = query.filter(Interaction.interaction_type == interaction_type)
-    
-    if agent_id:
-        query = query.filter(Interaction.agent_id == agent_id)
+    try:
+        query = interaction_report_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     interactions = query.order_by(Interaction.created_at.desc()).all()
     
@@ -155,31 +119,33 @@ def get_interaction_report():
 
 @reports_bp.route('/reports/summary', methods=['GET'])
 @login_required
+@response_cache.cached(('interactions', 'messages', 'guests'), per_user=False)
 def get_summary_report():
     # Only managers can access summary reports
     if current_user.role != 'manager':
         return jsonify({'error': 'Access denied'}), 403
     
-    # Get overall statistics
-    total_users = User.query.count()
-    total_agents = User.query.filter_by(role='agent').count()
-    total_managers = User.query.filter_by(role='manager').count()
-    total_guests = Guest.query.count()
-    total_interactions = Interaction.query.count()
-    total_messages = Message.query.count()
+    # Totals come from the maintained counters in one query
+    counters = read_counters()
+    total_users = counters.get('user:total', 0)
+    total_agents = counters.get('user:role:agent', 0)
+    total_managers = counters.get('user:role:manager', 0)
+    total_guests = counters.get('guest:total', 0)
+    total_interactions = counters.get('interaction:total', 0)
+    total_messages = counters.get('message:total', 0)
     
-    # Get recent activity (last 7 days)
+    # Recent activity (last 7 days); interactions come from the daily rollup
+    interaction_rollup.ensure_loaded()
+    today = (datetime.utcnow() + timedelta(minutes=interaction_rollup.offset)).date()
+    recent_interactions = sum(interaction_rollup.counts(today - timedelta(days=6), today, 'day').values())
     week_ago = datetime.utcnow() - timedelta(days=7)
-    recent_interactions = Interaction.query.filter(
-        Interaction.created_at >= week_ago
-    ).count()
     recent_messages = Message.query.filter(
         Message.created_at >= week_ago
     ).count()
     
     # Get interaction statistics
-    open_interactions = Interaction.query.filter_by(status='open').count()
-    high_priority_interactions = Interaction.query.filter_by(priority='high').count()
+    open_interactions = counters.get('interaction:status:open', 0)
+    high_priority_interactions = counters.get('interaction:priority_level:high', 0)
     
     return jsonify({
         'users': {
@@ -202,3 +168,283 @@ def get_summary_report():
         }
     })
 
+
+@reports_bp.route('/reports/occupancy', methods=['GET'])
+@login_required
+@response_cache.cached(('reservations',), per_user=False)
+def get_occupancy_report():
+    # Only managers can access occupancy and revenue reports
+    if current_user.role != 'manager':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    # Default to the last 30 nights
+    try:
+        end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if request.args.get('end_date') else datetime.utcnow().date()
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() if request.args.get('start_date') else end_date - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    if start_date > end_date:
+        return jsonify({'error': 'start_date must be on or before end_date'}), 400
+    if (end_date - start_date).days > MAX_OCCUPANCY_REPORT_DAYS:
+        return jsonify({'error': f'Date range cannot exceed {MAX_OCCUPANCY_REPORT_DAYS} days'}), 400
+    
+    total_rooms = request.args.get('total_rooms', type=int)
+    
+    return jsonify(nightly_occupancy(start_date, end_date, total_rooms=total_rooms))
+
+@reports_bp.route('/reports/timeseries', methods=['GET'])
+@login_required
+@response_cache.cached(('interactions',), per_user=False)
+def get_interaction_timeseries():
+    # Only managers can access staffing reports
+    if current_user.role != 'manager':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f'granularity must be one of: {", ".join(GRANULARITIES)}'}), 400
+    
+    split_by = request.args.get('split_by') or None
+    if split_by is not None and split_by not in DIMENSIONS:
+        return jsonify({'error': f'split_by must be one of: {", ".join(DIMENSIONS)}'}), 400
+    
+    # Minutes east of UTC of the hotel's local day; defaults to the configured hotel offset
+    try:
+        tz_offset = int(request.args.get('tz_offset', current_app.config.get('HOTEL_UTC_OFFSET_MINUTES', 0)))
+    except ValueError:
+        return jsonify({'error': 'tz_offset must be a whole number of minutes'}), 400
+    if not -720 <= tz_offset <= 840:
+        return jsonify({'error': 'tz_offset must be between -720 and 840 minutes'}), 400
+    
+    # Default to the last 30 local days
+    try:
+        today = (datetime.utcnow() + timedelta(minutes=tz_offset)).date()
+        end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if request.args.get('end_date') else today
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() if request.args.get('start_date') else end_date - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    if start_date > end_date:
+        return jsonify({'error': 'start_date must be on or before end_date'}), 400
+    days = (end_date - start_date).days + 1
+    buckets = days * 24 if granularity == 'hour' else days // 7 + 2 if granularity == 'week' else days
+    if buckets > MAX_TIMESERIES_BUCKETS:
+        return jsonify({'error': f'Range is too long for {granularity} buckets (max {MAX_TIMESERIES_BUCKETS})'}), 400
+    
+    return jsonify(interaction_timeseries(
+        start_date, end_date,
+        granularity=granularity,
+        offset_minutes=tz_offset,
+        split_by=split_by,
+        interaction_type=request.args.get('type') or None,
+        agent_id=request.args.get('agent_id', type=int),
+        columnar=request.args.get('format') == 'columnar'
+    ))
+
+@reports_bp.route('/reports/resolution-times', methods=['GET'])
+@login_required
+@response_cache.cached(('interactions', 'comments'), per_user=False)
+def get_resolution_times():
+    # Only managers can access performance reports
+    if current_user.role != 'manager':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    # Default to the last 30 days
+    try:
+        end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if request.args.get('end_date') else datetime.utcnow().date()
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() if request.args.get('start_date') else end_date - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    if start_date > end_date:
+        return jsonify({'error': 'start_date must be on or before end_date'}), 400
+    
+    top = min(max(request.args.get('top', 10, type=int), 0), 100)
+    
+    result = resolution_times(
+        datetime.combine(start_date, datetime.min.time()),
+        datetime.combine(end_date + timedelta(days=1), datetime.min.time()),
+        interaction_type=request.args.get('type') or None,
+        priority_level=request.args.get('priority') or None,
+        agent_id=request.args.get('agent_id', type=int),
+        top=top
+    )
+    result['start_date'] = start_date.isoformat()
+    result['end_date'] = end_date.isoformat()
+    return jsonify(result)
+
+@reports_bp.route('/reports/cube', methods=['GET'])
+@login_required
+@response_cache.cached(('interactions',), per_user=False)
+def get_cube_slice():
+    """Interaction counts and resolution times for any group-by/filter slice, served from memory"""
+    # Only managers can slice across all agents
+    if current_user.role != 'manager':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    group_by = [dimension.strip() for dimension in request.args.get('group_by', '').split(',') if dimension.strip()]
+    if len(group_by) > 4:
+        return jsonify({'error': 'At most 4 group_by dimensions are allowed'}), 400
+    
+    # Filters take comma-separated values; 'type' and 'priority' match the other report parameters
+    filters = {}
+    for name, column in [('type', 'interaction_type'), ('priority', 'priority_level'),
+                         ('status', 'status'), ('location', 'location'),
+                         ('agent_id', 'agent_id'), ('assigned_to', 'assigned_to')]:
+        if request.args.get(name):
+            values = [value.strip() for value in request.args[name].split(',')]
+            if column in REFERENCES:
+                try:
+                    values = [int(value) for value in values]
+                except ValueError:
+                    return jsonify({'error': f'{name} must be a comma-separated list of ids'}), 400
+            filters[column] = values
+    
+    try:
+        start = datetime.strptime(request.args['start_date'], '%Y-%m-%d') if request.args.get('start_date') else None
+        end = datetime.strptime(request.args['end_date'], '%Y-%m-%d') + timedelta(days=1) if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    try:
+        rows = analytics_cube.query(group_by, filters=filters, start=start, end=end)
+    except ValueError as e:
+        return jsonify({'error': f'{e}. Use one of: {", ".join(CUBE_DIMENSIONS)}'}), 400
+    
+    if request.args.get('format') == 'columnar':
+        columns = group_by + ['count', 'resolved', 'avg_resolution_seconds']
+        return jsonify({'group_by': group_by, 'columns': {column: [row[column] for row in rows] for column in columns}})
+    
+    return jsonify({'group_by': group_by, 'rows': rows})
+
+@reports_bp.route('/reports/forecast', methods=['GET'])
+@login_required
+def get_volume_forecast():
+    # Only managers plan staffing
+    if current_user.role != 'manager':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    days = request.args.get('days', 14, type=int)
+    if not 1 <= days <= MAX_FORECAST_DAYS:
+        return jsonify({'error': f'days must be between 1 and {MAX_FORECAST_DAYS}'}), 400
+    
+    granularity = request.args.get('granularity', 'hour')
+    if granularity not in ('hour', 'day'):
+        return jsonify({'error': 'granularity must be one of: hour, day'}), 400
+    
+    return jsonify(volume_forecaster.forecast(days, granularity=granularity,
+                                              interaction_type=request.args.get('type') or None))
+
+@reports_bp.route('/reports/cache', methods=['GET'])
+@login_required
+def get_cache_stats():
+    # Only managers can see cache statistics
+    if current_user.role != 'manager':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify(response_cache.stats())
+
+@reports_bp.route('/_debug/requests', methods=['GET'])
+@login_required
+def get_request_profiles():
+    # Only managers can see request SQL profiles
+    if current_user.role != 'manager':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    profiles = sql_profiler.recent(limit=max(limit, 1),
+                                   n_plus_one_only=request.args.get('n_plus_one', '').lower() in ('1', 'true', 'yes'),
+                                   path_prefix=request.args.get('path') or None)
+    return jsonify({'requests': profiles, 'count': len(profiles)})
+
+@reports_bp.route('/reports/jobs', methods=['POST'])
+@login_required
+def create_report_job():
+    # Only managers can run background reports
+    if current_user.role != 'manager':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    data = request.get_json() or {}
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        return jsonify({'error': 'params must be an object'}), 400
+    
+    try:
+        job, created = report_jobs.submit(data.get('report_type', 'interactions'), params, user_id=current_user.id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ReportQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    
+    return jsonify({'job': job.to_dict(), 'deduplicated': not created}), 202
+
+@reports_bp.route('/reports/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_report_job(job_id):
+    if current_user.role != 'manager':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    job = db.session.get(ReportJob, job_id)
+    if not job:
+        return jsonify({'error': 'Report job not found'}), 404
+    
+    return jsonify({'job': job.to_dict()})
+
+@reports_bp.route('/reports/jobs/<job_id>/events', methods=['GET'])
+@login_required
+def stream_report_job(job_id):
+    """Server-sent events with the job status whenever its progress changes, until it finishes"""
+    if current_user.role != 'manager':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    if not db.session.get(ReportJob, job_id):
+        return jsonify({'error': 'Report job not found'}), 404
+    
+    def generate():
+        last = None
+        while True:
+            db.session.expire_all()
+            job = db.session.get(ReportJob, job_id)
+            if job is None:
+                return
+            data, finished = job.to_dict(), job.finished
+            # End the read so the stream never holds the database between checks
+            db.session.rollback()
+            state = (data['status'], data['rows_written'])
+            if state != last:
+                yield f"event: progress\ndata: {json.dumps(data)}\n\n"
+                last = state
+            if finished:
+                return
+            time.sleep(REPORT_JOB_POLL_SECONDS)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@reports_bp.route('/reports/jobs/<job_id>/result', methods=['GET'])
+@login_required
+def download_report_job(job_id):
+    """Download a finished report as gzipped NDJSON; supports Range requests for resuming"""
+    if current_user.role != 'manager':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    job = db.session.get(ReportJob, job_id)
+    if not job:
+        return jsonify({'error': 'Report job not found'}), 404
+    if job.status != 'completed':
+        return jsonify({'error': f'Report job is {job.status}', 'job': job.to_dict()}), 409
+    if not job.result_path or not os.path.exists(job.result_path):
+        return jsonify({'error': 'Report result has expired'}), 410
+    
+    return send_file(
+        job.result_path,
+        mimetype='application/gzip',
+        as_attachment=True,
+        download_name=f'{job.report_type}-report-{job.id}.ndjson.gz',
+        conditional=True
+    )
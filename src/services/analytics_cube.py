@@ -0,0 +1,282 @@
+import threading
+import numpy as np
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, select
+from src.models.user import db
+from src.models.interaction import Interaction
+from src.services import events
+
+# Enum-like string columns, stored as int16 codes into a per-column value list
+CATEGORICAL = ('interaction_type', 'status', 'priority_level', 'location')
+
+# Integer id columns; -1 stands for NULL
+REFERENCES = ('agent_id', 'assigned_to')
+
+# created_at derived dimensions
+TIME_DIMENSIONS = ('hour', 'day', 'week')
+
+DIMENSIONS = CATEGORICAL + REFERENCES + TIME_DIMENSIONS
+
+# Re-read this far behind the watermark to catch transactions that committed late
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+# Changed interaction ids per IN (...) list when re-reading them
+REFRESH_BATCH_SIZE = 900
+
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+DTYPES = dict(
+    {'id': np.int32, 'created': np.int64, 'resolved': np.int64, 'alive': np.bool_},
+    **{column: np.int16 for column in CATEGORICAL},
+    **{column: np.int32 for column in REFERENCES}
+)
+
+
+def to_seconds(value):
+    """Unix seconds of a naive UTC datetime, or -1 for None"""
+    if value is None:
+        return -1
+    return int((value - datetime(1970, 1, 1)).total_seconds())
+
+
+class AnalyticsCube:
+    """Interactions held as NumPy columns for group-by/filter slicing without SQL.
+
+    Rows live in slots ordered by id; strings are stored as small integer codes. Change
+    events queue the ids of inserted and updated interactions, which are re-read before
+    the next query, and mark deleted ones dead. An ``updated_at`` watermark is the
+    fallback for writes that raise no event. About 37 bytes per interaction plus growth
+    headroom.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._size = 0
+        self._watermark = None
+        self._changed = set()     # ids of interactions written since the last refresh
+        self._columns = {name: np.zeros(0, dtype=dtype) for name, dtype in DTYPES.items()}
+        self._values = {column: [] for column in CATEGORICAL}   # column -> values by code
+        self._codes = {column: {} for column in CATEGORICAL}    # column -> {value: code}
+
+    def _select(self, *criteria):
+        """Watermark and rows matching ``criteria``, ordered by id.
+
+        The watermark is read first, so a row updated in between is either in this
+        result or at or after the watermark for the next refresh.
+        """
+        watermark = db.session.execute(select(func.max(Interaction.updated_at)).where(*criteria)).scalar()
+        return watermark, self._rows(*criteria)
+
+    def _rows(self, *criteria):
+        if db.engine.dialect.name == 'sqlite':
+            # Day numbers to unix seconds in SQL, skipping per-row datetime parsing
+            times = [func.round((func.julianday(column) - UNIX_EPOCH_JULIAN_DAY) * 86400)
+                     for column in (Interaction.created_at, Interaction.resolved_at)]
+        else:
+            times = [Interaction.created_at, Interaction.resolved_at]
+        return db.session.connection().execute(select(
+            Interaction.id, *times,
+            *[getattr(Interaction, column) for column in CATEGORICAL + REFERENCES]
+        ).where(*criteria).order_by(Interaction.id)).all()
+
+    def _code(self, column, value):
+        codes = self._codes[column]
+        if value not in codes:
+            codes[value] = len(self._values[column])
+            self._values[column].append(value)
+        return codes[value]
+
+    def _arrays(self, rows):
+        columns = list(zip(*rows))
+        arrays = {'id': np.array(columns[0], dtype=np.int32), 'alive': np.ones(len(rows), dtype=np.bool_)}
+        for name, values in (('created', columns[1]), ('resolved', columns[2])):
+            if db.engine.dialect.name == 'sqlite':
+                arrays[name] = np.nan_to_num(np.array(values, dtype=np.float64), nan=-1).astype(np.int64)
+            else:
+                arrays[name] = np.fromiter((to_seconds(value) for value in values), dtype=np.int64, count=len(rows))
+        for offset, column in enumerate(CATEGORICAL, start=3):
+            for value in set(columns[offset]):
+                self._code(column, value)
+            arrays[column] = np.fromiter(map(self._codes[column].__getitem__, columns[offset]),
+                                         dtype=np.int16, count=len(rows))
+        for offset, column in enumerate(REFERENCES, start=3 + len(CATEGORICAL)):
+            arrays[column] = np.array([-1 if value is None else value for value in columns[offset]], dtype=np.int32)
+        return arrays
+
+    def load(self):
+        """Rebuild the cube from the interaction table"""
+        with self._lock:
+            # Changes queued so far committed before the select below, which reads them
+            self._changed = set()
+            self._values = {column: [] for column in CATEGORICAL}
+            self._codes = {column: {} for column in CATEGORICAL}
+            self._watermark, rows = self._select()
+            self._size = len(rows)
+            if rows:
+                self._columns = self._arrays(rows)
+            else:
+                self._columns = {name: np.zeros(0, dtype=dtype) for name, dtype in DTYPES.items()}
+            self._loaded = True
+
+    def refresh(self):
+        """Apply the interactions change events reported and those updated since the watermark"""
+        if not self._loaded:
+            return self.load()
+        with self._lock:
+            changed = sorted(self._changed)
+            self._changed = set()
+            criteria = [Interaction.updated_at >= self._watermark - REFRESH_OVERLAP] if self._watermark else []
+            watermark, rows = self._select(*criteria)
+            if changed:
+                by_id = {row[0]: row for row in rows}
+                for start in range(0, len(changed), REFRESH_BATCH_SIZE):
+                    batch = changed[start:start + REFRESH_BATCH_SIZE]
+                    by_id.update((row[0], row) for row in self._rows(Interaction.id.in_(batch)))
+                rows = [by_id[interaction_id] for interaction_id in sorted(by_id)]
+            if not rows:
+                return
+            arrays = self._arrays(rows)
+            self._watermark = max(self._watermark or watermark, watermark)
+
+            ids = self._columns['id'][:self._size]
+            slots = np.searchsorted(ids, arrays['id'])
+            known = (slots < self._size) & (ids[np.minimum(slots, max(self._size - 1, 0))] == arrays['id']) \
+                if self._size else np.zeros(len(rows), dtype=np.bool_)
+            for name in DTYPES:
+                self._columns[name][slots[known]] = arrays[name][known]
+
+            new = ~known
+            if new.any():
+                self._append({name: values[new] for name, values in arrays.items()})
+
+    def _append(self, arrays):
+        count = len(arrays['id'])
+        if self._size and arrays['id'][0] < self._columns['id'][self._size - 1]:
+            # Out-of-order ids (never from autoincrement); fall back to a sorted rebuild
+            merged = {name: np.concatenate((self._columns[name][:self._size], arrays[name])) for name in DTYPES}
+            order = np.argsort(merged['id'], kind='stable')
+            self._columns = {name: values[order] for name, values in merged.items()}
+            self._size += count
+            return
+        if self._size + count > len(self._columns['id']):
+            capacity = max(1024, (self._size + count) * 3 // 2)
+            for name in DTYPES:
+                grown = np.zeros(capacity, dtype=DTYPES[name])
+                grown[:self._size] = self._columns[name][:self._size]
+                self._columns[name] = grown
+        for name in DTYPES:
+            self._columns[name][self._size:self._size + count] = arrays[name]
+        self._size += count
+
+    def reset(self):
+        """Forget the loaded state so the next read rebuilds it from the database"""
+        with self._lock:
+            self._loaded = False
+            self._changed = set()
+
+    def on_change(self, op, row):
+        """Queue inserted and updated interactions for the next refresh; drop deleted ones"""
+        with self._lock:
+            # Checked under the lock: a change committed during load() is queued once it finishes
+            if not self._loaded:
+                return
+            if op != 'delete':
+                self._changed.add(row['id'])
+                return
+            self._changed.discard(row['id'])
+            ids = self._columns['id'][:self._size]
+            slot = np.searchsorted(ids, row['id'])
+            if slot < self._size and ids[slot] == row['id']:
+                self._columns['alive'][slot] = False
+
+    def nbytes(self):
+        return sum(values.nbytes for values in self._columns.values())
+
+    def query(self, group_by=(), filters=None, start=None, end=None):
+        """Count, resolved count and mean resolution seconds per combination of ``group_by`` values.
+
+        ``filters`` maps a categorical or reference column to a list of accepted values;
+        ``start``/``end`` bound created_at (UTC datetimes, end exclusive). Time dimensions
+        use the hotel's local day (HOTEL_UTC_OFFSET_MINUTES). Raises ValueError for
+        unknown dimensions.
+        """
+        for dimension in list(group_by) + list(filters or {}):
+            if dimension not in DIMENSIONS or (dimension in TIME_DIMENSIONS and dimension not in group_by):
+                raise ValueError(f'Unknown dimension: {dimension}')
+        offset = current_app.config.get('HOTEL_UTC_OFFSET_MINUTES', 0) * 60
+        self.refresh()
+
+        with self._lock:
+            columns = {name: values[:self._size] for name, values in self._columns.items()}
+            mask = columns['alive'].copy()
+            if start is not None:
+                mask &= columns['created'] >= to_seconds(start)
+            if end is not None:
+                mask &= columns['created'] < to_seconds(end)
+            for column, accepted in (filters or {}).items():
+                if column in CATEGORICAL:
+                    codes = [self._codes[column][value] for value in accepted if value in self._codes[column]]
+                    mask &= np.isin(columns[column], codes)
+                else:
+                    mask &= np.isin(columns[column], [-1 if value is None else value for value in accepted])
+            selected = {name: values[mask] for name, values in columns.items()}
+            values = {column: list(self._values[column]) for column in CATEGORICAL}
+
+        # Turn every group-by column into dense codes, then combine them into one key
+        local_seconds = selected['created'] + offset
+        keys = np.zeros(len(selected['id']), dtype=np.int64)
+        labels = []
+        for dimension in group_by:
+            if dimension == 'hour':
+                raw = local_seconds // 3600
+            elif dimension == 'day':
+                raw = local_seconds // 86400
+            elif dimension == 'week':
+                days = local_seconds // 86400
+                raw = days - (days - 4) % 7     # 1970-01-05 (day 4) was a Monday
+            else:
+                raw = selected[dimension]
+            distinct, codes = np.unique(raw, return_inverse=True)
+            keys = keys * len(distinct) + codes
+            labels.append((dimension, distinct))
+
+        resolved = selected['resolved'] >= 0
+        durations = np.where(resolved, selected['resolved'] - selected['created'], 0)
+        groups, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        resolved_counts = np.bincount(inverse, weights=resolved, minlength=len(groups))
+        duration_sums = np.bincount(inverse, weights=durations, minlength=len(groups))
+
+        # Split the combined keys back into one label per dimension
+        result = []
+        remainder = groups
+        decoded = []
+        for dimension, distinct in reversed(labels):
+            decoded.append((dimension, distinct[remainder % len(distinct)]))
+            remainder = remainder // len(distinct)
+        decoded.reverse()
+        for index in range(len(groups)):
+            row = {dimension: self._label(dimension, labels_for[index], values) for dimension, labels_for in decoded}
+            row['count'] = int(counts[index])
+            row['resolved'] = int(resolved_counts[index])
+            row['avg_resolution_seconds'] = round(duration_sums[index] / resolved_counts[index], 1) \
+                if resolved_counts[index] else None
+            result.append(row)
+        return result
+
+    def _label(self, dimension, raw, values):
+        raw = int(raw)
+        if dimension in CATEGORICAL:
+            return values[dimension][raw]
+        if dimension in REFERENCES:
+            return None if raw == -1 else raw
+        if dimension == 'hour':
+            return datetime.utcfromtimestamp(raw * 3600).strftime('%Y-%m-%dT%H:00')
+        return date.fromordinal(raw + UNIX_EPOCH_ORDINAL).isoformat()
+
+
+analytics_cube = AnalyticsCube()
+events.subscribe(Interaction, analytics_cube.on_change)
+events.on_reset(analytics_cube.reset)
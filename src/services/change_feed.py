@@ -0,0 +1,189 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.change_event import ChangeEvent
+from src.services import events
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_MINUTES = 60
+
+# Seconds between deletes of entries older than the retention
+PRUNE_INTERVAL = 60
+
+_DECODERS = {datetime: datetime.fromisoformat, date: date.fromisoformat, Decimal: Decimal}
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Cannot encode {type(value).__name__} in a change event')
+
+
+def encode(row):
+    return json.dumps(row, default=_encode_value)
+
+
+def decode(model, data):
+    """A change event row from its JSON, with dates, datetimes and decimals restored"""
+    row = json.loads(data)
+    decoders = {}
+    for attr in model.__mapper__.column_attrs:
+        try:
+            python_type = attr.columns[0].type.python_type
+        except NotImplementedError:
+            continue
+        if python_type in _DECODERS:
+            decoders[attr.key] = _DECODERS[python_type]
+    for values in (row, row.get('_previous') or {}):
+        for key, value in values.items():
+            if value is not None and key in decoders:
+                values[key] = decoders[key](value)
+    return row
+
+
+class ChangeFeed:
+    """Shares change events between the processes that serve one database.
+
+    Change events (src/services/events.py) reach only the subscribers of the process that
+    made the write. With CHANGE_FEED on, each event is also written to ``change_event`` in
+    the writing transaction, and before every request a process applies the entries other
+    processes committed since its last look, so its in-memory indexes follow every
+    worker's and every CLI command's writes. Replayed inserts are delivered as updates:
+    an index loaded after the write already holds the row, and subscribers treat an update
+    as remove-then-add.
+
+    Entries are applied in id order, which is commit order under SQLite's single writer.
+    Entries older than CHANGE_FEED_RETENTION_MINUTES are deleted; a process that has not
+    looked for half that long resets its indexes (``events.reset()``) so they reload.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._app = None
+        self._origin = uuid.uuid4().hex
+        self._last = None         # id of the last entry looked at, None until marked
+        self._synced_at = 0.0     # time.monotonic() of the last look
+        self._pruned_at = 0.0
+
+    def init_app(self, app):
+        self._app = app
+        if app.config.get('CHANGE_FEED'):
+            app.before_request(self._before_request)
+
+    def after_fork(self):
+        """Give a forked worker its own identity; it resumes from the parent's position"""
+        self._lock = threading.Lock()
+        self._origin = uuid.uuid4().hex
+
+    @property
+    def enabled(self):
+        return bool(self._app and self._app.config.get('CHANGE_FEED'))
+
+    def _recording(self):
+        return self.enabled and has_app_context() and current_app._get_current_object() is self._app
+
+    def _retention(self):
+        return timedelta(minutes=self._app.config.get('CHANGE_FEED_RETENTION_MINUTES', DEFAULT_RETENTION_MINUTES))
+
+    def _entry(self, model, op, row):
+        return {'model': model.__tablename__, 'op': op, 'row': encode(row),
+                'origin': self._origin, 'created_at': datetime.utcnow()}
+
+    def record_flush(self, session, flush_context):
+        # Runs after events' own after_flush listener has collected this flush's changes
+        if not self._recording():
+            return
+        pending = events.pending(session)
+        # Savepoint rollbacks shorten the pending list (and undo the entries written for it)
+        start = min(session.info.get('change_feed_recorded', 0), len(pending))
+        if start < len(pending):
+            session.connection().execute(ChangeEvent.__table__.insert(), [
+                self._entry(model, op, row) for model, op, row in pending[start:]
+            ])
+        session.info['change_feed_recorded'] = len(pending)
+
+    def end_transaction(self, session):
+        if not session.in_nested_transaction():
+            session.info.pop('change_feed_recorded', None)
+
+    def record_published(self, model, op, row):
+        # publish() runs after the bulk write committed, so this is a transaction of its own
+        if self._recording():
+            with db.engine.begin() as connection:
+                connection.execute(ChangeEvent.__table__.insert(), self._entry(model, op, row))
+
+    def mark(self):
+        """Skip every entry written so far; call before loading indexes from the database"""
+        with self._lock:
+            self._mark()
+
+    def _mark(self):
+        with db.engine.connect() as connection:
+            self._last = connection.execute(select(func.max(ChangeEvent.id))).scalar() or 0
+        self._synced_at = time.monotonic()
+
+    def _before_request(self):
+        # A before_request hook that returns a value replaces the response
+        self.sync()
+
+    def sync(self):
+        """Apply the entries other processes committed since the last sync; returns how many were applied"""
+        if not self.enabled:
+            return 0
+        applied = 0
+        with self._lock:
+            if self._last is None:
+                # Nothing is loaded from before this point, so there is nothing to catch up on
+                self._mark()
+            elif time.monotonic() - self._synced_at > self._retention().total_seconds() / 2:
+                # Entries this process never saw may have been pruned
+                logger.warning('Change feed fell behind; reloading in-memory indexes')
+                self._mark()
+                events.reset()
+            else:
+                with db.engine.connect() as connection:
+                    entries = connection.execute(select(
+                        ChangeEvent.id, ChangeEvent.model, ChangeEvent.op, ChangeEvent.row, ChangeEvent.origin
+                    ).where(ChangeEvent.id > self._last).order_by(ChangeEvent.id)).all()
+                models = {mapper.class_.__tablename__: mapper.class_ for mapper in db.Model.registry.mappers}
+                for entry in entries:
+                    self._last = entry.id
+                    model = models.get(entry.model)
+                    if entry.origin == self._origin or model is None:
+                        continue
+                    events.notify(model, 'update' if entry.op == 'insert' else entry.op, decode(model, entry.row))
+                    applied += 1
+                self._synced_at = time.monotonic()
+        self._prune()
+        return applied
+
+    def _prune(self):
+        now = time.monotonic()
+        if now - self._pruned_at < PRUNE_INTERVAL:
+            return
+        self._pruned_at = now
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(ChangeEvent.__table__.delete().where(
+                    ChangeEvent.created_at < datetime.utcnow() - self._retention()
+                ))
+        except Exception:
+            logger.exception('Change feed prune failed')
+
+
+change_feed = ChangeFeed()
+event.listen(Session, 'after_flush', change_feed.record_flush)
+event.listen(Session, 'after_commit', change_feed.end_transaction)
+event.listen(Session, 'after_rollback', change_feed.end_transaction)
+events.on_publish(change_feed.record_published)
@@ -0,0 +1,40 @@
+import re
+
+DEFAULT_COUNTRY_CODE = '1'
+
+_NON_DIGITS = re.compile(r'\D')
+
+
+def phone_digits(value):
+    """Strip everything but digits from a phone number"""
+    return _NON_DIGITS.sub('', value or '')
+
+
+def normalize_phone(value, default_country_code=DEFAULT_COUNTRY_CODE):
+    """Best-effort E.164 form of a phone number as typed at the desk.
+
+    Numbers written with a leading '+' or '00' are taken as international; bare
+    national numbers get ``default_country_code``. Anything too short to be a
+    dialable number returns None.
+    """
+    raw = (value or '').strip()
+    digits = phone_digits(raw)
+    if raw.startswith('00'):
+        digits = digits[2:]
+    elif not raw.startswith('+') and len(digits) == 10:
+        digits = default_country_code + digits
+    if len(digits) < 7 or len(digits) > 15:
+        return None
+    return f'+{digits}'
+
+
+def normalize_email(value):
+    """Lower-cased, trimmed email address or None"""
+    email = (value or '').strip().lower()
+    return email or None
+
+
+def looks_like_phone(term):
+    """True when a search term is a phone number rather than a name"""
+    stripped = re.sub(r'[\s().+\-]', '', term or '')
+    return len(stripped) >= 4 and stripped.isdigit()
@@ -0,0 +1,49 @@
+from sqlalchemy import inspect, text
+from src.models.user import db
+from src.models.guest import Guest
+from src.models.interaction import Interaction
+from src.services.contact import normalize_phone, normalize_email
+
+# (model, source column, shadow column, normalizer)
+SHADOW_COLUMNS = [
+    (Guest, 'phone', 'phone_e164', normalize_phone),
+    (Guest, 'email', 'email_lower', normalize_email),
+    (Interaction, 'guest_phone', 'phone_e164', normalize_phone),
+    (Interaction, 'guest_email', 'email_lower', normalize_email)
+]
+
+
+def ensure_contact_columns():
+    """Add the normalized contact columns to databases created before them"""
+    inspector = inspect(db.engine)
+    for model, source, shadow, normalizer in SHADOW_COLUMNS:
+        table = model.__table__
+        if shadow not in {column['name'] for column in inspector.get_columns(table.name)}:
+            column_type = table.c[shadow].type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {shadow} {column_type}'))
+    db.session.commit()
+
+
+def backfill_contacts(chunk_size=1000):
+    """Fill shadow columns for rows written before they existed; returns rows updated per column"""
+    updated = {}
+    for model, source, shadow, normalizer in SHADOW_COLUMNS:
+        source_column = getattr(model, source)
+        shadow_column = getattr(model, shadow)
+        count = 0
+        last_id = 0
+        while True:
+            rows = db.session.query(model.id, source_column).filter(
+                model.id > last_id,
+                source_column.isnot(None),
+                shadow_column.is_(None)
+            ).order_by(model.id).limit(chunk_size).all()
+            if not rows:
+                break
+            values = [{'id': row_id, shadow: normalizer(value)} for row_id, value in rows]
+            db.session.execute(db.update(model), [value for value in values if value[shadow]])
+            db.session.commit()
+            count += sum(1 for value in values if value[shadow])
+            last_id = rows[-1][0]
+        updated[f'{model.__tablename__}.{shadow}'] = count
+    return updated
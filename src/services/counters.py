@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+from src.models.user import db, User
+from src.models.guest import Guest
+from src.models.interaction import Interaction
+from src.models.message import Message
+from src.models.system_counter import SystemCounter
+
+logger = logging.getLogger(__name__)
+
+# Counted model -> (counter prefix, columns with a counter per value)
+COUNTED = {
+    User: ('user', ('role',)),
+    Guest: ('guest', ()),
+    Interaction: ('interaction', ('status', 'priority_level')),
+    Message: ('message', ()),
+}
+
+DEFAULT_RECONCILE_SECONDS = 3600
+
+# Seconds between the background thread's checks for a due or stale recount
+RECONCILE_POLL_SECONDS = 60
+
+# Set when a write changed a counted column whose old value was not loaded
+_state = {'stale': False}
+
+
+def counter_names(model, values):
+    """Counter names a row of ``model`` with column ``values`` contributes to"""
+    prefix, columns = COUNTED[model]
+    return [f'{prefix}:total'] + [f'{prefix}:{column}:{values[column]}' for column in columns]
+
+
+def _loaded_values(obj):
+    state = inspect(obj)
+    return {column: state.dict.get(column) for column in COUNTED[type(obj)][1]}
+
+
+@event.listens_for(Session, 'after_flush')
+def _count_changes(session, flush_context):
+    # Runs inside the flush, so counter updates commit or roll back with the write itself
+    deltas = Counter()
+    for obj in session.new:
+        if type(obj) in COUNTED:
+            for name in counter_names(type(obj), _loaded_values(obj)):
+                deltas[name] += 1
+    for obj in session.deleted:
+        if type(obj) in COUNTED:
+            for name in counter_names(type(obj), _loaded_values(obj)):
+                deltas[name] -= 1
+    for obj in session.dirty:
+        if type(obj) not in COUNTED or not COUNTED[type(obj)][1]:
+            continue
+        prefix, columns = COUNTED[type(obj)]
+        state = inspect(obj)
+        for column in columns:
+            history = state.attrs[column].history
+            if not history.added:
+                continue
+            if not history.deleted:
+                _state['stale'] = True
+                continue
+            deltas[f'{prefix}:{column}:{history.deleted[0]}'] -= 1
+            deltas[f'{prefix}:{column}:{history.added[0]}'] += 1
+
+    _apply(session, deltas)
+
+
+def count_bulk_change(session, model, column, old_value, new_value, rows=1):
+    """Move ``rows`` rows between two value counters for a bulk UPDATE, which skips the flush hook.
+
+    Call it in the same transaction as the update so both commit or roll back together.
+    """
+    prefix, _ = COUNTED[model]
+    _apply(session, {f'{prefix}:{column}:{old_value}': -rows, f'{prefix}:{column}:{new_value}': rows})
+
+
+def _apply(session, deltas):
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    table = SystemCounter.__table__
+    connection = session.connection()
+    now = datetime.utcnow()
+    for name, delta in sorted(deltas.items()):
+        result = connection.execute(table.update().where(table.c.name == name).values(
+            value=table.c.value + delta, updated_at=now
+        ))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(name=name, value=delta, updated_at=now))
+
+
+def reconcile():
+    """Recount every counter from its source table and return the counts.
+
+    The counts and the rewrite run in one transaction that takes SQLite's write lock
+    first (BEGIN IMMEDIATE), so no counted write can commit between them.
+    """
+    with db.engine.connect() as connection:
+        if db.engine.dialect.name == 'sqlite':
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+        counts = {}
+        for model, (prefix, columns) in COUNTED.items():
+            counts[f'{prefix}:total'] = connection.execute(select(func.count(model.id))).scalar()
+            for column in columns:
+                attribute = getattr(model, column)
+                for value, count in connection.execute(select(attribute, func.count(model.id)).group_by(attribute)):
+                    counts[f'{prefix}:{column}:{value}'] = count
+
+        now = datetime.utcnow()
+        table = SystemCounter.__table__
+        connection.execute(table.delete())
+        connection.execute(table.insert(), [
+            {'name': name, 'value': value, 'updated_at': now, 'reconciled_at': now}
+            for name, value in counts.items()
+        ])
+        connection.commit()
+    _state['stale'] = False
+    return counts
+
+
+def reconcile_if_due(interval):
+    """Recount if a write left the counters stale or the last recount is older than ``interval`` seconds"""
+    with db.engine.connect() as connection:
+        last = connection.execute(select(func.max(SystemCounter.reconciled_at))).scalar()
+    if _state['stale'] or last is None or last < datetime.utcnow() - timedelta(seconds=interval):
+        logger.info('Reconciling system counters')
+        reconcile()
+        return True
+    return False
+
+
+def start_reconciler(app):
+    """Start the background recount thread (again, in a forked worker)"""
+    interval = app.config.get('COUNTER_RECONCILE_SECONDS', DEFAULT_RECONCILE_SECONDS)
+    if interval > 0:
+        thread = threading.Thread(target=_reconcile_loop, args=(app, interval), name='counter-reconcile', daemon=True)
+        thread.start()
+
+
+def _reconcile_loop(app, interval):
+    while True:
+        time.sleep(min(interval, RECONCILE_POLL_SECONDS))
+        try:
+            with app.app_context():
+                reconcile_if_due(interval)
+        except Exception:
+            logger.exception('Counter reconciliation failed')
+
+
+def read_counters():
+    """All counters in one query; recounts run in the background thread or from the CLI, not here"""
+    return {name: value for name, value in db.session.query(SystemCounter.name, SystemCounter.value)}
@@ -0,0 +1,162 @@
+import threading
+from datetime import datetime, timedelta
+from src.models.user import db
+from src.models.interaction import Interaction
+from src.services import events
+
+# Interactions in these states can still be merged with a new report of the same issue
+OPEN_STATUSES = tuple(Interaction.get_open_statuses())
+
+DEFAULT_WINDOW_HOURS = 24
+DEFAULT_SIMILARITY_THRESHOLD = 0.5
+
+
+def normalize_room(room_number):
+    room = (room_number or '').strip().lower()
+    return room or None
+
+
+def subject_trigrams(subject):
+    """Break a subject into character trigrams after folding case and punctuation"""
+    words = ''.join(ch if ch.isalnum() else ' ' for ch in (subject or '').lower()).split()
+    if not words:
+        return frozenset()
+    padded = f"  {' '.join(words)} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def similarity(a, b):
+    """Jaccard similarity of two trigram sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class DuplicateIndex:
+    """In-memory index of recent open interactions, bucketed by room number and guest.
+
+    Only the buckets matching the new interaction are compared, so the lookup cost
+    depends on how many open issues a single room or guest has, not on table size.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._entries = {}
+        self._by_room = {}
+        self._by_guest = {}
+
+    def load(self, window_hours=DEFAULT_WINDOW_HOURS):
+        """Rebuild the index from the open interactions created inside the window"""
+        since = datetime.utcnow() - timedelta(hours=window_hours)
+        rows = db.session.query(
+            Interaction.id,
+            Interaction.subject,
+            Interaction.status,
+            Interaction.room_number,
+            Interaction.guest_id,
+            Interaction.created_at
+        ).filter(
+            Interaction.status.in_(OPEN_STATUSES),
+            Interaction.created_at >= since
+        ).all()
+
+        with self._lock:
+            self._entries.clear()
+            self._by_room.clear()
+            self._by_guest.clear()
+            for row in rows:
+                self._add(row._asdict())
+            self._loaded = True
+
+    def ensure_loaded(self, window_hours=DEFAULT_WINDOW_HOURS):
+        if not self._loaded:
+            self.load(window_hours)
+
+    def _add(self, row):
+        entry = {
+            'id': row['id'],
+            'subject': row['subject'],
+            'status': row['status'],
+            'room_number': row['room_number'],
+            'guest_id': row['guest_id'],
+            'created_at': row['created_at'] or datetime.utcnow(),
+            'trigrams': subject_trigrams(row['subject'])
+        }
+        self._entries[entry['id']] = entry
+        room = normalize_room(entry['room_number'])
+        if room:
+            self._by_room.setdefault(room, set()).add(entry['id'])
+        if entry['guest_id']:
+            self._by_guest.setdefault(entry['guest_id'], set()).add(entry['id'])
+
+    def _remove(self, interaction_id):
+        entry = self._entries.pop(interaction_id, None)
+        if not entry:
+            return
+        room = normalize_room(entry['room_number'])
+        if room in self._by_room:
+            self._by_room[room].discard(interaction_id)
+            if not self._by_room[room]:
+                del self._by_room[room]
+        if entry['guest_id'] in self._by_guest:
+            self._by_guest[entry['guest_id']].discard(interaction_id)
+            if not self._by_guest[entry['guest_id']]:
+                del self._by_guest[entry['guest_id']]
+
+    def reset(self):
+        """Forget the loaded state so the next read rebuilds it from the database"""
+        with self._lock:
+            self._loaded = False
+
+    def on_change(self, op, row):
+        """Keep the index in step with committed interaction writes"""
+        if not self._loaded:
+            return
+        with self._lock:
+            self._remove(row['id'])
+            if op != 'delete' and row['status'] in OPEN_STATUSES:
+                self._add(row)
+
+    def find(self, subject, room_number=None, guest_id=None,
+             window_hours=DEFAULT_WINDOW_HOURS, threshold=DEFAULT_SIMILARITY_THRESHOLD, limit=5):
+        """Return open interactions for the same room or guest with a similar subject"""
+        room = normalize_room(room_number)
+        if not room and not guest_id:
+            return []
+
+        self.ensure_loaded(window_hours)
+        since = datetime.utcnow() - timedelta(hours=window_hours)
+        trigrams = subject_trigrams(subject)
+
+        with self._lock:
+            candidate_ids = set(self._by_room.get(room, ())) if room else set()
+            if guest_id:
+                candidate_ids |= self._by_guest.get(guest_id, set())
+
+            matches = []
+            for candidate_id in candidate_ids:
+                entry = self._entries[candidate_id]
+                if entry['created_at'] < since:
+                    # Too old to be the same incident; drop it so buckets stay small
+                    self._remove(candidate_id)
+                    continue
+                score = similarity(trigrams, entry['trigrams'])
+                if score >= threshold:
+                    matches.append((score, entry))
+
+        matches.sort(key=lambda match: (-match[0], -match[1]['id']))
+        return [{
+            'id': entry['id'],
+            'subject': entry['subject'],
+            'status': entry['status'],
+            'room_number': entry['room_number'],
+            'guest_id': entry['guest_id'],
+            'created_at': entry['created_at'].isoformat(),
+            'similarity': round(score, 3)
+        } for score, entry in matches[:limit]]
+
+
+duplicate_index = DuplicateIndex()
+events.subscribe(Interaction, duplicate_index.on_change)
+events.on_reset(duplicate_index.reset)
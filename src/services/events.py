@@ -0,0 +1,134 @@
+import logging
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# model class -> list of callback(op, row) functions
+_subscribers = {}
+
+# callback(model, op, row) functions told about every publish(), e.g. to share it with other processes
+_publish_hooks = []
+
+# callback() functions that drop in-memory state built from change events
+_reset_callbacks = []
+
+
+def subscribe(model, callback):
+    """Call ``callback(op, row)`` for every committed insert, update or delete of ``model``.
+
+    ``op`` is one of 'insert', 'update' or 'delete' and ``row`` is a plain dict of the
+    model's column values, captured at flush time so callbacks never touch the session.
+    Update rows also carry ``'_previous'``: the old values of the columns that changed.
+    """
+    _subscribers.setdefault(model, []).append(callback)
+
+
+def on_publish(callback):
+    """Call ``callback(model, op, row)`` for every change passed to ``publish()``"""
+    _publish_hooks.append(callback)
+
+
+def on_reset(callback):
+    """Call ``callback()`` when change events may have been missed, so derived state is rebuilt"""
+    _reset_callbacks.append(callback)
+
+
+def reset():
+    for callback in _reset_callbacks:
+        try:
+            callback()
+        except Exception:
+            logger.exception('Change event reset failed')
+
+
+def pending(session):
+    """Changes flushed in the session's transaction and not yet dispatched, as ``(model, op, row)``"""
+    return session.info.get('pending_change_events', [])
+
+
+def publish(model, op, row):
+    """Notify subscribers directly, for writes that bypass the ORM (bulk UPDATE/DELETE)"""
+    for hook in _publish_hooks:
+        try:
+            hook(model, op, row)
+        except Exception:
+            logger.exception('Change event publish hook failed for %s', model.__name__)
+    notify(model, op, row)
+
+
+def notify(model, op, row):
+    """Call the subscribers of ``model`` with a change that needs no further recording"""
+    for callback in _subscribers.get(model, []):
+        try:
+            callback(op, row)
+        except Exception:
+            logger.exception('Change event subscriber failed for %s', model.__name__)
+
+
+def snapshot(obj):
+    """Copy the column values of a mapped object into a plain dict"""
+    state = inspect(obj)
+    return {attr.key: getattr(obj, attr.key) for attr in state.mapper.column_attrs}
+
+
+def _updated_snapshot(obj):
+    # Attribute history still holds the pre-flush values during after_flush
+    state = inspect(obj)
+    row = snapshot(obj)
+    row['_previous'] = {}
+    for attr in state.mapper.column_attrs:
+        deleted = state.attrs[attr.key].history.deleted
+        if deleted:
+            row['_previous'][attr.key] = deleted[0]
+    return row
+
+
+def _deleted_snapshot(obj):
+    # Deleted rows can no longer be refreshed, so only use what is already loaded
+    state = inspect(obj)
+    return {attr.key: state.dict.get(attr.key) for attr in state.mapper.column_attrs}
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    pending = session.info.setdefault('pending_change_events', [])
+    for obj in session.new:
+        if type(obj) in _subscribers:
+            pending.append((type(obj), 'insert', snapshot(obj)))
+    for obj in session.dirty:
+        if type(obj) in _subscribers and session.is_modified(obj):
+            pending.append((type(obj), 'update', _updated_snapshot(obj)))
+    for obj in session.deleted:
+        if type(obj) in _subscribers:
+            pending.append((type(obj), 'delete', _deleted_snapshot(obj)))
+
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_changes(session):
+    pending = session.info.pop('pending_change_events', None)
+    for model, op, row in pending or []:
+        notify(model, op, row)
+
+
+@event.listens_for(Session, 'after_transaction_create')
+def _mark_savepoint(session, transaction):
+    if transaction.nested:
+        marks = session.info.setdefault('change_event_marks', {})
+        marks[transaction] = len(session.info.get('pending_change_events', []))
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _forget_savepoint(session, transaction):
+    session.info.get('change_event_marks', {}).pop(transaction, None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    if session.in_nested_transaction():
+        # A savepoint rolled back: drop only the changes flushed since it began
+        mark = session.info.get('change_event_marks', {}).get(session.get_nested_transaction())
+        if mark is not None:
+            del session.info.get('pending_change_events', [])[mark:]
+        return
+    session.info.pop('pending_change_events', None)
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from flask import Response, stream_with_context
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+# Rows fetched from the database and written to the client per round
+BATCH_SIZE = 1000
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return _json_value(value)
+
+
+def iter_export(query, columns, file_format):
+    """Yield text chunks of ``query`` rendered as CSV or NDJSON, one batch of rows at a time.
+
+    ``query`` must select exactly ``columns`` (plain column values, not ORM objects) so
+    rows are streamed from the cursor without building model instances.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if file_format == 'csv' else None
+    if writer:
+        writer.writerow(columns)
+
+    for count, row in enumerate(query.yield_per(BATCH_SIZE), start=1):
+        if writer:
+            writer.writerow([_csv_value(value) for value in row])
+        else:
+            buffer.write(json.dumps({column: _json_value(value) for column, value in zip(columns, row)}))
+            buffer.write('\n')
+        if count % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_stream(chunks):
+    """Compress a stream of text chunks into a gzip byte stream on the fly"""
+    compressor = zlib.compressobj(wbits=31)  # 31 selects the gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(query, columns, name, file_format, compress=False):
+    """Stream ``query`` to the client as a CSV/NDJSON download, optionally gzipped"""
+    chunks = iter_export(query, columns, file_format)
+    filename = f"{name}.{file_format}"
+    if compress:
+        body = gzip_stream(chunks)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    else:
+        body = (chunk.encode('utf-8') for chunk in chunks)
+        mimetype = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,172 @@
+import threading
+import numpy as np
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, select
+from src.models.user import db
+from src.models.interaction import Interaction
+from src.services.interaction_timeseries import bucket_expression, bucket_label
+
+HOURS_PER_WEEK = 168
+
+# 1970-01-01 was a Thursday, three days after the Monday that starts slot 0
+EPOCH_WEEK_OFFSET = 72
+
+DEFAULT_HISTORY_WEEKS = 8
+DEFAULT_SMOOTHING = 0.3
+
+# Two-sided 90% normal interval
+INTERVAL_Z = 1.645
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def local_hour(moment, offset_minutes):
+    """Hours since the epoch on the hotel's local clock"""
+    return int(((moment - EPOCH).total_seconds() + offset_minutes * 60) // 3600)
+
+
+def hour_label(hour):
+    return (EPOCH + timedelta(hours=int(hour))).strftime('%Y-%m-%dT%H:00')
+
+
+class VolumeForecaster:
+    """Hour-of-week exponential smoothing of interaction volume per interaction type.
+
+    Each type keeps a level and a residual variance for each of the 168 hours of the
+    week. Every closed hour updates its slot for all types at once:
+    ``level += alpha * (actual - level)``. Smoothing 1.0 is the seasonal-naive model
+    (same hour last week). State is kept between requests and only hours that closed
+    since the last update are read from the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._types = []              # row order of the state arrays
+        self._level = np.zeros((0, HOURS_PER_WEEK))
+        self._variance = np.zeros((0, HOURS_PER_WEEK))
+        self._last_hour = None        # last closed local hour folded into the state
+        self._settings = None         # (offset, alpha, history weeks) the state was fitted with
+
+    def _hourly_counts(self, first_hour, last_hour, offset_minutes):
+        """Counts per type for local hours ``first_hour`` to ``last_hour`` inclusive, from one grouped query"""
+        bucket = bucket_expression('hour', offset_minutes)
+        low = EPOCH + timedelta(hours=first_hour, minutes=-offset_minutes)
+        high = EPOCH + timedelta(hours=last_hour + 1, minutes=-offset_minutes)
+        rows = db.session.execute(select(
+            Interaction.interaction_type, bucket, func.count(Interaction.id)
+        ).where(
+            Interaction.created_at >= low, Interaction.created_at < high
+        ).group_by(Interaction.interaction_type, bucket)).all()
+
+        for interaction_type in sorted({row[0] for row in rows} - set(self._types)):
+            self._types.append(interaction_type)
+            self._level = np.vstack((self._level, np.zeros(HOURS_PER_WEEK)))
+            self._variance = np.vstack((self._variance, np.zeros(HOURS_PER_WEEK)))
+
+        index = {interaction_type: position for position, interaction_type in enumerate(self._types)}
+        counts = np.zeros((len(self._types), last_hour - first_hour + 1))
+        for interaction_type, label, count in rows:
+            hour = local_hour(datetime.strptime(bucket_label(label, 'hour'), '%Y-%m-%dT%H:00'), 0)
+            counts[index[interaction_type], hour - first_hour] = count
+        return counts
+
+    def fit(self, now, offset_minutes, alpha, weeks):
+        """Fit the state from the last ``weeks`` whole weeks, then fold in the current week so far"""
+        week_start = local_hour(now, offset_minutes)
+        week_start -= (week_start + EPOCH_WEEK_OFFSET) % HOURS_PER_WEEK
+        first_hour = week_start - weeks * HOURS_PER_WEEK
+        self._types = []
+        self._level = np.zeros((0, HOURS_PER_WEEK))
+        self._variance = np.zeros((0, HOURS_PER_WEEK))
+        counts = self._hourly_counts(first_hour, week_start - 1, offset_minutes)
+
+        # History starts on slot 0, so it reshapes into (type, week, slot); smooth one week at a time
+        weekly = counts.reshape(len(self._types), weeks, HOURS_PER_WEEK)
+        level = weekly[:, 0, :].copy()
+        variance = weekly.var(axis=1)
+        for week in range(1, weeks):
+            error = weekly[:, week, :] - level
+            level += alpha * error
+            variance = (1 - alpha) * variance + alpha * error ** 2
+        self._level, self._variance = level, variance
+        self._last_hour = week_start - 1
+        self._settings = (offset_minutes, alpha, weeks)
+        self.update(now)
+
+    def update(self, now):
+        """Fold hours that closed since the last update into the state"""
+        offset_minutes, alpha, weeks = self._settings
+        last_hour = local_hour(now, offset_minutes) - 1
+        if last_hour <= self._last_hour:
+            return
+        if last_hour - self._last_hour > weeks * HOURS_PER_WEEK:
+            return self.fit(now, offset_minutes, alpha, weeks)
+        counts = self._hourly_counts(self._last_hour + 1, last_hour, offset_minutes)
+        for position, hour in enumerate(range(self._last_hour + 1, last_hour + 1)):
+            slot = (hour + EPOCH_WEEK_OFFSET) % HOURS_PER_WEEK
+            error = counts[:, position] - self._level[:, slot]
+            self._level[:, slot] += alpha * error
+            self._variance[:, slot] = (1 - alpha) * self._variance[:, slot] + alpha * error ** 2
+        self._last_hour = last_hour
+
+    def forecast(self, days, granularity='hour', interaction_type=None):
+        """Expected interactions with a 90% interval for each future hour or day, per type and in total"""
+        config = current_app.config
+        settings = (config.get('HOTEL_UTC_OFFSET_MINUTES', 0),
+                    config.get('FORECAST_SMOOTHING', DEFAULT_SMOOTHING),
+                    config.get('FORECAST_HISTORY_WEEKS', DEFAULT_HISTORY_WEEKS))
+        now = datetime.utcnow()
+        with self._lock:
+            if self._settings != settings:
+                self.fit(now, *settings)
+            else:
+                self.update(now)
+            types = list(self._types)
+            level, variance = self._level.copy(), self._variance.copy()
+            first_hour = self._last_hour + 1
+
+        if granularity == 'day':
+            # Whole local days, starting with today
+            first_hour -= first_hour % 24
+        hours = np.arange(first_hour, first_hour + days * 24)
+        slots = (hours + EPOCH_WEEK_OFFSET) % HOURS_PER_WEEK
+        if interaction_type is not None:
+            keep = [position for position, name in enumerate(types) if name == interaction_type]
+            types = [interaction_type]
+            level = level[keep] if keep else np.zeros((1, HOURS_PER_WEEK))
+            variance = variance[keep] if keep else np.zeros((1, HOURS_PER_WEEK))
+        expected = np.maximum(level[:, slots], 0)
+        spread = variance[:, slots]
+
+        if granularity == 'day':
+            # Variances add, treating hours as independent
+            expected = expected.reshape(len(types), days, 24).sum(axis=2)
+            spread = spread.reshape(len(types), days, 24).sum(axis=2)
+            labels = [hour_label(first_hour + day * 24)[:10] for day in range(days)]
+        else:
+            labels = [hour_label(hour) for hour in hours]
+
+        def series(expected, spread):
+            margin = INTERVAL_Z * np.sqrt(spread)
+            return {
+                'expected': expected.round(2).tolist(),
+                'lower': np.maximum(expected - margin, 0).round(2).tolist(),
+                'upper': (expected + margin).round(2).tolist()
+            }
+
+        return {
+            'model': 'seasonal_exponential_smoothing',
+            'smoothing': settings[1],
+            'history_weeks': settings[2],
+            'tz_offset': settings[0],
+            'granularity': granularity,
+            'interval': 0.9,
+            'buckets': labels,
+            'by_type': {name: series(expected[row], spread[row]) for row, name in enumerate(types)},
+            'total': series(expected.sum(axis=0), spread.sum(axis=0)) if len(types) else
+                series(np.zeros(len(labels)), np.zeros(len(labels)))
+        }
+
+
+volume_forecaster = VolumeForecaster()
@@ -0,0 +1,181 @@
+from datetime import datetime
+from difflib import SequenceMatcher
+from sqlalchemy import and_, func, or_, tuple_
+from src.models.user import db
+from src.models.guest import Guest, GuestPreference
+from src.models.reservation import Reservation
+from src.models.interaction import Interaction
+from src.models.conversation import Conversation
+from src.models.guest_duplicate import GuestDuplicate
+from src.models.job_state import JobState
+from src.services import events
+from src.services.guest_import import GUEST_FIELDS
+
+JOB_NAME = 'guest_dedupe'
+
+DEFAULT_NAME_THRESHOLD = 0.75
+DEFAULT_CHUNK_SIZE = 500
+
+
+def blocking_keys(guest):
+    """Keys that two records of the same person are likely to share"""
+    keys = []
+    if guest.phone_e164:
+        keys.append(('phone', guest.phone_e164))
+    if guest.email_lower:
+        keys.append(('email', guest.email_lower))
+    if guest.date_of_birth and guest.last_name:
+        keys.append(('name_dob', (guest.last_name.strip().lower(), guest.date_of_birth)))
+    return keys
+
+
+def name_similarity(a, b):
+    return SequenceMatcher(None, a.full_name.lower(), b.full_name.lower()).ratio()
+
+
+def _load_candidates(guests):
+    """Fetch every guest sharing a blocking key with ``guests`` in one query, bucketed by key"""
+    phones = {guest.phone_e164 for guest in guests if guest.phone_e164}
+    emails = {guest.email_lower for guest in guests if guest.email_lower}
+    names_dob = {key for guest in guests for kind, key in blocking_keys(guest) if kind == 'name_dob'}
+
+    conditions = []
+    if phones:
+        conditions.append(Guest.phone_e164.in_(phones))
+    if emails:
+        conditions.append(Guest.email_lower.in_(emails))
+    if names_dob:
+        # The birthday narrows through ix_guest_dob_last_name; the pair keeps only matching names
+        conditions.append(and_(
+            Guest.date_of_birth.in_({birthday for last_name, birthday in names_dob}),
+            tuple_(func.lower(func.trim(Guest.last_name)), Guest.date_of_birth).in_(names_dob)
+        ))
+    if not conditions:
+        return {}
+
+    buckets = {}
+    for candidate in Guest.query.filter(or_(*conditions)):
+        for key in blocking_keys(candidate):
+            buckets.setdefault(key, []).append(candidate)
+    return buckets
+
+
+def find_duplicates(guests, name_threshold=DEFAULT_NAME_THRESHOLD):
+    """Score ``guests`` against the guests they share blocking keys with.
+
+    Returns ``{(lower_id, higher_id): (score, match_keys)}``. Pairs matched on email are
+    always kept; phone and name/birthday matches also need similar names.
+    """
+    buckets = _load_candidates(guests)
+    pairs = {}
+    for guest in guests:
+        for key in blocking_keys(guest):
+            for candidate in buckets.get(key, ()):
+                if candidate.id == guest.id:
+                    continue
+                pair = (min(guest.id, candidate.id), max(guest.id, candidate.id))
+                score, keys = pairs.get(pair, (name_similarity(guest, candidate), set()))
+                keys.add(key[0])
+                pairs[pair] = (score, keys)
+
+    return {pair: (round(score, 3), ','.join(sorted(keys)))
+            for pair, (score, keys) in pairs.items()
+            if score >= name_threshold or 'email' in keys}
+
+
+def run_incremental(name_threshold=DEFAULT_NAME_THRESHOLD, chunk_size=DEFAULT_CHUNK_SIZE, full=False):
+    """Look for duplicates of guests created since the last run and record new candidates"""
+    state = JobState.get(JOB_NAME)
+    if full:
+        state.watermark = 0
+
+    scanned = 0
+    recorded = 0
+    while True:
+        guests = Guest.query.filter(Guest.id > state.watermark).order_by(Guest.id).limit(chunk_size).all()
+        if not guests:
+            break
+
+        pairs = find_duplicates(guests, name_threshold)
+        if pairs:
+            known = {(row.guest_id, row.duplicate_guest_id) for row in GuestDuplicate.query.filter(
+                GuestDuplicate.guest_id.in_({pair[0] for pair in pairs}),
+                GuestDuplicate.duplicate_guest_id.in_({pair[1] for pair in pairs})
+            )}
+            for pair, (score, match_keys) in pairs.items():
+                if pair not in known:
+                    db.session.add(GuestDuplicate(guest_id=pair[0], duplicate_guest_id=pair[1],
+                                                  score=score, match_keys=match_keys))
+                    recorded += 1
+
+        scanned += len(guests)
+        state.watermark = guests[-1].id
+        db.session.commit()
+
+    db.session.commit()
+    return {'scanned': scanned, 'candidates': recorded, 'watermark': state.watermark}
+
+
+def merge_guests(survivor, duplicate, user_id=None):
+    """Fold ``duplicate`` into ``survivor`` and delete it, all in one transaction.
+
+    Reservations, preferences, interactions and conversations are re-pointed to the
+    survivor, and any field the survivor is missing is taken from the duplicate.
+    """
+    survivor_id, duplicate_id = survivor.id, duplicate.id
+    # Rows about to be re-pointed, per model, so their indexes can be told afterwards
+    moved = {
+        Reservation: db.session.query(Reservation.id).filter(or_(
+            Reservation.guest_id == duplicate_id, Reservation.group_leader_id == duplicate_id)),
+        GuestPreference: db.session.query(GuestPreference.id).filter(GuestPreference.guest_id == duplicate_id),
+        Interaction: db.session.query(Interaction.id).filter(Interaction.guest_id == duplicate_id),
+        Conversation: db.session.query(Conversation.id).filter(Conversation.guest_id == duplicate_id),
+    }
+    moved = {model: [row_id for (row_id,) in query] for model, query in moved.items()}
+    copied = {field: getattr(duplicate, field) for field in GUEST_FIELDS}
+
+    try:
+        for model, column in ((Reservation, Reservation.guest_id),
+                              (Reservation, Reservation.group_leader_id),
+                              (GuestPreference, GuestPreference.guest_id),
+                              (Interaction, Interaction.guest_id),
+                              (Conversation, Conversation.guest_id)):
+            model.query.filter(column == duplicate_id).update(
+                {column: survivor_id}, synchronize_session=False
+            )
+
+        # Collections loaded before the re-pointing would otherwise be cascade-deleted
+        db.session.expire(duplicate)
+        db.session.expire(survivor)
+        db.session.delete(duplicate)
+        db.session.flush()
+
+        for field, value in copied.items():
+            if field == 'vip_status':
+                survivor.vip_status = bool(survivor.vip_status or value)
+            elif getattr(survivor, field) in (None, '') and value not in (None, ''):
+                setattr(survivor, field, value)
+        survivor.updated_at = datetime.utcnow()
+
+        GuestDuplicate.query.filter(
+            GuestDuplicate.guest_id == min(survivor_id, duplicate_id),
+            GuestDuplicate.duplicate_guest_id == max(survivor_id, duplicate_id)
+        ).update({'status': 'merged', 'resolved_at': datetime.utcnow(), 'resolved_by': user_id},
+                 synchronize_session=False)
+        # Other pending pairs that involved the removed profile no longer apply
+        GuestDuplicate.query.filter(
+            GuestDuplicate.status == 'pending',
+            or_(GuestDuplicate.guest_id == duplicate_id, GuestDuplicate.duplicate_guest_id == duplicate_id)
+        ).delete(synchronize_session=False)
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Bulk updates skip the ORM flush, so tell the in-memory indexes ourselves
+    for model, ids in moved.items():
+        if ids:
+            for obj in model.query.filter(model.id.in_(ids)):
+                events.publish(model, 'update', events.snapshot(obj))
+    return survivor
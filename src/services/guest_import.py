@@ -0,0 +1,164 @@
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+from src.models.user import db
+from src.models.guest import Guest
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Columns a guest row may carry, as accepted by POST /api/guests
+GUEST_FIELDS = [
+    'first_name', 'last_name', 'email', 'phone', 'address', 'date_of_birth', 'nationality',
+    'id_document_type', 'id_document_number', 'emergency_contact_name', 'emergency_contact_phone',
+    'emergency_contact_relationship', 'special_needs', 'dietary_restrictions',
+    'accessibility_requirements', 'vip_status', 'loyalty_level', 'guest_type', 'corporate_account',
+    'preferred_communication', 'marketing_consent', 'room_number', 'check_in_date', 'check_out_date',
+    'notes'
+]
+DATE_FIELDS = {'date_of_birth', 'check_in_date', 'check_out_date'}
+BOOLEAN_FIELDS = {'vip_status', 'marketing_consent'}
+
+
+def _parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return bool(value)
+
+
+def parse_guest_data(data):
+    """Validate guest data with the create_guest rules and return the column values it sets.
+
+    Only fields present in ``data`` are returned, so the result can update an existing
+    guest as well as create one. Raises ValueError with a user-facing message.
+    """
+    if not data.get('first_name') or not data.get('last_name'):
+        raise ValueError('First name and last name are required')
+
+    fields = {}
+    for field in GUEST_FIELDS:
+        if field not in data:
+            continue
+        value = data[field]
+        if field in DATE_FIELDS and value:
+            try:
+                value = datetime.strptime(value, '%Y-%m-%d').date()
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid {field} format. Use YYYY-MM-DD')
+        elif field in DATE_FIELDS:
+            value = None
+        elif field in BOOLEAN_FIELDS and value is not None:
+            value = _parse_bool(value)
+        fields[field] = value
+    return fields
+
+
+def iter_rows(stream, file_format):
+    """Yield ``(line_number, row dict)`` from a CSV or NDJSON byte stream, one row at a time"""
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if file_format == 'ndjson':
+        for line_number, line in enumerate(text_stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_number, None
+                continue
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        reader = csv.DictReader(text_stream)
+        for row in reader:
+            # Blank CSV cells mean "not provided"
+            yield reader.line_num, {key.strip(): value.strip() for key, value in row.items()
+                                    if key and value is not None and value.strip()}
+
+
+class GuestImporter:
+    """Streams guest rows into the database in chunks, one transaction per chunk.
+
+    ``mode`` is 'upsert' (rows whose email matches an existing guest update it) or
+    'insert' (such rows are rejected, as POST /api/guests does).
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, mode='upsert', created_by=None):
+        self.chunk_size = max(1, chunk_size)
+        self.mode = mode
+        self.created_by = created_by
+        self.summary = {'processed': 0, 'created': 0, 'updated': 0, 'failed': 0}
+
+    def run(self, rows):
+        """Import ``(line_number, row)`` pairs, yielding an error dict for every rejected row"""
+        chunk = []
+        for line_number, row in rows:
+            self.summary['processed'] += 1
+            if row is None:
+                yield self._fail(line_number, 'Row is not a JSON object')
+                continue
+            try:
+                chunk.append((line_number, parse_guest_data(row)))
+            except ValueError as e:
+                yield self._fail(line_number, str(e))
+                continue
+            if len(chunk) >= self.chunk_size:
+                yield from self._write_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from self._write_chunk(chunk)
+
+    def _fail(self, line_number, message):
+        self.summary['failed'] += 1
+        return {'row': line_number, 'error': message}
+
+    def _write_chunk(self, chunk):
+        try:
+            errors, counts = self._apply(chunk)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            # Something in the chunk broke a constraint; retry row by row to isolate it
+            errors, counts = [], {'created': 0, 'updated': 0}
+            for line_number, fields in chunk:
+                try:
+                    row_errors, row_counts = self._apply([(line_number, fields)])
+                    db.session.commit()
+                except SQLAlchemyError as e:
+                    db.session.rollback()
+                    row_errors, row_counts = [(line_number, str(e.orig) if e.orig else str(e))], {}
+                errors.extend(row_errors)
+                for key, value in row_counts.items():
+                    counts[key] += value
+
+        self.summary['created'] += counts['created']
+        self.summary['updated'] += counts['updated']
+        for line_number, message in errors:
+            yield self._fail(line_number, message)
+
+    def _apply(self, chunk):
+        # One IN (...) query finds every guest in the chunk that already exists
+        emails = {fields['email'] for _, fields in chunk if fields.get('email')}
+        existing = {guest.email: guest for guest in Guest.query.filter(Guest.email.in_(emails))} if emails else {}
+
+        errors = []
+        counts = {'created': 0, 'updated': 0}
+        for line_number, fields in chunk:
+            email = fields.get('email')
+            # Guests created earlier in this chunk are in ``existing`` too, so a repeated
+            # email is handled the same whether or not the rows share a chunk
+            guest = existing.get(email) if email else None
+            if guest and self.mode == 'insert':
+                errors.append((line_number, 'A guest with this email already exists'))
+                continue
+
+            if guest:
+                for field, value in fields.items():
+                    setattr(guest, field, value)
+                counts['updated'] += 1
+            else:
+                guest = Guest(created_by=self.created_by, **fields)
+                db.session.add(guest)
+                if email:
+                    existing[email] = guest
+                counts['created'] += 1
+        return errors, counts
@@ -0,0 +1,161 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy.orm import joinedload, selectinload
+from src.models.user import db
+from src.models.guest import Guest, GuestPreference
+from src.models.reservation import Reservation
+from src.models.interaction import Interaction
+from src.models.conversation import Conversation, ConversationMessage
+from src.services import events
+
+RECENT_INTERACTIONS = 10
+
+# Profiles kept in memory; the least recently viewed guest is dropped first
+CACHE_SIZE = 1000
+
+
+def _build(guest):
+    """Assemble the profile of an already loaded guest from a fixed set of queries"""
+    guest_data = guest.to_dict()
+    guest_data['preferences'] = [pref.to_dict() for pref in guest.preferences]
+    guest_data['reservations'] = [res.to_dict() for res in sorted(
+        guest.reservations, key=lambda res: res.check_in_date, reverse=True
+    )]
+
+    interactions = Interaction.query.options(
+        joinedload(Interaction.agent),
+        joinedload(Interaction.assigned_user)
+    ).filter(
+        Interaction.guest_id == guest.id
+    ).order_by(Interaction.created_at.desc()).limit(RECENT_INTERACTIONS).all()
+    # The guest is already at the top level, so it is not repeated per interaction
+    guest_data['recent_interactions'] = [interaction.to_dict(include_guest=False) for interaction in interactions]
+
+    stats = {'total_interactions': 0, 'open_interactions': 0, 'by_type': {}, 'last_contact_at': None}
+    open_statuses = Interaction.get_open_statuses()
+    counts = db.session.query(
+        Interaction.status,
+        Interaction.interaction_type,
+        db.func.count(Interaction.id),
+        db.func.max(Interaction.created_at)
+    ).filter(
+        Interaction.guest_id == guest.id
+    ).group_by(Interaction.status, Interaction.interaction_type)
+    for status, interaction_type, count, last_at in counts:
+        stats['total_interactions'] += count
+        if status in open_statuses:
+            stats['open_interactions'] += count
+        stats['by_type'][interaction_type] = stats['by_type'].get(interaction_type, 0) + count
+        if last_at and (stats['last_contact_at'] is None or last_at > stats['last_contact_at']):
+            stats['last_contact_at'] = last_at
+    stats['last_contact_at'] = stats['last_contact_at'].isoformat() if stats['last_contact_at'] else None
+    stats['total_stays'] = guest_data['total_stays']
+    stats['total_reservations'] = len(guest_data['reservations'])
+
+    conversations = Conversation.query.filter(
+        Conversation.guest_id == guest.id,
+        Conversation.is_archived == False
+    ).order_by(Conversation.updated_at.desc()).all()
+    message_stats = {}
+    if conversations:
+        message_stats = {row[0]: row[1:] for row in db.session.query(
+            ConversationMessage.conversation_id,
+            db.func.count(ConversationMessage.id),
+            db.func.max(ConversationMessage.created_at)
+        ).filter(
+            ConversationMessage.conversation_id.in_([conversation.id for conversation in conversations])
+        ).group_by(ConversationMessage.conversation_id)}
+    guest_data['open_conversations'] = []
+    for conversation in conversations:
+        message_count, last_message_at = message_stats.get(conversation.id, (0, None))
+        guest_data['open_conversations'].append({
+            'id': conversation.id,
+            'title': conversation.title,
+            'conversation_type': conversation.conversation_type,
+            'is_pinned': conversation.is_pinned,
+            'is_locked': conversation.is_locked,
+            'message_count': message_count,
+            'last_message_at': last_message_at.isoformat() if last_message_at else None,
+            'created_at': conversation.created_at.isoformat() if conversation.created_at else None,
+            'updated_at': conversation.updated_at.isoformat() if conversation.updated_at else None
+        })
+    stats['open_conversations'] = len(conversations)
+
+    guest_data['contact_stats'] = stats
+    return guest_data
+
+
+class GuestProfileCache:
+    """Assembled guest profiles keyed by guest id and the guest's updated_at.
+
+    A repeat view costs the single query that reads updated_at. Writes to a guest's
+    reservations, preferences, interactions and conversations do not touch the guest
+    row, so committed changes to those drop the cached profile instead.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self._lock = threading.Lock()
+        self._size = size
+        self._profiles = OrderedDict()   # guest id -> ((updated_at, day), profile)
+        self._conversation_guests = {}   # conversation id -> guest id, for message events
+
+    def get(self, guest_id):
+        """Return the profile dict for a guest, or None if the guest does not exist"""
+        updated_at = db.session.query(Guest.updated_at).filter(Guest.id == guest_id).scalar()
+        # Current reservation and is_current flags depend on today's date
+        version = (updated_at, datetime.utcnow().date())
+        with self._lock:
+            cached = self._profiles.get(guest_id)
+            if cached and cached[0] == version:
+                self._profiles.move_to_end(guest_id)
+                return cached[1]
+
+        guest = Guest.query.options(
+            selectinload(Guest.preferences),
+            selectinload(Guest.reservations)
+        ).filter(Guest.id == guest_id).first()
+        if guest is None:
+            self.invalidate(guest_id)
+            return None
+
+        profile = _build(guest)
+        with self._lock:
+            self._profiles[guest_id] = ((guest.updated_at, version[1]), profile)
+            self._profiles.move_to_end(guest_id)
+            while len(self._profiles) > self._size:
+                self._profiles.popitem(last=False)
+            for conversation in profile['open_conversations']:
+                self._conversation_guests[conversation['id']] = guest_id
+        return profile
+
+    def invalidate(self, guest_id):
+        with self._lock:
+            self._profiles.pop(guest_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+            self._conversation_guests.clear()
+
+    def on_guest_change(self, op, row):
+        self.invalidate(row['id'])
+
+    def on_related_change(self, op, row):
+        # A row moved to another guest also leaves the previous guest's profile
+        for guest_id in (row.get('guest_id'), row.get('_previous', {}).get('guest_id')):
+            if guest_id:
+                self.invalidate(guest_id)
+
+    def on_message_change(self, op, row):
+        guest_id = self._conversation_guests.get(row.get('conversation_id'))
+        if guest_id:
+            self.invalidate(guest_id)
+
+
+profile_cache = GuestProfileCache()
+events.subscribe(Guest, profile_cache.on_guest_change)
+for _model in (GuestPreference, Reservation, Interaction, Conversation):
+    events.subscribe(_model, profile_cache.on_related_change)
+events.subscribe(ConversationMessage, profile_cache.on_message_change)
+events.on_reset(profile_cache.clear)
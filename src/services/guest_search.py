@@ -0,0 +1,266 @@
+import logging
+from sqlalchemy import Integer, column, event, false, text
+from src.models.user import db
+from src.models.guest import Guest
+from src.services.contact import normalize_email, normalize_phone, phone_digits, looks_like_phone
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = 'guest_search'
+
+# How many full-text candidates are re-ranked in Python per search
+CANDIDATE_LIMIT = 500
+
+# Minimum name similarity for typo-tolerant matches
+FUZZY_THRESHOLD = 0.3
+
+# Typo-tolerant candidates are only looked for when exact matching finds fewer results
+FUZZY_MIN_RESULTS = 20
+FUZZY_CANDIDATE_LIMIT = 200
+
+REBUILD_CHUNK_SIZE = 5000
+
+# True once the FTS table is known to exist, False when the database is not SQLite;
+# write hooks are no-ops until then. Looked up lazily so every worker process finds
+# the table created by ``flask init-db``.
+_enabled = None
+
+
+def is_enabled(connection=None):
+    global _enabled
+    if _enabled is None:
+        if db.engine.dialect.name != 'sqlite':
+            _enabled = False
+        else:
+            found = (connection if connection is not None else db.session).execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+            ), {'name': SEARCH_TABLE}).first()
+            _enabled = True if found else None
+    return bool(_enabled)
+
+
+def _search_columns(first_name, last_name, email, phone):
+    name = f"{first_name or ''} {last_name or ''}".strip().lower()
+    e164 = normalize_phone(phone)
+    return {
+        'name': name,
+        'email': normalize_email(email) or '',
+        'phone': e164[1:] if e164 else phone_digits(phone)
+    }
+
+
+def ensure_index():
+    """Create the SQLite FTS5 guest index if needed and fill it when it is out of step"""
+    global _enabled
+    if db.engine.dialect.name != 'sqlite':
+        logger.info('Guest search index requires SQLite; falling back to LIKE search')
+        return False
+
+    db.session.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+        "USING fts5(name, email, phone, tokenize='trigram')"
+    ))
+    indexed = db.session.execute(text(f'SELECT count(*) FROM {SEARCH_TABLE}')).scalar()
+    db.session.commit()
+    _enabled = True
+
+    if indexed != Guest.query.count():
+        rebuild()
+    return True
+
+
+def rebuild():
+    """Re-index every guest in chunks"""
+    db.session.execute(text(f'DELETE FROM {SEARCH_TABLE}'))
+    rows = db.session.query(
+        Guest.id, Guest.first_name, Guest.last_name, Guest.email, Guest.phone
+    ).execution_options(yield_per=REBUILD_CHUNK_SIZE)
+
+    chunk = []
+    for row in rows:
+        chunk.append(dict(_search_columns(row.first_name, row.last_name, row.email, row.phone), id=row.id))
+        if len(chunk) >= REBUILD_CHUNK_SIZE:
+            _insert_rows(db.session, chunk)
+            chunk = []
+    if chunk:
+        _insert_rows(db.session, chunk)
+    db.session.commit()
+
+
+def _insert_rows(connection, rows):
+    connection.execute(text(
+        f'INSERT INTO {SEARCH_TABLE} (rowid, name, email, phone) VALUES (:id, :name, :email, :phone)'
+    ), rows)
+
+
+# The index is written on the same connection as the guest row, so it commits or
+# rolls back together with it.
+@event.listens_for(Guest, 'after_insert')
+def _index_guest(mapper, connection, guest):
+    if is_enabled(connection):
+        _insert_rows(connection, [dict(
+            _search_columns(guest.first_name, guest.last_name, guest.email, guest.phone), id=guest.id
+        )])
+
+
+@event.listens_for(Guest, 'after_update')
+def _reindex_guest(mapper, connection, guest):
+    if is_enabled(connection):
+        connection.execute(text(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = :id'), {'id': guest.id})
+        _index_guest(mapper, connection, guest)
+
+
+@event.listens_for(Guest, 'after_delete')
+def _unindex_guest(mapper, connection, guest):
+    if is_enabled(connection):
+        connection.execute(text(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = :id'), {'id': guest.id})
+
+
+def _quote(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _trigrams(word):
+    padded = f' {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _word_score(query_word, name_words):
+    """1.0 for an exact word, 0.8 for a prefix, otherwise trigram similarity"""
+    best = 0.0
+    query_grams = _trigrams(query_word)
+    for word in name_words:
+        if word == query_word:
+            return 1.0
+        if word.startswith(query_word):
+            best = max(best, 0.8)
+        else:
+            grams = _trigrams(word)
+            best = max(best, len(query_grams & grams) / len(query_grams | grams))
+    return best
+
+
+def _query(term):
+    """How ``term`` is looked up, as ``(kind, where, order, parameters)``; None when it cannot match"""
+    if '@' in term:
+        email = normalize_email(term)
+        if len(email) < 3:
+            return None
+        return 'email', f'{SEARCH_TABLE} MATCH :expression', 'rank', {'expression': f'email : {_quote(email)}'}
+    if looks_like_phone(term):
+        return 'phone', f'{SEARCH_TABLE} MATCH :expression', 'rank', {'expression': f'phone : {_quote(phone_digits(term))}'}
+    long_words = [word for word in term.lower().split() if len(word) >= 3]
+    if not long_words:
+        # Trigrams need three characters; very short terms fall back to a name prefix match
+        return 'name', 'name LIKE :prefix', 'rowid', {'prefix': f'{term.lower()}%'}
+    expression = 'name : (' + ' AND '.join(_quote(word) for word in long_words) + ')'
+    return 'name', f'{SEARCH_TABLE} MATCH :expression', 'rank', {'expression': expression}
+
+
+def _match(expression, limit=CANDIDATE_LIMIT):
+    return db.session.execute(text(
+        f'SELECT rowid, name, email, phone FROM {SEARCH_TABLE} '
+        f'WHERE {SEARCH_TABLE} MATCH :expression ORDER BY rank LIMIT :limit'
+    ), {'expression': expression, 'limit': limit}).all()
+
+
+def _candidates(where, order, parameters, columns='rowid, name, email, phone', limit=CANDIDATE_LIMIT, offset=0):
+    # A negative limit is no limit in SQLite
+    return db.session.execute(text(
+        f'SELECT {columns} FROM {SEARCH_TABLE} WHERE {where} ORDER BY {order} LIMIT :limit OFFSET :offset'
+    ), dict(parameters, limit=limit, offset=offset)).all()
+
+
+def _fuzzy_candidates(term, seen):
+    """Typo tolerance: any shared trigram makes a candidate, scored below"""
+    grams = set()
+    for word in term.lower().split():
+        if len(word) >= 3:
+            grams |= {gram for gram in _trigrams(word) if ' ' not in gram}
+    if not grams:
+        return []
+    rows = _match('name : (' + ' OR '.join(_quote(gram) for gram in sorted(grams)) + ')', FUZZY_CANDIDATE_LIMIT)
+    return [row for row in rows if row.rowid not in seen]
+
+
+def _score_name(term, rows, threshold=0.0):
+    words = [word for word in term.lower().split() if word]
+    results = []
+    for row in rows:
+        name_words = row.name.split()
+        score = sum(_word_score(word, name_words) for word in words) / len(words)
+        if score >= threshold:
+            results.append((row.rowid, score))
+    return results
+
+
+def _lookup(term):
+    """Scored candidates for ``term`` and whether the full-text candidates were cut at CANDIDATE_LIMIT"""
+    query = _query(term)
+    if query is None:
+        return [], False
+    kind, where, order, parameters = query
+    rows = _candidates(where, order, parameters)
+    truncated = len(rows) == CANDIDATE_LIMIT
+
+    if kind == 'email':
+        email = normalize_email(term)
+        return [(row.rowid, 1.0 if row.email == email else 0.5) for row in rows], truncated
+    if kind == 'phone':
+        e164 = normalize_phone(term)
+        exact = e164[1:] if e164 else phone_digits(term)
+        return [(row.rowid, 1.0 if row.phone == exact else 0.5) for row in rows], truncated
+
+    # Every full-text match contains each query word; the similarity threshold only
+    # keeps typo-tolerant candidates relevant
+    results = _score_name(term, rows)
+    if len(rows) < FUZZY_MIN_RESULTS and 'expression' in parameters:
+        results += _score_name(term, _fuzzy_candidates(term, {row.rowid for row in rows}), FUZZY_THRESHOLD)
+    return results, truncated
+
+
+def search(term, limit=CANDIDATE_LIMIT):
+    """Return ``(guest_id, score)`` pairs for a search term, best matches first.
+
+    Email-like terms match on the normalized address, digit strings on the phone
+    number (exact E.164 first, then partial), and anything else on guest names with
+    prefix and typo-tolerant matching. Only the top CANDIDATE_LIMIT full-text matches
+    are scored; use ``ranked_ids()`` when every match is needed.
+    """
+    term = (term or '').strip()
+    if not term:
+        return []
+    results = _lookup(term)[0]
+
+    # Stable sort keeps FTS rank order among equal scores
+    results.sort(key=lambda result: -result[1])
+    return results[:limit]
+
+
+def ranked_ids(term):
+    """Ids of every guest matching ``term``: ``search()``'s scored matches best first, then
+    the full-text matches past CANDIDATE_LIMIT in full-text rank order"""
+    term = (term or '').strip()
+    if not term:
+        return []
+    results, truncated = _lookup(term)
+    results.sort(key=lambda result: -result[1])
+    ids = [guest_id for guest_id, score in results]
+    if truncated:
+        kind, where, order, parameters = _query(term)
+        ids += [row.rowid for row in _candidates(where, order, parameters, 'rowid', -1, CANDIDATE_LIMIT)]
+    return ids
+
+
+def match_filter(term):
+    """Filter on Guest for every guest whose indexed name, email or phone matches ``term``.
+
+    A semi-join on the full-text index with no candidate limit, for queries that must
+    see every match such as exports; typo-tolerant matches are not included.
+    """
+    query = _query((term or '').strip())
+    if query is None:
+        return false()
+    kind, where, order, parameters = query
+    return Guest.id.in_(text(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {where}')
+                        .bindparams(**parameters).columns(column('rowid', Integer)))
@@ -0,0 +1,173 @@
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from src.models.user import db
+from src.models.guest import Guest
+from src.models.interaction import Interaction
+from src.services import events
+
+# Interactions waiting for someone to pick them up
+QUEUE_STATUSES = ('open', 'escalated')
+
+PRIORITY_RANK = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
+
+
+class InteractionQueue:
+    """Open interactions kept sorted by priority, then age, then guest VIP status.
+
+    The queue is rebuilt from a single query on first use and then follows committed
+    interaction and guest writes, so reading the head of the queue never hits the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._keys = []         # sorted (priority rank, created_at, not vip, id)
+        self._items = {}        # id -> item dict
+        self._by_guest = {}     # guest id -> set of interaction ids
+        self._guest_vip = {}    # guest id -> vip_status
+        self._unresolved_guests = set()
+
+    def load(self):
+        """Rebuild the queue from the database"""
+        rows = db.session.query(
+            Interaction.id,
+            Interaction.subject,
+            Interaction.interaction_type,
+            Interaction.priority_level,
+            Interaction.status,
+            Interaction.room_number,
+            Interaction.guest_id,
+            Interaction.assigned_to,
+            Interaction.created_at,
+            Guest.vip_status
+        ).outerjoin(
+            Guest, Interaction.guest_id == Guest.id
+        ).filter(
+            Interaction.status.in_(QUEUE_STATUSES)
+        ).all()
+
+        with self._lock:
+            self._keys = []
+            self._items.clear()
+            self._by_guest.clear()
+            self._guest_vip.clear()
+            self._unresolved_guests.clear()
+            for row in rows:
+                row = row._asdict()
+                if row['guest_id']:
+                    self._guest_vip[row['guest_id']] = bool(row['vip_status'])
+                self._add(row)
+            self._loaded = True
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def _key(self, item):
+        vip = self._guest_vip.get(item['guest_id'], False)
+        return (PRIORITY_RANK.get(item['priority_level'], len(PRIORITY_RANK)), item['created_at'], not vip, item['id'])
+
+    def _add(self, row):
+        item = {
+            'id': row['id'],
+            'subject': row['subject'],
+            'interaction_type': row['interaction_type'],
+            'priority_level': row['priority_level'],
+            'status': row['status'],
+            'room_number': row['room_number'],
+            'guest_id': row['guest_id'],
+            'assigned_to': row['assigned_to'],
+            'created_at': row['created_at'] or datetime.utcnow()
+        }
+        self._items[item['id']] = item
+        if item['guest_id']:
+            self._by_guest.setdefault(item['guest_id'], set()).add(item['id'])
+            if item['guest_id'] not in self._guest_vip:
+                self._unresolved_guests.add(item['guest_id'])
+        insort(self._keys, self._key(item))
+
+    def _remove(self, interaction_id):
+        item = self._items.pop(interaction_id, None)
+        if not item:
+            return
+        key = self._key(item)
+        position = bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            del self._keys[position]
+        if item['guest_id'] in self._by_guest:
+            self._by_guest[item['guest_id']].discard(interaction_id)
+            if not self._by_guest[item['guest_id']]:
+                del self._by_guest[item['guest_id']]
+
+    def _set_guest_vip(self, guest_id, vip):
+        ids = list(self._by_guest.get(guest_id, ()))
+        rows = [self._items[interaction_id] for interaction_id in ids]
+        for interaction_id in ids:
+            self._remove(interaction_id)
+        self._guest_vip[guest_id] = vip
+        for row in rows:
+            self._add(row)
+
+    def _resolve_guests(self):
+        # VIP flags of guests first seen through a write event are looked up here,
+        # inside a request, because change events fire after the transaction has ended
+        with self._lock:
+            guest_ids = list(self._unresolved_guests)
+        if not guest_ids:
+            return
+        rows = db.session.query(Guest.id, Guest.vip_status).filter(Guest.id.in_(guest_ids)).all()
+        vip_by_guest = {guest_id: bool(vip) for guest_id, vip in rows}
+        with self._lock:
+            for guest_id in guest_ids:
+                self._unresolved_guests.discard(guest_id)
+                self._set_guest_vip(guest_id, vip_by_guest.get(guest_id, False))
+
+    def reset(self):
+        """Forget the loaded state so the next read rebuilds it from the database"""
+        with self._lock:
+            self._loaded = False
+
+    def on_interaction_change(self, op, row):
+        if not self._loaded:
+            return
+        with self._lock:
+            self._remove(row['id'])
+            if op != 'delete' and row['status'] in QUEUE_STATUSES:
+                self._add(row)
+
+    def on_guest_change(self, op, row):
+        if not self._loaded:
+            return
+        with self._lock:
+            if row['id'] not in self._by_guest:
+                self._guest_vip.pop(row['id'], None)
+                return
+            vip = bool(row['vip_status']) if op != 'delete' else False
+            self._unresolved_guests.discard(row['id'])
+            if self._guest_vip.get(row['id']) != vip:
+                self._set_guest_vip(row['id'], vip)
+
+    def next_for(self, user_id=None, limit=20):
+        """Return the first ``limit`` items that are unassigned or assigned to ``user_id``.
+
+        Passing ``user_id=None`` returns the head of the whole queue.
+        """
+        self.ensure_loaded()
+        self._resolve_guests()
+        items = []
+        with self._lock:
+            for key in self._keys:
+                item = self._items[key[3]]
+                if user_id is not None and item['assigned_to'] not in (None, user_id):
+                    continue
+                items.append(dict(item, vip=not key[2], created_at=item['created_at'].isoformat()))
+                if len(items) >= limit:
+                    break
+            return items, len(self._keys)
+
+
+interaction_queue = InteractionQueue()
+events.subscribe(Interaction, interaction_queue.on_interaction_change)
+events.subscribe(Guest, interaction_queue.on_guest_change)
+events.on_reset(interaction_queue.reset)
@@ -0,0 +1,251 @@
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, func, or_, select
+from src.models.user import db, User
+from src.models.interaction import Interaction
+from src.services import events
+
+GRANULARITIES = ('hour', 'day', 'week')
+
+# split_by value -> Interaction column
+DIMENSIONS = {
+    'type': Interaction.interaction_type,
+    'priority': Interaction.priority_level,
+    'agent': Interaction.agent_id,
+}
+
+# Dirty days refreshed per query, keeping the OR of created_at ranges small
+REFRESH_BATCH_DAYS = 100
+
+
+def bucket_expression(granularity, offset_minutes):
+    """SQL expression labelling ``created_at`` with its local hour, day or week (Monday) bucket"""
+    column = Interaction.created_at
+    if db.engine.dialect.name == 'sqlite':
+        modifier = f'{offset_minutes:+d} minutes'
+        if granularity == 'hour':
+            return func.strftime('%Y-%m-%dT%H:00', column, modifier)
+        if granularity == 'week':
+            return func.date(column, modifier, 'weekday 0', '-6 days')
+        return func.date(column, modifier)
+    return func.date_trunc(granularity, column + timedelta(minutes=offset_minutes))
+
+
+def bucket_label(value, granularity):
+    """Normalize a bucket value from the database to the label format used in responses"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%dT%H:00') if granularity == 'hour' else value.date().isoformat()
+    return str(value)
+
+
+def bucket_labels(start, end, granularity):
+    """Every bucket label from local date ``start`` to ``end`` inclusive, so empty buckets show as zero"""
+    if granularity == 'hour':
+        first = datetime.combine(start, datetime.min.time())
+        hours = ((end - start).days + 1) * 24
+        return [(first + timedelta(hours=hour)).strftime('%Y-%m-%dT%H:00') for hour in range(hours)]
+    if granularity == 'week':
+        start = start - timedelta(days=start.weekday())
+        step = 7
+    else:
+        step = 1
+    return [(start + timedelta(days=offset)).isoformat() for offset in range(0, (end - start).days + 1, step)]
+
+
+def utc_range(start, end, offset_minutes):
+    """UTC datetimes bounding local dates ``start`` to ``end`` inclusive"""
+    offset = timedelta(minutes=offset_minutes)
+    return (datetime.combine(start, datetime.min.time()) - offset,
+            datetime.combine(end + timedelta(days=1), datetime.min.time()) - offset)
+
+
+class InteractionRollup:
+    """Interaction counts per hotel-local day, type, priority and agent.
+
+    Built with one grouped query on first use. New interactions increment their day;
+    updates and deletes mark the day dirty and it is recounted before the next read.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._offset = 0
+        self._days = {}          # local date -> Counter of (type, priority, agent_id)
+        self._dirty = set()
+        self._refreshing = set()
+
+    @property
+    def offset(self):
+        return self._offset
+
+    def _query(self, offset_minutes, *criteria):
+        day = bucket_expression('day', offset_minutes)
+        rows = db.session.execute(select(
+            day, Interaction.interaction_type, Interaction.priority_level, Interaction.agent_id,
+            func.count(Interaction.id)
+        ).where(*criteria).group_by(
+            day, Interaction.interaction_type, Interaction.priority_level, Interaction.agent_id
+        )).all()
+        days = {}
+        for label, interaction_type, priority, agent_id, count in rows:
+            key = datetime.strptime(bucket_label(label, 'day'), '%Y-%m-%d').date()
+            days.setdefault(key, Counter())[(interaction_type, priority, agent_id)] = count
+        return days
+
+    def load(self):
+        """Rebuild every day from the interaction table"""
+        offset_minutes = current_app.config.get('HOTEL_UTC_OFFSET_MINUTES', 0)
+        days = self._query(offset_minutes)
+        with self._lock:
+            self._offset = offset_minutes
+            self._days = days
+            self._dirty.clear()
+            self._loaded = True
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def _local_day(self, created_at):
+        return (created_at + timedelta(minutes=self._offset)).date()
+
+    def reset(self):
+        """Forget the loaded state so the next read rebuilds it from the database"""
+        with self._lock:
+            self._loaded = False
+
+    def on_change(self, op, row):
+        """Count a new interaction, or mark the day of a changed one for recounting"""
+        if not self._loaded or not row['created_at']:
+            return
+        day = self._local_day(row['created_at'])
+        with self._lock:
+            if op == 'insert' and day not in self._dirty and day not in self._refreshing:
+                counts = self._days.setdefault(day, Counter())
+                counts[(row['interaction_type'], row['priority_level'], row['agent_id'])] += 1
+            else:
+                self._dirty.add(day)
+
+    def _refresh(self):
+        with self._lock:
+            days = sorted(self._dirty)[:REFRESH_BATCH_DAYS]
+            self._dirty.difference_update(days)
+            self._refreshing.update(days)
+        try:
+            counted = self._query(self._offset, or_(*(
+                and_(Interaction.created_at >= low, Interaction.created_at < high)
+                for low, high in (utc_range(day, day, self._offset) for day in days)
+            )))
+        except Exception:
+            with self._lock:
+                self._dirty.update(days)
+            raise
+        finally:
+            with self._lock:
+                self._refreshing.difference_update(days)
+        with self._lock:
+            for day in days:
+                # A write that landed mid-refresh leaves the day dirty for the next pass
+                if day not in self._dirty:
+                    self._days[day] = counted.get(day, Counter())
+
+    def counts(self, start, end, granularity, split_by=None, interaction_type=None, agent_id=None):
+        """Counts keyed by ``(bucket label, split key)`` for local dates ``start`` to ``end``"""
+        self.ensure_loaded()
+        while self._dirty:
+            self._refresh()
+        index = ('type', 'priority', 'agent').index(split_by) if split_by else None
+        result = Counter()
+        with self._lock:
+            day = start
+            while day <= end:
+                bucket = (day - timedelta(days=day.weekday())) if granularity == 'week' else day
+                label = bucket.isoformat()
+                for key, count in self._days.get(day, {}).items():
+                    if interaction_type is not None and key[0] != interaction_type:
+                        continue
+                    if agent_id is not None and key[2] != agent_id:
+                        continue
+                    result[(label, key[index] if index is not None else None)] += count
+                day += timedelta(days=1)
+        return result
+
+
+def query_counts(start, end, granularity, offset_minutes, split_by=None, interaction_type=None, agent_id=None):
+    """Counts keyed by ``(bucket label, split key)`` from one grouped query"""
+    bucket = bucket_expression(granularity, offset_minutes)
+    low, high = utc_range(start, end, offset_minutes)
+    columns = [bucket, DIMENSIONS[split_by]] if split_by else [bucket]
+    query = select(*columns, func.count(Interaction.id)).where(
+        Interaction.created_at >= low, Interaction.created_at < high
+    ).group_by(*columns)
+    if interaction_type is not None:
+        query = query.where(Interaction.interaction_type == interaction_type)
+    if agent_id is not None:
+        query = query.where(Interaction.agent_id == agent_id)
+
+    result = Counter()
+    for row in db.session.execute(query):
+        result[(bucket_label(row[0], granularity), row[1] if split_by else None)] += row[-1]
+    return result
+
+
+def interaction_timeseries(start, end, granularity='day', offset_minutes=0, split_by=None,
+                           interaction_type=None, agent_id=None, columnar=False):
+    """Interaction volume per bucket, optionally split into one series per type, priority or agent.
+
+    Day and week buckets in the hotel's configured offset are served from the daily
+    rollup; hourly buckets and other offsets run one grouped query. Empty buckets are
+    filled with zeros. ``columnar`` returns parallel arrays instead of one object per bucket.
+    """
+    labels = bucket_labels(start, end, granularity)
+    filters = {'split_by': split_by, 'interaction_type': interaction_type, 'agent_id': agent_id}
+    interaction_rollup.ensure_loaded()
+    if granularity != 'hour' and offset_minutes == interaction_rollup.offset:
+        counts = interaction_rollup.counts(start, end, granularity, **filters)
+        source = 'rollup'
+    else:
+        counts = query_counts(start, end, granularity, offset_minutes, **filters)
+        source = 'query'
+
+    positions = {label: position for position, label in enumerate(labels)}
+    total = [0] * len(labels)
+    series = {}
+    for (label, key), count in counts.items():
+        position = positions.get(label)
+        if position is None:
+            continue
+        total[position] += count
+        if split_by:
+            series.setdefault(str(key), [0] * len(labels))[position] += count
+
+    result = {
+        'granularity': granularity,
+        'tz_offset': offset_minutes,
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'split_by': split_by,
+        'source': source
+    }
+    if split_by == 'agent' and series:
+        users = User.query.filter(User.id.in_([int(key) for key in series])).all()
+        result['labels'] = {str(user.id): f'{user.first_name} {user.last_name}' for user in users}
+
+    if columnar:
+        result['buckets'] = labels
+        result['total'] = total
+        result['series'] = dict(sorted(series.items()))
+    else:
+        result['buckets'] = [
+            {'bucket': label, 'total': total[position],
+             'counts': {key: values[position] for key, values in sorted(series.items())}}
+            for position, label in enumerate(labels)
+        ]
+    return result
+
+
+interaction_rollup = InteractionRollup()
+events.subscribe(Interaction, interaction_rollup.on_change)
+events.on_reset(interaction_rollup.reset)
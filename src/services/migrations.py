@@ -0,0 +1,98 @@
+import logging
+from src.models.user import db, User
+from src.models.schema_version import SchemaVersion
+from src.models.change_event import ChangeEvent
+from src.services.contact_backfill import ensure_contact_columns
+from src.services.schema import ensure_indexes
+from src.services import counters, guest_search
+
+logger = logging.getLogger(__name__)
+
+# Composite indexes behind the list endpoints' filters and newest-first ordering
+HOT_PATH_INDEXES = (
+    'ix_interaction_agent_created',
+    'ix_interaction_assigned_created',
+    'ix_interaction_guest_created',
+    'ix_conversation_participant_user_conversation',
+    'ix_conversation_participant_conversation_user',
+    'ix_conversation_message_conversation_created',
+    'ix_conversation_message_sender_created',
+    'ix_guest_updated_at',
+    'ix_guest_created_at',
+    'ix_guest_preference_guest_id',
+    'ix_legacy_message_recipient_created',
+    'ix_legacy_message_sender_created',
+    'ix_legacy_message_announcement_created',
+)
+
+
+def create_indexes(names):
+    """Create the named model indexes that the database is missing"""
+    indexes = {index.name: index for table in db.metadata.sorted_tables for index in table.indexes}
+    for name in names:
+        indexes[name].create(db.engine, checkfirst=True)
+
+
+# (version, description, step). Steps run once, in order, and must be safe to re-run:
+# a fresh database already has everything db.create_all() builds from the models.
+# Append new steps; never renumber or edit applied ones.
+MIGRATIONS = [
+    (1, 'Normalized phone/email lookup columns on guest and interaction', ensure_contact_columns),
+    (2, 'Indexes declared on the models before versioned migrations', ensure_indexes),
+    (3, 'Hot-path indexes for per-agent, per-guest, inbox and conversation lists',
+     lambda: create_indexes(HOT_PATH_INDEXES)),
+    (4, 'Change feed shared by worker processes',
+     lambda: ChangeEvent.__table__.create(db.engine, checkfirst=True)),
+]
+
+
+def applied_versions():
+    SchemaVersion.__table__.create(db.engine, checkfirst=True)
+    return {version for (version,) in db.session.query(SchemaVersion.version)}
+
+
+def pending_migrations():
+    applied = applied_versions()
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+
+def migrate():
+    """Apply pending migration steps in order; returns the versions applied"""
+    done = []
+    for version, description, step in pending_migrations():
+        logger.info('Applying schema migration %s: %s', version, description)
+        step()
+        db.session.add(SchemaVersion(version=version, description=description))
+        db.session.commit()
+        done.append(version)
+    return done
+
+
+DEFAULT_USERS = (
+    # username, email, first name, last name, role, password
+    ('admin', 'admin@frontdesk.com', 'System', 'Administrator', 'manager', 'admin123'),
+    ('agent1', 'agent1@frontdesk.com', 'Front Desk', 'Agent', 'agent', 'agent123'),
+)
+
+
+def init_database():
+    """Create tables, apply migrations, build the guest search index, seed the default users
+    and count the summary counters.
+
+    Returns ``(migrations applied, usernames created)``. Run once per deployment from
+    ``flask init-db`` rather than in every worker.
+    """
+    db.create_all()
+    applied = migrate()
+    guest_search.ensure_index()
+
+    created = []
+    if User.query.count() == 0:
+        for username, email, first_name, last_name, role, password in DEFAULT_USERS:
+            user = User(username=username, email=email, first_name=first_name, last_name=last_name, role=role)
+            user.set_password(password)
+            db.session.add(user)
+            created.append(username)
+        db.session.commit()
+    counters.reconcile()
+    return applied, created
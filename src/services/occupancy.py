@@ -0,0 +1,162 @@
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy.orm import joinedload
+from src.models.user import db
+from src.models.guest import GuestPreference
+from src.models.reservation import Reservation
+from src.services import events
+
+# Reservations that hold (or held) a room; cancelled and no-show bookings never do
+STAY_STATUSES = ('confirmed', 'checked_in', 'checked_out')
+
+# Stays longer than this are kept in a separate list that is scanned on every lookup
+LONG_STAY_DAYS = 31
+
+
+class OccupancyIndex:
+    """In-memory index of stay intervals bucketed by check-in and check-out date.
+
+    A reservation is in house on a date if it checks in on or before that date and
+    checks out after it, or checks out that day and has not left yet. From today on, a
+    stay that has already checked out is not in house whatever its dates say (an early
+    departure); earlier dates go by the booked dates alone. Looking up a date
+    touches at most LONG_STAY_DAYS check-in buckets plus the few long stays, however
+    many reservations the hotel has on file.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._stays = {}          # reservation id -> (guest_id, check_in, check_out, status)
+        self._by_check_in = {}    # date -> set of reservation ids
+        self._by_check_out = {}   # date -> set of reservation ids
+        self._long_stays = set()
+
+    def load(self):
+        """Rebuild the index with one query over the stay columns"""
+        rows = db.session.query(
+            Reservation.id,
+            Reservation.guest_id,
+            Reservation.check_in_date,
+            Reservation.check_out_date,
+            Reservation.status
+        ).filter(
+            Reservation.status.in_(STAY_STATUSES)
+        ).all()
+
+        with self._lock:
+            self._stays.clear()
+            self._by_check_in.clear()
+            self._by_check_out.clear()
+            self._long_stays.clear()
+            for row in rows:
+                self._add(*row)
+            self._loaded = True
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def _add(self, reservation_id, guest_id, check_in, check_out, status):
+        if not check_in or not check_out:
+            return
+        self._stays[reservation_id] = (guest_id, check_in, check_out, status)
+        self._by_check_in.setdefault(check_in, set()).add(reservation_id)
+        self._by_check_out.setdefault(check_out, set()).add(reservation_id)
+        if (check_out - check_in).days > LONG_STAY_DAYS:
+            self._long_stays.add(reservation_id)
+
+    def _remove(self, reservation_id):
+        stay = self._stays.pop(reservation_id, None)
+        if not stay:
+            return
+        for buckets, day in ((self._by_check_in, stay[1]), (self._by_check_out, stay[2])):
+            buckets[day].discard(reservation_id)
+            if not buckets[day]:
+                del buckets[day]
+        self._long_stays.discard(reservation_id)
+
+    def reset(self):
+        """Forget the loaded state so the next read rebuilds it from the database"""
+        with self._lock:
+            self._loaded = False
+
+    def on_change(self, op, row):
+        """Keep the index in step with committed reservation writes"""
+        if not self._loaded:
+            return
+        with self._lock:
+            self._remove(row['id'])
+            if op != 'delete' and row['status'] in STAY_STATUSES:
+                self._add(row['id'], row['guest_id'], row['check_in_date'], row['check_out_date'], row['status'])
+
+    def in_house(self, day):
+        """Ids of reservations in house on ``day``"""
+        self.ensure_loaded()
+        current = day >= datetime.utcnow().date()
+        with self._lock:
+            candidates = set(self._long_stays)
+            for offset in range(LONG_STAY_DAYS + 1):
+                candidates |= self._by_check_in.get(day - timedelta(days=offset), set())
+            result = []
+            for reservation_id in candidates:
+                guest_id, check_in, check_out, status = self._stays[reservation_id]
+                if check_in > day or (current and status == 'checked_out'):
+                    continue
+                if check_out > day or (check_out == day and status == 'checked_in'):
+                    result.append(reservation_id)
+            return sorted(result)
+
+    def arrivals(self, day):
+        """Ids of reservations checking in on ``day``"""
+        self.ensure_loaded()
+        with self._lock:
+            return sorted(self._by_check_in.get(day, ()))
+
+    def departures(self, day):
+        """Ids of reservations checking out on ``day``"""
+        self.ensure_loaded()
+        with self._lock:
+            return sorted(self._by_check_out.get(day, ()))
+
+
+def load_listing(reservation_ids):
+    """Load reservations with their guests and every guest's preferences in a fixed number of queries"""
+    if not reservation_ids:
+        return []
+
+    reservations = Reservation.query.options(
+        joinedload(Reservation.guest)
+    ).filter(
+        Reservation.id.in_(reservation_ids)
+    ).order_by(Reservation.room_number, Reservation.id).all()
+
+    guest_ids = {reservation.guest_id for reservation in reservations}
+    preferences = {}
+    for pref in GuestPreference.query.filter(GuestPreference.guest_id.in_(guest_ids)):
+        preferences.setdefault(pref.guest_id, []).append(pref.to_dict())
+
+    result = []
+    for reservation in reservations:
+        guest = reservation.guest
+        data = reservation.to_dict()
+        data['guest'] = {
+            'id': guest.id,
+            'full_name': guest.full_name,
+            'email': guest.email,
+            'phone': guest.phone,
+            'vip_status': guest.vip_status,
+            'loyalty_level': guest.loyalty_level,
+            'guest_type': guest.guest_type,
+            'special_needs': guest.special_needs,
+            'dietary_restrictions': guest.dietary_restrictions,
+            'accessibility_requirements': guest.accessibility_requirements,
+            'preferences': preferences.get(guest.id, [])
+        } if guest else None
+        result.append(data)
+    return result
+
+
+occupancy_index = OccupancyIndex()
+events.subscribe(Reservation, occupancy_index.on_change)
+events.on_reset(occupancy_index.reset)
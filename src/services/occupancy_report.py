@@ -0,0 +1,212 @@
+import threading
+import numpy as np
+from datetime import timedelta
+from sqlalchemy import Float, cast, func, select
+from src.models.user import db
+from src.models.reservation import Reservation
+from src.services import events
+from src.services.occupancy import STAY_STATUSES
+
+# SQLite's julianday() of 0001-01-01 is this far from Python's date.toordinal() of it
+JULIAN_DAY_OFFSET = 1721424.5
+
+COLUMNS = ('check_in', 'check_out', 'active', 'guests', 'rate', 'source')
+DTYPES = {'check_in': np.int64, 'check_out': np.int64, 'active': np.bool_,
+          'guests': np.float64, 'rate': np.float64, 'source': np.int32}
+
+
+def nightly_rate(check_in, check_out, base_rate, total_amount):
+    """The base rate, or the stay total spread over its nights"""
+    if base_rate is not None:
+        return float(base_rate)
+    if total_amount is not None:
+        return float(total_amount) / max(check_out - check_in, 1)
+    return 0.0
+
+
+class StayColumns:
+    """Reservation stay intervals held as NumPy columns, one slot per reservation.
+
+    Loaded with one query on first use; committed reservation writes patch their slot
+    from the change event, so reports never re-read the reservation table.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._size = 0
+        self._slots = {}      # reservation id -> slot
+        self._sources = {}    # booking source -> code
+        self._columns = {name: np.zeros(0, dtype=DTYPES[name]) for name in COLUMNS}
+
+    def load(self):
+        """Rebuild the columns from the reservation table"""
+        sqlite = db.engine.dialect.name == 'sqlite'
+        rows = db.session.connection().execute(select(
+            Reservation.id,
+            # On SQLite dates come back as day numbers, skipping per-row date parsing
+            func.julianday(Reservation.check_in_date) if sqlite else Reservation.check_in_date,
+            func.julianday(Reservation.check_out_date) if sqlite else Reservation.check_out_date,
+            Reservation.status,
+            func.coalesce(Reservation.adults, 0) + func.coalesce(Reservation.children, 0),
+            cast(Reservation.base_rate, Float),
+            cast(Reservation.total_amount, Float),
+            func.coalesce(Reservation.booking_source, 'unknown')
+        ).where(
+            Reservation.check_in_date.isnot(None),
+            Reservation.check_out_date.isnot(None)
+        )).all()
+
+        with self._lock:
+            self._slots.clear()
+            self._sources.clear()
+            self._size = len(rows)
+            self._loaded = True
+            if not rows:
+                self._columns = {name: np.zeros(0, dtype=DTYPES[name]) for name in COLUMNS}
+                return
+
+            ids, check_in, check_out, status, guests, base_rate, total_amount, source = zip(*rows)
+            if sqlite:
+                check_in = (np.array(check_in, dtype=np.float64) - JULIAN_DAY_OFFSET).astype(np.int64)
+                check_out = (np.array(check_out, dtype=np.float64) - JULIAN_DAY_OFFSET).astype(np.int64)
+            else:
+                check_in = np.fromiter((day.toordinal() for day in check_in), dtype=np.int64, count=len(rows))
+                check_out = np.fromiter((day.toordinal() for day in check_out), dtype=np.int64, count=len(rows))
+            base_rate = np.array(base_rate, dtype=np.float64)     # NULL becomes nan
+            total_amount = np.nan_to_num(np.array(total_amount, dtype=np.float64))
+            rate = np.where(np.isnan(base_rate), total_amount / np.maximum(check_out - check_in, 1), base_rate)
+            sources, source_codes = np.unique(np.array(source, dtype=str), return_inverse=True)
+
+            self._slots = {reservation_id: slot for slot, reservation_id in enumerate(ids)}
+            self._sources = {name: code for code, name in enumerate(sources.tolist())}
+            self._columns = {
+                'check_in': check_in,
+                'check_out': check_out,
+                'active': np.isin(np.array(status, dtype=str), STAY_STATUSES),
+                'guests': np.array(guests, dtype=np.float64),
+                'rate': rate,
+                'source': source_codes.astype(np.int32)
+            }
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def _slot_for(self, reservation_id):
+        slot = self._slots.get(reservation_id)
+        if slot is None:
+            slot = self._size
+            if slot >= len(self._columns['check_in']):
+                capacity = max(1024, slot * 2)
+                for name in COLUMNS:
+                    grown = np.zeros(capacity, dtype=DTYPES[name])
+                    grown[:slot] = self._columns[name][:slot]
+                    self._columns[name] = grown
+            self._slots[reservation_id] = slot
+            self._size += 1
+        return slot
+
+    def reset(self):
+        """Forget the loaded state so the next read rebuilds it from the database"""
+        with self._lock:
+            self._loaded = False
+
+    def on_change(self, op, row):
+        """Patch a reservation's slot from a committed write"""
+        if not self._loaded:
+            return
+        with self._lock:
+            if op == 'delete' or not row['check_in_date'] or not row['check_out_date']:
+                slot = self._slots.get(row['id'])
+                if slot is not None:
+                    self._columns['active'][slot] = False
+                return
+
+            check_in = row['check_in_date'].toordinal()
+            check_out = row['check_out_date'].toordinal()
+            source = row['booking_source'] or 'unknown'
+            slot = self._slot_for(row['id'])
+            self._columns['check_in'][slot] = check_in
+            self._columns['check_out'][slot] = check_out
+            self._columns['active'][slot] = row['status'] in STAY_STATUSES
+            self._columns['guests'][slot] = (row['adults'] or 0) + (row['children'] or 0)
+            self._columns['rate'][slot] = nightly_rate(check_in, check_out, row['base_rate'], row['total_amount'])
+            self._columns['source'][slot] = self._sources.setdefault(source, len(self._sources))
+
+    def select(self, start, end):
+        """Return the columns of stays overlapping ``start``..``end`` and the source names by code"""
+        self.ensure_loaded()
+        with self._lock:
+            columns = {name: values[:self._size] for name, values in self._columns.items()}
+            mask = columns['active'] & (columns['check_in'] <= end.toordinal()) & \
+                (columns['check_out'] > start.toordinal())
+            selected = {name: values[mask] for name, values in columns.items()}
+            sources = sorted(self._sources, key=self._sources.get)
+        return selected, sources
+
+
+def nightly_occupancy(start, end, total_rooms=None):
+    """Per-night rooms sold, guests, room revenue, ADR and booking-source mix.
+
+    Each stay adds +1 at its first night and -1 the morning it leaves in a difference
+    array (built with bincount), and a cumulative sum turns that into nightly totals.
+    """
+    stays, source_names = stay_columns.select(start, end)
+    days = (end - start).days + 1
+    base = start.toordinal()
+
+    # Clip stays to the range; index ``days`` collects everything that ends after it
+    first = np.clip(stays['check_in'] - base, 0, days)
+    last = np.clip(stays['check_out'] - base, 0, days)
+
+    def nightly(weights=None, mask=slice(None)):
+        if weights is not None:
+            weights = weights[mask]
+        diff = np.bincount(first[mask], weights=weights, minlength=days + 1) - \
+            np.bincount(last[mask], weights=weights, minlength=days + 1)
+        totals = np.cumsum(diff)[:days]
+        # Counts stay integers in the JSON; only weighted sums (revenue, guests) are float
+        return totals if weights is not None else totals.astype(np.int64)
+
+    rooms = nightly()
+    guests = nightly(stays['guests'])
+    revenue = nightly(stays['rate'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        adr = np.where(rooms > 0, revenue / rooms, 0.0)
+
+    sources = {}
+    for code in np.unique(stays['source']):
+        sources[source_names[code]] = nightly(mask=stays['source'] == code).tolist()
+
+    room_nights = int(rooms.sum())
+    total_revenue = float(revenue.sum())
+    result = {
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'dates': [(start + timedelta(days=offset)).isoformat() for offset in range(days)],
+        'rooms_occupied': rooms.tolist(),
+        'guests': guests.round().astype(np.int64).tolist(),
+        'room_revenue': revenue.round(2).tolist(),
+        'adr': adr.round(2).tolist(),
+        'booking_sources': sources,
+        'totals': {
+            'room_nights': room_nights,
+            'guest_nights': int(round(guests.sum())),
+            'room_revenue': round(total_revenue, 2),
+            'adr': round(total_revenue / room_nights, 2) if room_nights else 0.0,
+            'booking_sources': {name: int(sum(nights)) for name, nights in sources.items()}
+        }
+    }
+
+    if total_rooms:
+        result['occupancy_rate'] = (rooms / total_rooms).round(4).tolist()
+        result['revpar'] = (revenue / total_rooms).round(2).tolist()
+        result['totals']['occupancy_rate'] = round(room_nights / (total_rooms * days), 4)
+        result['totals']['revpar'] = round(total_revenue / (total_rooms * days), 2)
+    return result
+
+
+stay_columns = StayColumns()
+events.subscribe(Reservation, stay_columns.on_change)
+events.on_reset(stay_columns.reset)
@@ -0,0 +1,63 @@
+import gc
+import os
+from src.models.user import db
+from src.services import counters, guest_search, sqlite_profile
+from src.services.analytics_cube import analytics_cube
+from src.services.change_feed import change_feed
+from src.services.duplicates import duplicate_index, DEFAULT_WINDOW_HOURS
+from src.services.guest_segments import segment_index
+from src.services.interaction_queue import interaction_queue
+from src.services.interaction_timeseries import interaction_rollup
+from src.services.occupancy import occupancy_index
+from src.services.occupancy_report import stay_columns
+from src.services.room_directory import room_directory
+from src.services.report_jobs import report_jobs
+from src.services.response_cache import response_cache
+from src.services.write_coordinator import write_coordinator
+
+
+def warm(app):
+    """Load the in-memory indexes that would otherwise load on their first request"""
+    with app.app_context():
+        guest_search.is_enabled()
+        interaction_queue.ensure_loaded()
+        room_directory.ensure_loaded()
+        occupancy_index.ensure_loaded()
+        stay_columns.ensure_loaded()
+        segment_index.ensure_loaded()
+        interaction_rollup.ensure_loaded()
+        analytics_cube.refresh()
+        duplicate_index.ensure_loaded(app.config.get('DUPLICATE_WINDOW_HOURS', DEFAULT_WINDOW_HOURS))
+        db.session.remove()
+
+
+def preload(app):
+    """Warm the app in a master process that then forks its workers (``gunicorn --preload``).
+
+    Workers start with loaded indexes and share their memory pages copy-on-write.
+    The parent's database connections are closed so no worker inherits them.
+    """
+    with app.app_context():
+        # Workers replay other processes' writes from here on, so none made during warm() is lost
+        if change_feed.enabled:
+            change_feed.mark()
+    warm(app)
+    with app.app_context():
+        db.engine.dispose()
+    os.register_at_fork(after_in_child=lambda: after_fork(app))
+    # Objects that survive until the fork are never collected, so the collector
+    # does not write to (and so copy) their pages in every worker
+    gc.collect()
+    gc.freeze()
+
+
+def after_fork(app):
+    """Give a forked worker its own connections and background threads"""
+    with app.app_context():
+        db.engine.dispose(close=False)
+    write_coordinator.after_fork()
+    change_feed.after_fork()
+    report_jobs.after_fork()
+    response_cache.after_fork()
+    sqlite_profile.start_maintenance(app)
+    counters.start_reconciler(app)
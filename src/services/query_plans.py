@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from sqlalchemy import or_, select
+from src.models.user import db
+from src.models.guest import Guest, GuestPreference
+from src.models.reservation import Reservation
+from src.models.interaction import Interaction, InteractionComment
+from src.models.conversation import Conversation, ConversationParticipant, ConversationMessage, MessageReaction
+from src.models.message import Message
+
+# The queries behind the busiest endpoints, with representative parameters
+HOT_QUERIES = {
+    'interactions by agent': lambda: select(Interaction).where(
+        Interaction.agent_id == 2).order_by(Interaction.created_at.desc()).limit(20),
+    'interactions by status': lambda: select(Interaction).where(
+        Interaction.status == 'open').order_by(Interaction.created_at.desc()).limit(20),
+    'interactions by date range': lambda: select(Interaction).where(
+        Interaction.created_at >= datetime(2024, 1, 1),
+        Interaction.created_at < datetime(2024, 1, 1) + timedelta(days=7)
+    ).order_by(Interaction.created_at.desc()).limit(20),
+    'interactions for guest': lambda: select(Interaction).where(
+        Interaction.guest_id == 1).order_by(Interaction.created_at.desc()).limit(10),
+    'interaction comments': lambda: select(InteractionComment).where(InteractionComment.interaction_id == 1),
+    'guest list': lambda: select(Guest).order_by(Guest.updated_at.desc()).limit(20),
+    'guest preferences': lambda: select(GuestPreference).where(GuestPreference.guest_id == 1),
+    'guest reservations': lambda: select(Reservation).where(
+        Reservation.guest_id == 1).order_by(Reservation.check_in_date.desc()),
+    'user conversations': lambda: select(Conversation).join(ConversationParticipant).where(
+        ConversationParticipant.user_id == 2, Conversation.is_archived == False
+    ).order_by(Conversation.updated_at.desc()).limit(20),
+    'conversation membership': lambda: select(ConversationParticipant).where(
+        ConversationParticipant.conversation_id == 1, ConversationParticipant.user_id == 2).limit(1),
+    'conversation participants': lambda: select(ConversationParticipant).where(
+        ConversationParticipant.conversation_id == 1),
+    'conversation messages': lambda: select(ConversationMessage).where(
+        ConversationMessage.conversation_id == 1, ConversationMessage.is_deleted == False
+    ).order_by(ConversationMessage.created_at.desc()).limit(50),
+    'message reactions': lambda: select(MessageReaction).where(
+        MessageReaction.message_id == 1, MessageReaction.user_id == 2, MessageReaction.reaction_type == 'like'),
+    'legacy inbox': lambda: select(Message).where(
+        or_(Message.recipient_id == 2, Message.is_announcement == True)).order_by(Message.created_at.desc()),
+    'legacy sent': lambda: select(Message).where(Message.sender_id == 2).order_by(Message.created_at.desc()),
+}
+
+
+def explain(statement):
+    """SQLite's EXPLAIN QUERY PLAN detail lines for ``statement``"""
+    sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    return [row[-1] for row in db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+
+
+def is_full_scan(detail):
+    # "SCAN interaction" reads the whole table; "SCAN interaction USING INDEX ..." walks an index in order
+    return detail.startswith('SCAN ') and ' USING ' not in detail and detail != 'SCAN CONSTANT ROW'
+
+
+def check_query_plans():
+    """Plan of every hot query and the full table scans in it, keyed by query name"""
+    results = {}
+    for name, build in HOT_QUERIES.items():
+        plan = explain(build())
+        results[name] = {'plan': plan, 'full_scans': [detail for detail in plan if is_full_scan(detail)]}
+    return results
@@ -0,0 +1,292 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+from src.models.user import db
+from src.models.interaction import Interaction
+from src.models.report_job import ReportJob
+
+logger = logging.getLogger(__name__)
+
+# Rows read per query and written per progress update; each batch is its own short read
+BATCH_SIZE = 1000
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 20
+DEFAULT_TTL_HOURS = 24
+DEFAULT_STALE_MINUTES = 60
+
+
+class ReportQueueFull(Exception):
+    """Raised when too many report jobs are already waiting in this process"""
+
+
+def interaction_report_query(params):
+    """Interactions matching the report filters in ``params``.
+
+    Raises ValueError for malformed dates.
+    """
+    query = Interaction.query
+
+    if params.get('start_date'):
+        try:
+            start_date = datetime.strptime(params['start_date'], '%Y-%m-%d')
+        except ValueError:
+            raise ValueError('Invalid start_date format. Use YYYY-MM-DD')
+        query = query.filter(Interaction.created_at >= start_date)
+
+    if params.get('end_date'):
+        try:
+            # Add one day to include the entire end date
+            end_date = datetime.strptime(params['end_date'], '%Y-%m-%d') + timedelta(days=1)
+        except ValueError:
+            raise ValueError('Invalid end_date format. Use YYYY-MM-DD')
+        query = query.filter(Interaction.created_at < end_date)
+
+    if params.get('type'):
+        query = query.filter(Interaction.interaction_type == params['type'])
+
+    if params.get('agent_id'):
+        query = query.filter(Interaction.agent_id == params['agent_id'])
+
+    return query
+
+
+def interaction_report_batches(params):
+    """Row count and an iterator of batches of interaction report rows, newest first.
+
+    Batches are fetched by keyset on (created_at, id), so no read stays open between
+    batches and the job never holds the database for the whole report.
+    """
+    query = interaction_report_query(params)
+    total = query.count()
+    query = query.options(
+        joinedload(Interaction.agent),
+        joinedload(Interaction.assigned_user),
+        joinedload(Interaction.guest_info)
+    ).order_by(Interaction.created_at.desc(), Interaction.id.desc())
+
+    def batches():
+        last = None
+        while True:
+            page = query
+            if last is not None:
+                page = page.filter(or_(
+                    Interaction.created_at < last[0],
+                    and_(Interaction.created_at == last[0], Interaction.id < last[1])
+                ))
+            rows = page.limit(BATCH_SIZE).all()
+            if not rows:
+                return
+            last = (rows[-1].created_at, rows[-1].id)
+            yield [interaction.to_dict() for interaction in rows]
+
+    return total, batches()
+
+
+# report_type -> (accepted params, function returning (total, batches))
+REPORT_TYPES = {
+    'interactions': (('start_date', 'end_date', 'type', 'agent_id'), interaction_report_batches),
+}
+
+
+def normalize_params(report_type, params):
+    """Keep the known, non-empty params of a report type so equal requests compare equal.
+
+    Raises ValueError for unknown report types and invalid filters.
+    """
+    if report_type not in REPORT_TYPES:
+        raise ValueError(f'report_type must be one of: {", ".join(REPORT_TYPES)}')
+    accepted, _ = REPORT_TYPES[report_type]
+    normalized = {}
+    for name in accepted:
+        value = params.get(name)
+        if value is not None and str(value).strip():
+            normalized[name] = str(value).strip()
+    if report_type == 'interactions':
+        interaction_report_query(normalized)
+    return normalized
+
+
+def dedupe_key(report_type, params):
+    return hashlib.sha1(json.dumps([report_type, params], sort_keys=True).encode()).hexdigest()
+
+
+def expire_jobs():
+    """Delete expired jobs and their result files; returns how many were removed"""
+    expired = ReportJob.query.filter(ReportJob.expires_at <= datetime.utcnow()).all()
+    for job in expired:
+        if job.result_path and os.path.exists(job.result_path):
+            os.remove(job.result_path)
+        db.session.delete(job)
+    if expired:
+        db.session.commit()
+    return len(expired)
+
+
+def closed_range_end(params):
+    """End of the report's date range if it is over (ends before today), else None.
+
+    Only reports over a closed range can be reused from a finished job; open ranges and
+    ranges that include today keep gaining rows.
+    """
+    if not params.get('end_date'):
+        return None
+    end = datetime.strptime(params['end_date'], '%Y-%m-%d') + timedelta(days=1)
+    return end if end <= datetime.utcnow() else None
+
+
+def fail_stale_jobs():
+    """Fail jobs left queued or running by a process that died; returns how many were failed.
+
+    A job is stale once it has waited or run for REPORT_JOB_STALE_MINUTES, so a restart
+    never leaves identical requests attached to a job nobody will finish.
+    """
+    config = current_app.config
+    now = datetime.utcnow()
+    cutoff = now - timedelta(minutes=config.get('REPORT_JOB_STALE_MINUTES', DEFAULT_STALE_MINUTES))
+    stale = ReportJob.query.filter(or_(
+        and_(ReportJob.status == 'queued', ReportJob.created_at < cutoff),
+        and_(ReportJob.status == 'running', ReportJob.started_at < cutoff)
+    )).all()
+    for job in stale:
+        job.status = 'failed'
+        job.error = 'Report job was interrupted or timed out'
+        job.completed_at = now
+        job.expires_at = now + timedelta(hours=config.get('REPORT_JOB_TTL_HOURS', DEFAULT_TTL_HOURS))
+    if stale:
+        db.session.commit()
+    return len(stale)
+
+
+def run_job(job_id):
+    """Build a job's report into a gzipped NDJSON file, recording progress per batch"""
+    config = current_app.config
+    ttl = timedelta(hours=config.get('REPORT_JOB_TTL_HOURS', DEFAULT_TTL_HOURS))
+    job = db.session.get(ReportJob, job_id)
+    job.status = 'running'
+    job.started_at = datetime.utcnow()
+    db.session.commit()
+
+    directory = config['REPORT_JOB_DIR']
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{job_id}.ndjson.gz')
+    partial = path + '.part'
+    try:
+        _, build = REPORT_TYPES[job.report_type]
+        total, batches = build(json.loads(job.params))
+        job.rows_total = total
+        db.session.commit()
+
+        with gzip.open(partial, 'wt', encoding='utf-8') as output:
+            for batch in batches:
+                for row in batch:
+                    output.write(json.dumps(row))
+                    output.write('\n')
+                job.rows_written += len(batch)
+                db.session.commit()
+        os.replace(partial, path)
+
+        job.status = 'completed'
+        job.result_path = path
+        job.result_size = os.path.getsize(path)
+    except Exception as e:
+        logger.exception('Report job %s failed', job_id)
+        db.session.rollback()
+        if os.path.exists(partial):
+            os.remove(partial)
+        job = db.session.get(ReportJob, job_id)
+        job.status = 'failed'
+        job.error = str(e)
+    job.completed_at = datetime.utcnow()
+    job.expires_at = job.completed_at + ttl
+    db.session.commit()
+
+
+class ReportJobRunner:
+    """Runs report jobs on a bounded thread pool, reusing live jobs for identical requests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('REPORT_JOB_WORKERS', DEFAULT_WORKERS),
+                    thread_name_prefix='report-job'
+                )
+            return self._executor
+
+    def after_fork(self):
+        """Drop the parent's thread pool in a forked worker"""
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+
+    def submit(self, report_type, params, user_id=None):
+        """Queue a report, or return the queued or running job for the same request.
+
+        A completed, unexpired job is also reused when the report's range closed before
+        that job finished. Returns ``(job, created)``. Raises ValueError for invalid
+        requests and ReportQueueFull when the pending limit is reached.
+        """
+        params = normalize_params(report_type, params)
+        key = dedupe_key(report_type, params)
+        expire_jobs()
+        fail_stale_jobs()
+
+        reusable = [ReportJob.status.in_(('queued', 'running'))]
+        range_end = closed_range_end(params)
+        if range_end is not None:
+            reusable.append(and_(ReportJob.status == 'completed',
+                                 ReportJob.expires_at > datetime.utcnow(),
+                                 ReportJob.started_at >= range_end))
+
+        with self._lock:
+            existing = ReportJob.query.filter(
+                ReportJob.dedupe_key == key,
+                or_(*reusable)
+            ).order_by(ReportJob.created_at.desc()).first()
+            if existing is not None:
+                return existing, False
+
+            if self._pending >= current_app.config.get('REPORT_JOB_MAX_PENDING', DEFAULT_MAX_PENDING):
+                raise ReportQueueFull('Too many report jobs are queued, try again later')
+            self._pending += 1
+
+            job = ReportJob(
+                id=uuid.uuid4().hex,
+                report_type=report_type,
+                params=json.dumps(params, sort_keys=True),
+                dedupe_key=key,
+                created_by=user_id
+            )
+            db.session.add(job)
+            db.session.commit()
+
+        self._get_executor().submit(self._run, current_app._get_current_object(), job.id)
+        return job, True
+
+    def _run(self, app, job_id):
+        try:
+            with app.app_context():
+                run_job(job_id)
+        except Exception:
+            logger.exception('Report job %s could not be recorded', job_id)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+report_jobs = ReportJobRunner()
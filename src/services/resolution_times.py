@@ -0,0 +1,156 @@
+import heapq
+import numpy as np
+from datetime import datetime
+from sqlalchemy import func, select
+from src.models.user import db, User
+from src.models.interaction import Interaction, InteractionComment
+
+QUANTILES = (50, 90, 99)
+
+# Breakdown name -> Interaction column
+GROUPINGS = {
+    'by_agent': Interaction.agent_id,
+    'by_type': Interaction.interaction_type,
+    'by_priority': Interaction.priority_level,
+}
+
+METRICS = ('time_to_resolve', 'time_to_first_comment')
+
+
+def grouped_percentiles(codes, values, groups):
+    """Count, mean and QUANTILES of ``values`` per group code, skipping NaN.
+
+    Values are sorted once by (group, value); each group's percentiles are then read
+    from its slice of the sorted array with linear interpolation, for all groups at once.
+    """
+    keep = ~np.isnan(values)
+    codes, values = codes[keep], values[keep]
+    order = np.lexsort((values, codes))
+    values = values[order]
+    counts = np.bincount(codes, minlength=groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    sums = np.bincount(codes, weights=values, minlength=groups) if len(codes) else np.zeros(groups)
+
+    result = {'count': counts, 'mean': np.divide(sums, counts, out=np.zeros(groups), where=counts > 0)}
+    for quantile in QUANTILES:
+        position = starts + (quantile / 100) * np.maximum(counts - 1, 0)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        if len(values):
+            low_values = values[np.minimum(low, len(values) - 1)]
+            high_values = values[np.minimum(high, len(values) - 1)]
+            interpolated = low_values + (high_values - low_values) * (position - low)
+        else:
+            interpolated = np.zeros(groups)
+        result[f'p{quantile}'] = np.where(counts > 0, interpolated, np.nan)
+    return result
+
+
+def summarize(stats, index):
+    """Plain dict of one group's stats, in seconds; percentiles are None for empty groups"""
+    count = int(stats['count'][index])
+    summary = {'count': count, 'mean': round(float(stats['mean'][index]), 1) if count else None}
+    for quantile in QUANTILES:
+        summary[f'p{quantile}'] = round(float(stats[f'p{quantile}'][index]), 1) if count else None
+    return summary
+
+
+def load_durations(criteria):
+    """Group columns and duration arrays (seconds, NaN when missing) for interactions matching ``criteria``"""
+    first_comment = select(func.min(InteractionComment.created_at)).where(
+        InteractionComment.interaction_id == Interaction.id
+    ).scalar_subquery()
+
+    if db.engine.dialect.name == 'sqlite':
+        # Subtract day numbers in SQL instead of parsing two datetimes per row
+        created = func.julianday(Interaction.created_at)
+        durations = [(func.julianday(Interaction.resolved_at) - created) * 86400,
+                     (func.julianday(first_comment) - created) * 86400]
+    else:
+        durations = [Interaction.created_at, Interaction.resolved_at, first_comment]
+
+    rows = db.session.execute(select(*GROUPINGS.values(), *durations).where(*criteria)).all()
+    columns = list(zip(*rows)) or [()] * (len(GROUPINGS) + len(durations))
+    groups = dict(zip(GROUPINGS, columns[:len(GROUPINGS)]))
+
+    if db.engine.dialect.name == 'sqlite':
+        metrics = [np.array(column, dtype=np.float64) for column in columns[len(GROUPINGS):]]
+    else:
+        created, resolved, commented = (np.array(column, dtype='datetime64[us]') for column in columns[len(GROUPINGS):])
+        metrics = [(resolved - created) / np.timedelta64(1, 's'), (commented - created) / np.timedelta64(1, 's')]
+    return groups, dict(zip(METRICS, metrics))
+
+
+def slowest_open(criteria, limit):
+    """The ``limit`` oldest interactions still open, picked with a heap rather than sorting them all"""
+    oldest = heapq.nsmallest(limit, db.session.execute(select(Interaction.created_at, Interaction.id).where(
+        Interaction.status.in_(Interaction.get_open_statuses()),
+        Interaction.created_at.isnot(None),
+        *criteria
+    )).tuples())
+    if not oldest:
+        return []
+
+    rows = {row.id: row for row in db.session.execute(select(
+        Interaction.id,
+        Interaction.subject,
+        Interaction.interaction_type,
+        Interaction.priority_level,
+        Interaction.status,
+        Interaction.agent_id,
+        Interaction.assigned_to,
+        Interaction.created_at
+    ).where(Interaction.id.in_([interaction_id for _, interaction_id in oldest])))}
+    now = datetime.utcnow()
+    items = []
+    for _, interaction_id in oldest:
+        item = rows[interaction_id]._asdict()
+        item['age_seconds'] = round((now - item['created_at']).total_seconds(), 1)
+        item['created_at'] = item['created_at'].isoformat()
+        items.append(item)
+    return items
+
+
+def resolution_times(start, end, interaction_type=None, priority_level=None, agent_id=None, top=10):
+    """Percentiles of time to resolve and time to first comment, overall and per agent, type and priority.
+
+    Covers interactions created from ``start`` up to (not including) ``end``; durations are in seconds.
+    """
+    criteria = [Interaction.created_at >= start, Interaction.created_at < end]
+    if interaction_type:
+        criteria.append(Interaction.interaction_type == interaction_type)
+    if priority_level:
+        criteria.append(Interaction.priority_level == priority_level)
+    if agent_id:
+        criteria.append(Interaction.agent_id == agent_id)
+
+    groups, metrics = load_durations(criteria)
+    total = len(next(iter(metrics.values())))
+    result = {
+        'unit': 'seconds',
+        'interactions': total,
+        'overall': {metric: summarize(grouped_percentiles(np.zeros(total, dtype=np.int64), values, 1), 0)
+                    for metric, values in metrics.items()}
+    }
+
+    for grouping, column in groups.items():
+        if total:
+            labels = np.array(column, dtype=object).astype(str)
+            _, first, codes = np.unique(labels, return_index=True, return_inverse=True)
+        else:
+            first, codes = [], np.zeros(0, dtype=np.int64)
+        stats = {metric: grouped_percentiles(codes, values, len(first)) for metric, values in metrics.items()}
+        # Report each group under its original value, so agent ids stay integers
+        result[grouping] = [
+            dict({'key': column[row]}, **{metric: summarize(stats[metric], index) for metric in METRICS})
+            for index, row in enumerate(first)
+        ]
+
+    agent_ids = [group['key'] for group in result['by_agent'] if group['key'] is not None]
+    names = {user.id: f'{user.first_name} {user.last_name}'
+             for user in User.query.filter(User.id.in_(agent_ids))} if agent_ids else {}
+    for group in result['by_agent']:
+        group['name'] = names.get(group['key'])
+
+    result['slowest_open'] = slowest_open(criteria, top)
+    return result
@@ -0,0 +1,321 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, has_app_context, make_response, request
+from flask_login import current_user
+from src.models.guest import Guest
+from src.models.reservation import Reservation
+from src.models.interaction import Interaction, InteractionComment
+from src.models.message import Message
+from src.models.conversation import Conversation, ConversationParticipant, ConversationMessage
+from src.services import events
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class MemoryBackend:
+    """Per-process LRU cache with a byte cap and per-entry expiry"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self._lock = threading.Lock()
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._entries = OrderedDict()   # key -> (expires_at, tags, status, mimetype, body)
+        self._by_tag = {}               # tag -> set of keys
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2:]
+
+    def set(self, key, status, mimetype, body, ttl, tags):
+        if len(body) > self._max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.time() + ttl, tags, status, mimetype, body)
+            self._bytes += len(body)
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while self._bytes > self._max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= len(entry[4])
+        for tag in entry[1]:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def invalidate(self, tags):
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._by_tag.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_tag.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'entries': len(self._entries), 'bytes': self._bytes,
+                    'max_bytes': self._max_bytes, 'evictions': self.evictions}
+
+
+class SQLiteBackend:
+    """Cache stored in a local SQLite file so every worker process shares entries and invalidations"""
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS cache_entry (key TEXT PRIMARY KEY, status INTEGER, mimetype TEXT, '
+        'body BLOB, size INTEGER, expires_at REAL, accessed_at REAL)',
+        'CREATE TABLE IF NOT EXISTS cache_tag (tag TEXT, key TEXT, PRIMARY KEY (tag, key)) WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS ix_cache_tag_key ON cache_tag (key)',
+        'CREATE INDEX IF NOT EXISTS ix_cache_entry_accessed ON cache_entry (accessed_at)',
+    )
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self._path = path
+        self._max_bytes = max_bytes
+        self._local = threading.local()
+        self.evictions = 0
+        with self._connection() as connection:
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('PRAGMA mmap_size=67108864')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute(
+            'SELECT status, mimetype, body FROM cache_entry WHERE key = ? AND expires_at > ?', (key, now)
+        ).fetchone()
+        if row is not None:
+            connection.execute('UPDATE cache_entry SET accessed_at = ? WHERE key = ?', (now, key))
+        return row
+
+    def set(self, key, status, mimetype, body, ttl, tags):
+        if len(body) > self._max_bytes:
+            return
+        connection = self._connection()
+        now = time.time()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('DELETE FROM cache_tag WHERE key = ?', (key,))
+            connection.execute(
+                'INSERT OR REPLACE INTO cache_entry VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, status, mimetype, body, len(body), now + ttl, now)
+            )
+            connection.executemany('INSERT OR IGNORE INTO cache_tag VALUES (?, ?)', [(tag, key) for tag in tags])
+            connection.execute('DELETE FROM cache_entry WHERE expires_at <= ?', (now,))
+            total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM cache_entry').fetchone()[0]
+            while total > self._max_bytes:
+                oldest = connection.execute(
+                    'SELECT key, size FROM cache_entry ORDER BY accessed_at LIMIT 1'
+                ).fetchone()
+                connection.execute('DELETE FROM cache_entry WHERE key = ?', (oldest[0],))
+                total -= oldest[1]
+                self.evictions += 1
+            connection.execute('DELETE FROM cache_tag WHERE key NOT IN (SELECT key FROM cache_entry)')
+
+    def invalidate(self, tags):
+        connection = self._connection()
+        placeholders = ','.join('?' * len(tags))
+        # Most writes touch nothing cached; only take the write lock when something matches
+        if connection.execute(f'SELECT 1 FROM cache_tag WHERE tag IN ({placeholders}) LIMIT 1',
+                              list(tags)).fetchone() is None:
+            return 0
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            count = connection.execute(
+                f'DELETE FROM cache_entry WHERE key IN (SELECT key FROM cache_tag WHERE tag IN ({placeholders}))',
+                list(tags)
+            ).rowcount
+            connection.execute(f'DELETE FROM cache_tag WHERE tag IN ({placeholders})', list(tags))
+        return count
+
+    def clear(self):
+        connection = self._connection()
+        with connection:
+            connection.execute('DELETE FROM cache_entry')
+            connection.execute('DELETE FROM cache_tag')
+
+    def stats(self):
+        entries, size = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entry'
+        ).fetchone()
+        return {'backend': 'sqlite', 'path': self._path, 'entries': entries, 'bytes': size,
+                'max_bytes': self._max_bytes, 'evictions': self.evictions}
+
+
+class ResponseCache:
+    """Caches GET responses of report and stats endpoints, invalidated by change events.
+
+    Entries are tagged with the data scopes they read. A manager's entry (or any entry
+    not cached per user) depends on the whole scope, an agent's entry only on rows that
+    involve that agent plus writes that affect everyone.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._backend = None
+        self.counters = {'hits': 0, 'misses': 0, 'stores': 0, 'invalidations': 0}
+
+    def backend(self):
+        if self._backend is None:
+            if not has_app_context():
+                return None
+            config = current_app.config
+            max_bytes = config.get('RESPONSE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+            if config.get('RESPONSE_CACHE_BACKEND', 'memory') == 'sqlite':
+                backend = SQLiteBackend(config['RESPONSE_CACHE_PATH'], max_bytes)
+            else:
+                backend = MemoryBackend(max_bytes)
+            with self._lock:
+                if self._backend is None:
+                    self._backend = backend
+        return self._backend
+
+    def after_fork(self):
+        """Reopen the backend in a forked worker instead of sharing the parent's connections"""
+        self._lock = threading.Lock()
+        self._backend = None
+
+    def reset(self):
+        """Drop every cached response"""
+        backend = self.backend()
+        if backend is not None:
+            backend.clear()
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def invalidate(self, tags):
+        backend = self.backend()
+        if backend is None or not tags:
+            return
+        try:
+            self._count('invalidations', backend.invalidate(tags))
+        except sqlite3.Error:
+            logger.exception('Response cache invalidation failed')
+
+    def stats(self):
+        backend = self.backend()
+        with self._lock:
+            result = dict(self.counters)
+        lookups = result['hits'] + result['misses']
+        result['hit_rate'] = round(result['hits'] / lookups, 4) if lookups else 0.0
+        result.update(backend.stats() if backend else {})
+        return result
+
+    def cached(self, scopes, ttl=None, per_user=True):
+        """Decorator for GET views; cache key is route, role, user and normalized query params"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                backend = self.backend()
+                if backend is None or request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                user_scoped = per_user and current_user.role != 'manager'
+                key = hashlib.sha1(json.dumps([
+                    request.endpoint,
+                    kwargs,
+                    current_user.role,
+                    current_user.id if per_user else None,
+                    sorted((name, sorted(value.strip() for value in values))
+                           for name, values in request.args.lists() if any(value.strip() for value in values))
+                ], sort_keys=True, default=str).encode()).hexdigest()
+
+                try:
+                    entry = backend.get(key)
+                except sqlite3.Error:
+                    logger.exception('Response cache read failed')
+                    entry = None
+                if entry is not None:
+                    self._count('hits')
+                    status, mimetype, body = entry
+                    response = current_app.response_class(body, status=status, mimetype=mimetype)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self._count('misses')
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    if user_scoped:
+                        tags = {f'{scope}:{suffix}' for scope in scopes
+                                for suffix in (f'user:{current_user.id}', 'broadcast')}
+                    else:
+                        tags = set(scopes)
+                    try:
+                        backend.set(key, response.status_code, response.mimetype, response.get_data(),
+                                    ttl or current_app.config.get('RESPONSE_CACHE_TTL', DEFAULT_TTL), tags)
+                        self._count('stores')
+                    except sqlite3.Error:
+                        logger.exception('Response cache write failed')
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+
+response_cache = ResponseCache()
+
+
+def _change_tags(scope, user_ids=()):
+    """Tags to drop for a write: the whole scope, plus the users involved or everyone"""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    tags = {scope} | {f'{scope}:user:{user_id}' for user_id in user_ids}
+    if not user_ids:
+        tags.add(f'{scope}:broadcast')
+    return tags
+
+
+events.subscribe(Interaction, lambda op, row: response_cache.invalidate(
+    _change_tags('interactions', (row['agent_id'], row['assigned_to']))))
+events.subscribe(InteractionComment, lambda op, row: response_cache.invalidate(_change_tags('comments')))
+events.subscribe(Message, lambda op, row: response_cache.invalidate(
+    _change_tags('messages', () if row['is_announcement'] else (row['sender_id'], row['recipient_id']))))
+events.subscribe(ConversationParticipant, lambda op, row: response_cache.invalidate(
+    _change_tags('conversations', (row['user_id'],))))
+for _model in (Conversation, ConversationMessage):
+    events.subscribe(_model, lambda op, row: response_cache.invalidate(_change_tags('conversations')))
+events.subscribe(Guest, lambda op, row: response_cache.invalidate(_change_tags('guests')))
+events.subscribe(Reservation, lambda op, row: response_cache.invalidate(_change_tags('reservations')))
+events.on_reset(response_cache.reset)
@@ -0,0 +1,99 @@
+import threading
+from datetime import datetime
+from src.models.user import db
+from src.models.reservation import Reservation
+from src.services import events
+from src.services.duplicates import normalize_room
+
+
+class RoomDirectory:
+    """In-memory map of room number to the reservations occupying it today.
+
+    Built from one query on first use and each new day, then kept current by committed
+    reservation writes, so resolving a room to its guest never scans a table.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._day = None
+        self._stays = {}     # reservation id -> (room, guest_id, status, check_in)
+        self._by_room = {}   # normalized room -> set of reservation ids
+
+    def load(self):
+        """Rebuild the directory from the reservations occupying a room today"""
+        today = datetime.utcnow().date()
+        rows = db.session.query(
+            Reservation.id,
+            Reservation.room_number,
+            Reservation.guest_id,
+            Reservation.status,
+            Reservation.check_in_date,
+            Reservation.check_out_date
+        ).filter(
+            Reservation.status.in_(Reservation.ACTIVE_STATUSES),
+            Reservation.check_in_date <= today,
+            Reservation.check_out_date >= today,
+            Reservation.room_number.isnot(None)
+        ).all()
+
+        with self._lock:
+            self._day = today
+            self._stays.clear()
+            self._by_room.clear()
+            for row in rows:
+                self._add(*row)
+
+    def ensure_loaded(self):
+        if self._day != datetime.utcnow().date():
+            self.load()
+
+    def _add(self, reservation_id, room_number, guest_id, status, check_in, check_out):
+        room = normalize_room(room_number)
+        if not room or not check_in or not check_out or not (check_in <= self._day <= check_out):
+            return
+        self._stays[reservation_id] = (room, guest_id, status, check_in)
+        self._by_room.setdefault(room, set()).add(reservation_id)
+
+    def _remove(self, reservation_id):
+        stay = self._stays.pop(reservation_id, None)
+        if not stay:
+            return
+        self._by_room[stay[0]].discard(reservation_id)
+        if not self._by_room[stay[0]]:
+            del self._by_room[stay[0]]
+
+    def reset(self):
+        """Forget the loaded day so the next read rebuilds the directory"""
+        with self._lock:
+            self._day = None
+
+    def on_change(self, op, row):
+        """Keep the directory in step with committed reservation writes"""
+        if self._day is None:
+            return
+        with self._lock:
+            self._remove(row['id'])
+            if op != 'delete' and row['status'] in Reservation.ACTIVE_STATUSES:
+                self._add(row['id'], row['room_number'], row['guest_id'], row['status'],
+                          row['check_in_date'], row['check_out_date'])
+
+    def lookup(self, room_number):
+        """Return ``[(reservation_id, guest_id)]`` for a room, checked-in and most recent arrival first"""
+        room = normalize_room(room_number)
+        if not room:
+            return []
+        self.ensure_loaded()
+        with self._lock:
+            stays = [(reservation_id, self._stays[reservation_id]) for reservation_id in self._by_room.get(room, ())]
+        stays.sort(key=lambda stay: (stay[1][2] != 'checked_in', -stay[1][3].toordinal(), -stay[0]))
+        return [(reservation_id, stay[1]) for reservation_id, stay in stays]
+
+    def current_guest_id(self, room_number):
+        """Guest id of the room's current occupant, or None"""
+        occupants = self.lookup(room_number)
+        return occupants[0][1] if occupants else None
+
+
+room_directory = RoomDirectory()
+events.subscribe(Reservation, room_directory.on_change)
+events.on_reset(room_directory.reset)
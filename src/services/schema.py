@@ -0,0 +1,12 @@
+from src.models.user import db
+
+
+def ensure_indexes():
+    """Create indexes declared on the models that an existing database is missing.
+
+    ``db.create_all()`` only creates whole tables, so indexes added to a model after
+    its table exists would otherwise never reach older databases.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
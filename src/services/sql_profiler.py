@@ -0,0 +1,146 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOW_QUERY_MS = 200
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+DEFAULT_BUFFER_SIZE = 200
+
+# Statements listed per request in the debug buffer
+TOP_STATEMENTS = 5
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LIST = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+
+
+def fingerprint(statement):
+    """Statement with literals and IN-list lengths removed, so repeats of one query compare equal"""
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    statement = _STRING.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    return _LIST.sub('(?...)', statement)
+
+
+def redact(parameters):
+    """Bound parameters with every value replaced by its type name"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            return f'<{len(parameters)} parameter sets>'
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class SQLProfiler:
+    """Counts and times the SQL each request runs and keeps recent requests in a ring buffer.
+
+    Every request gets query count and database time in a ``Server-Timing`` header.
+    A normalized statement that runs more than SQL_N_PLUS_ONE_THRESHOLD times in one
+    request is flagged as a likely N+1, and statements slower than SQL_SLOW_QUERY_MS
+    are logged with their parameters redacted. Queries run outside a request (writer
+    thread, background jobs) are not counted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = deque(maxlen=DEFAULT_BUFFER_SIZE)
+        self._config = {}
+
+    def init_app(self, app):
+        if not app.config.get('SQL_PROFILING', True):
+            return
+        self._config = app.config
+        self._requests = deque(self._requests, maxlen=app.config.get('SQL_DEBUG_REQUESTS', DEFAULT_BUFFER_SIZE))
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def _before_execute(self, connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault('sql_profiler_start', []).append(time.perf_counter())
+
+    def _after_execute(self, connection, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - connection.info['sql_profiler_start'].pop()
+        if elapsed * 1000 >= self._config.get('SQL_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS):
+            logger.warning('Slow query (%.1f ms): %s parameters=%s',
+                           elapsed * 1000, _WHITESPACE.sub(' ', statement), redact(parameters))
+        if not has_request_context():
+            return
+        stats = g.get('sql_stats')
+        if stats is None:
+            return
+        stats['queries'] += 1
+        stats['seconds'] += elapsed
+        key = fingerprint(statement)
+        stats['counts'][key] += 1
+        stats['times'][key] += elapsed
+
+    def _start_request(self):
+        g.sql_stats = {'started': time.perf_counter(), 'queries': 0, 'seconds': 0.0,
+                       'counts': Counter(), 'times': Counter()}
+
+    def _finish_request(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        total_ms = (time.perf_counter() - stats['started']) * 1000
+        db_ms = stats['seconds'] * 1000
+        response.headers.add('Server-Timing',
+                             f'db;dur={db_ms:.1f};desc="{stats["queries"]} queries", app;dur={total_ms:.1f}')
+
+        threshold = self._config.get('SQL_N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+        repeated = [
+            {'statement': key, 'count': count, 'db_ms': round(stats['times'][key] * 1000, 2)}
+            for key, count in stats['counts'].most_common() if count > threshold
+        ]
+        for entry in repeated:
+            logger.warning('Possible N+1 in %s %s: %d runs of %s',
+                           request.method, request.path, entry['count'], entry['statement'])
+
+        record = {
+            'at': datetime.utcnow().isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            # The user Flask-Login already loaded, if any; loading it here would add a query
+            'user_id': g._login_user.get_id() if g.get('_login_user') is not None else None,
+            'duration_ms': round(total_ms, 2),
+            'db_ms': round(db_ms, 2),
+            'queries': stats['queries'],
+            'distinct_statements': len(stats['counts']),
+            'n_plus_one': repeated,
+            'top_statements': [
+                {'statement': key, 'count': count, 'db_ms': round(stats['times'][key] * 1000, 2)}
+                for key, count in stats['counts'].most_common(TOP_STATEMENTS)
+            ]
+        }
+        with self._lock:
+            self._requests.append(record)
+        return response
+
+    def recent(self, limit=None, n_plus_one_only=False, path_prefix=None):
+        """Recorded requests, newest first"""
+        with self._lock:
+            records = list(self._requests)
+        records.reverse()
+        if n_plus_one_only:
+            records = [record for record in records if record['n_plus_one']]
+        if path_prefix:
+            records = [record for record in records if record['path'].startswith(path_prefix)]
+        return records[:limit] if limit else records
+
+
+sql_profiler = SQLProfiler()
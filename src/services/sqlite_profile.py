@@ -0,0 +1,176 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+# Settings of the 'tuned' profile; each can be overridden in app.config.
+# The page cache is per connection: a process can hold up to
+# (SQLITE_POOL_SIZE + SQLITE_MAX_OVERFLOW) * SQLITE_CACHE_SIZE_KB of it (320 MB with
+# these defaults), times the number of worker processes.
+DEFAULTS = {
+    'SQLITE_JOURNAL_MODE': 'WAL',            # readers no longer block the writer
+    'SQLITE_SYNCHRONOUS': 'NORMAL',          # fsync at checkpoints instead of every commit (safe with WAL)
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,          # wait for the write lock instead of failing with "database is locked"
+    'SQLITE_CACHE_SIZE_KB': 16 * 1024,       # page cache per connection, not per process
+    'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,   # memory-mapped reads
+    'SQLITE_TEMP_STORE': 'MEMORY',           # sorts and temp indexes in memory
+    'SQLITE_POOL_SIZE': 10,                  # connections kept open per process
+    'SQLITE_MAX_OVERFLOW': 10,               # extra connections allowed under bursts
+    'SQLITE_MAINTENANCE_SECONDS': 3600,      # PRAGMA optimize + WAL checkpoint interval; 0 disables
+}
+
+
+def settings(config):
+    """The tuned profile's settings, or None when the app uses SQLite's defaults or another database"""
+    if not config.get('SQLALCHEMY_DATABASE_URI', '').startswith('sqlite'):
+        return None
+    if config.get('SQLITE_PROFILE', 'tuned') != 'tuned':
+        return None
+    return {key: config.get(key, default) for key, default in DEFAULTS.items()}
+
+
+def pragmas(profile):
+    """PRAGMA statements run on every new connection"""
+    return [
+        f"PRAGMA journal_mode={profile['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={profile['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(profile['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA cache_size=-{int(profile['SQLITE_CACHE_SIZE_KB'])}",
+        f"PRAGMA mmap_size={int(profile['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA temp_store={profile['SQLITE_TEMP_STORE']}",
+    ]
+
+
+def engine_options(profile):
+    """SQLAlchemy engine options for a threaded server: a bounded pool shared across request threads"""
+    return {
+        'connect_args': {'timeout': int(profile['SQLITE_BUSY_TIMEOUT_MS']) / 1000, 'check_same_thread': False},
+        'pool_size': int(profile['SQLITE_POOL_SIZE']),
+        'max_overflow': int(profile['SQLITE_MAX_OVERFLOW']),
+    }
+
+
+def attach(engine, profile):
+    """Run the profile's pragmas on every connection ``engine`` opens"""
+    statements = pragmas(profile)
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+
+
+def configure(app):
+    """Add the profile's engine options to the app config; call before ``db.init_app``"""
+    profile = settings(app.config)
+    if profile:
+        options = dict(engine_options(profile), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def install(app):
+    """Attach the pragmas to the app's engine and start periodic maintenance; call after ``db.init_app``"""
+    profile = settings(app.config)
+    if not profile:
+        return
+    with app.app_context():
+        attach(db.engine, profile)
+    start_maintenance(app)
+
+
+def start_maintenance(app):
+    """Start the periodic maintenance thread (again, in a forked worker)"""
+    profile = settings(app.config)
+    interval = int(profile['SQLITE_MAINTENANCE_SECONDS']) if profile else 0
+    if interval > 0:
+        thread = threading.Thread(target=_maintenance_loop, args=(app, interval), name='sqlite-maintenance', daemon=True)
+        thread.start()
+
+
+def run_maintenance(checkpoint='PASSIVE'):
+    """Refresh query planner statistics and checkpoint the WAL; returns the checkpoint result"""
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('PRAGMA optimize')
+        busy, log_frames, checkpointed = connection.exec_driver_sql(f'PRAGMA wal_checkpoint({checkpoint})').one()
+        connection.commit()
+    return {'busy': busy, 'log_frames': log_frames, 'checkpointed_frames': checkpointed}
+
+
+def _maintenance_loop(app, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            with app.app_context():
+                run_maintenance()
+        except Exception:
+            logger.exception('SQLite maintenance failed')
+
+
+def benchmark(profile_name, readers=4, writers=4, seconds=5.0):
+    """Concurrent read/write throughput of a scratch database under ``profile_name`` ('default' or 'tuned')"""
+    directory = tempfile.mkdtemp(prefix='sqlite-bench-')
+    path = os.path.join(directory, 'bench.db')
+    if profile_name == 'tuned':
+        profile = dict(DEFAULTS)
+        engine = create_engine(f'sqlite:///{path}', **engine_options(profile))
+        attach(engine, profile)
+    else:
+        engine = create_engine(f'sqlite:///{path}', pool_size=readers + writers)
+
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE bench (id INTEGER PRIMARY KEY, agent_id INTEGER, payload TEXT)'))
+        connection.execute(text('CREATE INDEX ix_bench_agent ON bench (agent_id)'))
+        connection.execute(text('INSERT INTO bench (agent_id, payload) VALUES (:agent_id, :payload)'),
+                           [{'agent_id': n % 20, 'payload': 'x' * 200} for n in range(10000)])
+
+    counts = {'reads': 0, 'writes': 0, 'lock_errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def count(key):
+        with lock:
+            counts[key] += 1
+
+    def write(worker):
+        while time.perf_counter() < deadline:
+            try:
+                with engine.begin() as connection:
+                    connection.execute(text('INSERT INTO bench (agent_id, payload) VALUES (:agent_id, :payload)'),
+                                       {'agent_id': worker, 'payload': 'y' * 200})
+                count('writes')
+            except OperationalError:
+                count('lock_errors')
+
+    def read(worker):
+        while time.perf_counter() < deadline:
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text(
+                        'SELECT COUNT(*), MAX(id) FROM bench WHERE agent_id = :agent_id'
+                    ), {'agent_id': worker % 20}).one()
+                count('reads')
+            except OperationalError:
+                count('lock_errors')
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(writers)] + \
+        [threading.Thread(target=read, args=(n,)) for n in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+    return dict(counts, profile=profile_name,
+                reads_per_second=round(counts['reads'] / seconds, 1),
+                writes_per_second=round(counts['writes'] / seconds, 1))
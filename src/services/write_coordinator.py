@@ -0,0 +1,226 @@
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from flask import Flask
+from src.models.user import db
+from src.models.system_counter import SystemCounter
+from src.services import sqlite_profile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_MS = 5
+DEFAULT_MAX_BATCH = 200
+
+
+class WriteCoordinator:
+    """Runs write units of work on one writer thread and commits them in groups.
+
+    ``run(work)`` takes a closure that changes ``db.session`` and returns plain data
+    (e.g. ``obj.to_dict()`` after a flush). With WRITE_COORDINATOR off it runs in the
+    calling thread and commits right away. With it on, the writer thread collects work
+    for up to WRITE_BATCH_WINDOW_MS after the first item arrives and commits the batch
+    once, so concurrent requests share one fsync and never compete for SQLite's write
+    lock. If any closure raises, the batch is rolled back and replayed with a savepoint
+    per closure: its caller gets the exception and the rest of the batch commits.
+
+    Closures run in a different thread and session than the request: capture ids and
+    values, not ORM objects or ``current_user``, and do not commit.
+
+    Every interaction and messaging write endpoint goes through ``run()``. Guest, user,
+    login and report job writes and the CLI commands commit on their own and wait on
+    the write lock behind a batch: they are rare next to interaction and message
+    traffic, and guest imports, merges and dedupe scans commit several transactions per
+    request, which cannot join one batch.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._app = None
+        self._waiting = 0     # callers blocked in run()
+        self.stats = {'batches': 0, 'units': 0, 'failed': 0}
+
+    def init_app(self, app):
+        self._app = app
+
+    def after_fork(self):
+        """Drop the parent's writer thread and queue in a forked worker"""
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._waiting = 0
+
+    @property
+    def enabled(self):
+        return bool(self._app and self._app.config.get('WRITE_COORDINATOR'))
+
+    def run(self, work):
+        """Run ``work`` and commit it; returns its result or raises its exception"""
+        if not self.enabled or threading.current_thread() is self._thread:
+            try:
+                result = work()
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            return result
+        self._start()
+        future = Future()
+        with self._lock:
+            self._waiting += 1
+        self._queue.put((work, future))
+        try:
+            return future.result()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='write-coordinator', daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        config = self._app.config
+        deadline = time.monotonic() + config.get('WRITE_BATCH_WINDOW_MS', DEFAULT_WINDOW_MS) / 1000
+        limit = config.get('WRITE_BATCH_MAX', DEFAULT_MAX_BATCH)
+        while len(batch) < limit:
+            if len(batch) >= self._waiting:
+                # Every blocked caller is in the batch; waiting longer only adds latency
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            try:
+                with self._app.app_context():
+                    self._commit(batch)
+            except Exception as error:
+                logger.exception('Write batch failed')
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    def _begin(self):
+        if db.engine.dialect.name == 'sqlite':
+            # pysqlite defers BEGIN until the first write, so a first SAVEPOINT would
+            # become the transaction and commit on release; take the write lock up front
+            db.session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+
+    def _commit(self, batch):
+        session = db.session
+        # Optimistic pass: the whole batch in one transaction without savepoints
+        self._begin()
+        try:
+            results = [work() for work, _ in batch]
+            session.commit()
+            outcomes = [(future, result, None) for (_, future), result in zip(batch, results)]
+        except Exception:
+            # Something failed; redo the batch with a savepoint per unit so only it fails
+            session.rollback()
+            outcomes = self._commit_isolated(batch)
+
+        failed = 0
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                failed += 1
+                future.set_exception(error)
+        self.stats['batches'] += 1
+        self.stats['units'] += len(batch)
+        self.stats['failed'] += failed
+
+    def _commit_isolated(self, batch):
+        session = db.session
+        self._begin()
+        outcomes = []
+        for work, future in batch:
+            try:
+                with session.begin_nested():
+                    outcomes.append((future, work(), None))
+            except Exception as error:
+                outcomes.append((future, None, error))
+        try:
+            session.commit()
+        except Exception as error:
+            session.rollback()
+            outcomes = [(future, None, error) for future, _, _ in outcomes]
+        return outcomes
+
+
+write_coordinator = WriteCoordinator()
+
+
+def benchmark(coordinated, threads=16, seconds=5.0, synchronous='NORMAL'):
+    """Committed single-row writes per second from ``threads`` request-like threads on a scratch database"""
+    directory = tempfile.mkdtemp(prefix='write-bench-')
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, 'bench.db')}",
+        SQLITE_MAINTENANCE_SECONDS=0,
+        SQLITE_SYNCHRONOUS=synchronous,
+        SQLITE_POOL_SIZE=threads,
+        WRITE_COORDINATOR=coordinated,
+    )
+    sqlite_profile.configure(app)
+    db.init_app(app)
+    sqlite_profile.install(app)
+    coordinator = WriteCoordinator()
+    coordinator.init_app(app)
+    with app.app_context():
+        db.create_all()
+
+    counts = {'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def writer(worker):
+        sequence = 0
+        while time.perf_counter() < deadline:
+            sequence += 1
+            name = f'bench:{worker}:{sequence}'
+
+            def work():
+                db.session.add(SystemCounter(name=name, value=sequence))
+                db.session.flush()
+                return name
+
+            with app.app_context():
+                try:
+                    coordinator.run(work)
+                    key = 'writes'
+                except Exception:
+                    key = 'errors'
+            with lock:
+                counts[key] += 1
+
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    with app.app_context():
+        db.engine.dispose()
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+    return dict(counts, mode='coordinated' if coordinated else 'direct', threads=threads, synchronous=synchronous,
+                writes_per_second=round(counts['writes'] / seconds, 1),
+                batches=coordinator.stats['batches'])